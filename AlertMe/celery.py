@@ -13,6 +13,26 @@ app.conf.beat_schedule = {
         'task': 'sos.tasks.check_expired_timers',
         'schedule': 60.0,  
     },
+    'expire-shared-locations': {
+        'task': 'geolocation.tasks.expire_shared_locations',
+        'schedule': 60.0,
+    },
+    'expire-stale-timers': {
+        'task': 'sos.tasks.expire_stale_timers',
+        'schedule': 300.0,
+    },
+    'expire-subscriptions': {
+        'task': 'subscriptions.tasks.expire_subscriptions',
+        'schedule': 300.0,
+    },
+    'flush-geozone-notifications': {
+        'task': 'geolocation.tasks.flush_stale_geozone_notifications',
+        'schedule': 60.0,
+    },
+    'cleanup-telegram-updates': {
+        'task': 'notifications.tasks.cleanup_telegram_updates',
+        'schedule': crontab(minute=30),
+    },
     'cleanup-old-locations': {
         'task': 'geolocation.tasks.cleanup_old_location_history',
         'schedule': crontab(hour=3, minute=0),  
@@ -82,6 +82,21 @@ CACHES = {
     }
 }
 
+# Канальный слой для живого отслеживания. В памяти работает только в пределах
+# одного процесса, для нескольких воркеров нужен Redis
+CHANNEL_REDIS_URL = config('CHANNEL_REDIS_URL', default='')
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [CHANNEL_REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+    }
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
@@ -178,6 +193,84 @@ SOS_VIDEO_DURATION = 3
 SOS_ALERT_TIMEOUT = 15  
 MAX_FREE_CONTACTS = 1
 
+# Сколько секунд кэшировать права пользователя по подписке (entitlements)
+ENTITLEMENTS_CACHE_TTL = config('ENTITLEMENTS_CACHE_TTL', default=300, cast=int)
+
+# Webhook-режим бота: Telegram шлет обновления на {SITE_URL}/api/telegram/webhook/
+# с секретом в заголовке. Пустой секрет - webhook выключен, бот работает через polling
+TELEGRAM_WEBHOOK_URL = config('TELEGRAM_WEBHOOK_URL', default=f'{SITE_URL}/api/telegram/webhook/')
+TELEGRAM_WEBHOOK_SECRET = config('TELEGRAM_WEBHOOK_SECRET', default='')
+# Сколько секунд хранить update_id принятых обновлений для отсева повторов
+TELEGRAM_UPDATE_DEDUPE_TTL = config('TELEGRAM_UPDATE_DEDUPE_TTL', default=86400, cast=int)
+
+# Рассылки бота: общий лимит Telegram ~30 сообщений/с, берем с запасом
+TELEGRAM_BROADCAST_RATE = config('TELEGRAM_BROADCAST_RATE', default=25, cast=int)
+TELEGRAM_BROADCAST_WORKERS = config('TELEGRAM_BROADCAST_WORKERS', default=8, cast=int)
+TELEGRAM_BROADCAST_CHUNK_SIZE = config('TELEGRAM_BROADCAST_CHUNK_SIZE', default=500, cast=int)
+TELEGRAM_BROADCAST_STALE_AFTER = config('TELEGRAM_BROADCAST_STALE_AFTER', default=300, cast=int)
+
+# Сколько секунд бот держит настройки BotSettings в памяти процесса
+BOT_SETTINGS_CACHE_TTL = config('BOT_SETTINGS_CACHE_TTL', default=30, cast=int)
+
+# Хранение истории местоположений: сырые точки -> почасовые сводки -> архив
+LOCATION_RAW_RETENTION_DAYS = config('LOCATION_RAW_RETENTION_DAYS', default=90, cast=int)
+LOCATION_ROLLUP_RETENTION_DAYS = config('LOCATION_ROLLUP_RETENTION_DAYS', default=365, cast=int)
+LOCATION_RETENTION_BATCH_SIZE = config('LOCATION_RETENTION_BATCH_SIZE', default=2000, cast=int)
+LOCATION_ARCHIVE_DIR = config('LOCATION_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'locations'))
+
+# Слияние почти одинаковых точек при приёме: точка в пределах порога
+# (не меньше точности фиксации, но не больше MAX_DISTANCE) и интервала
+# от последней сохранённой увеличивает её dwell_count вместо новой записи
+LOCATION_DEDUP_ENABLED = config('LOCATION_DEDUP_ENABLED', default=True, cast=bool)
+LOCATION_DEDUP_MIN_DISTANCE = config('LOCATION_DEDUP_MIN_DISTANCE', default=15, cast=float)
+LOCATION_DEDUP_MAX_DISTANCE = config('LOCATION_DEDUP_MAX_DISTANCE', default=75, cast=float)
+LOCATION_DEDUP_MAX_INTERVAL = config('LOCATION_DEDUP_MAX_INTERVAL', default=600, cast=int)
+LOCATION_DEDUP_MAX_SPEED = config('LOCATION_DEDUP_MAX_SPEED', default=1.0, cast=float)
+
+# Разбиение истории на остановки и поездки: остановка - пребывание в радиусе
+# STAY_RADIUS метров не меньше STAY_MIN_DURATION секунд; путь поездки
+# упрощается с шагом PATH_TOLERANCE метров; после паузы в данных дольше
+# SEGMENT_MAX_GAP секунд поездка закрывается
+LOCATION_STAY_RADIUS = config('LOCATION_STAY_RADIUS', default=100, cast=float)
+LOCATION_STAY_MIN_DURATION = config('LOCATION_STAY_MIN_DURATION', default=300, cast=int)
+LOCATION_TRIP_PATH_TOLERANCE = config('LOCATION_TRIP_PATH_TOLERANCE', default=25, cast=float)
+LOCATION_SEGMENT_MAX_GAP = config('LOCATION_SEGMENT_MAX_GAP', default=21600, cast=int)
+
+# Рекомендуемый интервал отправки координат (секунды), возвращается клиенту
+LOCATION_REPORT_MIN_INTERVAL = config('LOCATION_REPORT_MIN_INTERVAL', default=10, cast=int)
+LOCATION_REPORT_MAX_INTERVAL = config('LOCATION_REPORT_MAX_INTERVAL', default=300, cast=int)
+LOCATION_REPORT_SOS_INTERVAL = config('LOCATION_REPORT_SOS_INTERVAL', default=5, cast=int)
+LOCATION_REPORT_SHARE_INTERVAL = config('LOCATION_REPORT_SHARE_INTERVAL', default=15, cast=int)
+LOCATION_REPORT_ASSUMED_SPEED = config('LOCATION_REPORT_ASSUMED_SPEED', default=1.5, cast=float)
+
+# Пропуск проверки геозон: пока пользователь физически не мог доехать до
+# ближайшей границы (прошедшее время × скорость), зоны не проверяются
+GEOZONE_SKIP_MAX_SPEED = config('GEOZONE_SKIP_MAX_SPEED', default=50, cast=float)
+GEOZONE_MARGIN_TTL = config('GEOZONE_MARGIN_TTL', default=3600, cast=int)
+
+# Защита от дребезга на границе геозоны: радиус выхода по умолчанию больше
+# радиуса входа на HYSTERESIS метров, переход фиксируется после MIN_DWELL секунд
+GEOZONE_DEFAULT_HYSTERESIS = config('GEOZONE_DEFAULT_HYSTERESIS', default=25, cast=float)
+GEOZONE_MIN_DWELL_SECONDS = config('GEOZONE_MIN_DWELL_SECONDS', default=60, cast=int)
+
+# Уведомления о геозонах на один номер за это окно (секунды) объединяются в одно SMS
+GEOZONE_NOTIFICATION_WINDOW = config('GEOZONE_NOTIFICATION_WINDOW', default=60, cast=int)
+
+# Сколько секунд держать в кэше ответ публичной ссылки отслеживания
+SHARED_LOCATION_CACHE_TTL = config('SHARED_LOCATION_CACHE_TTL', default=15, cast=int)
+
+# Последняя известная точка старше этого (секунды) не подставляется в SOS без координат
+SOS_LOCATION_MAX_AGE = config('SOS_LOCATION_MAX_AGE', default=1800, cast=int)
+
+# Радиус поиска ближайших контактов при SOS (в метрах)
+SOS_RESPONDER_RADIUS = config('SOS_RESPONDER_RADIUS', default=50000, cast=int)
+# Точки старше этого (секунды) не учитываются при поиске ближайших
+NEARBY_LOCATION_MAX_AGE = config('NEARBY_LOCATION_MAX_AGE', default=3600, cast=int)
+
+# Фоновый перевод истекших ссылок и зависших таймеров в конечные статусы
+EXPIRY_SWEEP_BATCH_SIZE = config('EXPIRY_SWEEP_BATCH_SIZE', default=500, cast=int)
+ACTIVITY_TIMER_STALE_AFTER = config('ACTIVITY_TIMER_STALE_AFTER', default=3600, cast=int)
+
 SUBSCRIPTION_PLANS = {
     'personal_premium': {
         'price_monthly': 100,  
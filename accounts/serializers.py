@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from .models import SMSVerification, UserDevice
+from subscriptions.entitlements import get_entitlements
 from django.utils import timezone
 from datetime import timedelta
 from phonenumber_field.serializerfields import PhoneNumberField as PhoneNumberSerializerField
@@ -136,6 +137,8 @@ class VerifySMSSerializer(serializers.Serializer):
 
 
 class UserSerializer(serializers.ModelSerializer):
+    is_premium = serializers.SerializerMethodField()
+    
     class Meta:
         model = User
         fields = [
@@ -153,6 +156,10 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'phone_number', 'is_phone_verified', 'is_premium', 'created_at']
     
+    def get_is_premium(self, obj) -> bool:
+        """Считается по подписке при чтении, без записи в строку пользователя"""
+        return get_entitlements(obj).is_premium
+    
     def validate_telegram_username(self, value):
         """Валидация Telegram username"""
         if value:
@@ -1,3 +1,85 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from subscriptions.entitlements import sync_premium_flag
+from subscriptions.models import SubscriptionPlan, UserSubscription
+
+User = get_user_model()
+
+
+def _writes(queries):
+    return [
+        query['sql'] for query in queries
+        if query['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+    ]
+
+
+class MeEndpointTests(TestCase):
+    """GET /users/me/ только читает, is_premium пишется лишь при смене статуса подписки"""
+
+    def setUp(self):
+        cache.clear()
+        self.plan = SubscriptionPlan.objects.create(
+            name='Premium', plan_type='personal_premium', max_contacts=5
+        )
+        self.user = User.objects.create_user(phone_number='+996555000420')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _subscribe(self, days=30):
+        now = timezone.now()
+        return UserSubscription.objects.create(
+            user=self.user, plan=self.plan, start_date=now, end_date=now + timedelta(days=days)
+        )
+
+    def _user_updates(self, queries):
+        return [sql for sql in _writes(queries) if User._meta.db_table in sql]
+
+    def test_me_does_not_write(self):
+        self._subscribe()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/me/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_premium'])
+        self.assertEqual(_writes(queries.captured_queries), [])
+
+    def test_me_reports_premium_from_subscription_not_stale_flag(self):
+        User.objects.filter(pk=self.user.pk).update(is_premium=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/me/')
+
+        self.assertFalse(response.data['is_premium'])
+        self.assertEqual(_writes(queries.captured_queries), [])
+
+    def test_flag_is_written_only_on_transition(self):
+        with CaptureQueriesContext(connection) as queries:
+            subscription = self._subscribe()
+        self.assertEqual(len(self._user_updates(queries.captured_queries)), 1)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_premium)
+
+        # Сохранение без смены статуса не меняет строку пользователя
+        subscription.auto_renew = not subscription.auto_renew
+        subscription.save()
+        self.assertFalse(sync_premium_flag(self.user.id))
+
+        subscription.status = 'cancelled'
+        subscription.save()
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_premium)
+
+    def test_deleting_subscription_drops_flag(self):
+        self._subscribe().delete()
 
-# Create your tests here.
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_premium)
@@ -169,29 +169,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def me(self, request):
-        user = request.user
-        try:
-            from subscriptions.models import UserSubscription
-            from django.utils import timezone
-            
-            subscription = UserSubscription.objects.select_related('plan').get(user=user)
-            
-            if subscription.status == 'active' and subscription.end_date <= timezone.now():
-                subscription.status = 'expired'
-                subscription.save(update_fields=['status'])
-            
-            user.is_premium = (
-                subscription.status == 'active' and 
-                subscription.plan.plan_type != 'free'
-            )
-            user.save(update_fields=['is_premium'])
-            
-        except UserSubscription.DoesNotExist:
-            if user.is_premium:
-                user.is_premium = False
-                user.save(update_fields=['is_premium'])
-        
-        serializer = self.get_serializer(user)
+        serializer = self.get_serializer(request.user)
         return Response(serializer.data)
 
     @action(detail=False, methods=['put', 'patch'])
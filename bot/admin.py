@@ -4,17 +4,14 @@ from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
-from main import is_user_admin, get_premium_plan, get_bot_settings, get_user_model, create_activation_code
-from info_and_utils import generate_activation_code
+from .db import get_screen, create_activation_code
+from .info_and_utils import generate_activation_code
+
 async def show_admin_panel(query, context):
-    is_admin = await is_user_admin(query.from_user.id)
+    screen = await get_screen(context, query.from_user.id)
     
-    if not is_admin:
+    if not screen.is_admin:
         await query.answer("❌ Доступ запрещен", show_alert=True)
         return
     
@@ -35,22 +32,20 @@ async def show_admin_panel(query, context):
 
 async def generate_test_code(query, context):
     """Генерация тестового кода для админа"""
-    is_admin = await is_user_admin(query.from_user.id)
+    screen = await get_screen(context, query.from_user.id, with_plan=True)
     
-    if not is_admin:
+    if not screen.is_admin:
         await query.answer("❌ Доступ запрещен", show_alert=True)
         return
     
     try:
-        plan = await get_premium_plan()
+        plan, settings = screen.plan, screen.settings
         code = generate_activation_code()
         
         activation_code = await create_activation_code(
             code, plan, query.from_user.id, is_test=True
         )
         
-        settings = await get_bot_settings()
-        
         await query.message.edit_text(
             f"🧪 <b>Тестовый код создан!</b>\n\n"
             f"Код: <code>{code}</code>\n\n"
@@ -73,13 +68,13 @@ async def generate_test_code(query, context):
 
 async def show_admin_stats(query, context):
     """Статистика для админа"""
-    is_admin = await is_user_admin(query.from_user.id)
+    screen = await get_screen(context, query.from_user.id)
     
-    if not is_admin:
+    if not screen.is_admin:
         await query.answer("❌ Доступ запрещен", show_alert=True)
         return
     
-    settings = await get_bot_settings()
+    settings = screen.settings
     
     keyboard = [[InlineKeyboardButton("« Назад", callback_data='admin_panel')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
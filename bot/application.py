@@ -0,0 +1,39 @@
+import logging
+from django.conf import settings
+from telegram import Update
+from telegram.ext import (
+    Application, 
+    CommandHandler, 
+    CallbackQueryHandler, 
+    MessageHandler,
+    PreCheckoutQueryHandler,
+    filters,
+)
+
+from .handlers import start, button_callback, precheckout_callback, successful_payment_callback
+from .mangement import handle_code_input
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_UPDATES = Update.ALL_TYPES
+
+
+def build_application(webhook=False):
+    """
+    Собрать Application со всеми обработчиками.
+    
+    В режиме webhook Updater не нужен: обновления приходят в Django view
+    и передаются в application.process_update.
+    """
+    builder = Application.builder().token(settings.TELEGRAM_BOT_TOKEN)
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
+
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(PreCheckoutQueryHandler(precheckout_callback))
+    application.add_handler(MessageHandler(filters.SUCCESSFUL_PAYMENT, successful_payment_callback))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_code_input))
+    
+    return application
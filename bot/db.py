@@ -0,0 +1,280 @@
+"""
+Доступ бота к базе.
+
+Каждая функция здесь - один переход в поток ORM (``db_call``), поэтому
+обработчик получает все нужное экрану за один вызов. Общие для экранов
+данные (админ ли пользователь, настройки, Premium план) запоминаются на
+``context`` текущего обновления: PTB создает новый context на каждое
+обновление. Время запросов к БД суммируется по обработчику (``instrumented``).
+"""
+import time
+import secrets
+import logging
+import functools
+import contextvars
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from subscriptions.models import ActivationCode, SubscriptionPlan, BotSettings, PaymentTransaction, UserSubscription
+from notifications.models import TelegramUser
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+PREMIUM_PLAN_ID = 2
+
+
+# ==================== INSTRUMENTATION ====================
+
+@dataclass
+class DBStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+_db_stats = contextvars.ContextVar('bot_db_stats', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _db_stats.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += time.perf_counter() - started
+
+
+def db_call(func):
+    """sync_to_async с учетом запросов в статистике текущего обработчика"""
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with connection.execute_wrapper(_count_query):
+            return func(*args, **kwargs)
+    return sync_to_async(run)
+
+
+def instrumented(handler):
+    """Логировать число запросов и время БД для обработчика обновления"""
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        stats = DBStats()
+        token = _db_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            return await handler(update, context)
+        finally:
+            _db_stats.reset(token)
+            logger.debug(
+                f"⏱ {handler.__name__}: {stats.queries} запросов к БД, "
+                f"{stats.seconds * 1000:.1f} мс из {(time.perf_counter() - started) * 1000:.1f} мс"
+            )
+    return wrapper
+
+
+# ==================== SCREEN DATA ====================
+
+@dataclass(frozen=True)
+class Screen:
+    """Общие данные экранов бота для одного пользователя"""
+    is_admin: bool
+    settings: BotSettings
+    plan: Optional[SubscriptionPlan] = None
+
+
+def _premium_plan():
+    try:
+        return SubscriptionPlan.objects.get(id=PREMIUM_PLAN_ID)
+    except SubscriptionPlan.DoesNotExist:
+        return SubscriptionPlan.objects.create(
+            id=PREMIUM_PLAN_ID,
+            name='Premium',
+            plan_type='personal_premium',
+            description='Premium подписка',
+            price_monthly=100,
+            price_stars=100,
+            max_contacts=999,
+            geozones_enabled=True,
+            location_history_enabled=True
+        )
+
+
+def _load_screen(telegram_user_id, with_plan=False):
+    settings = BotSettings.get_settings()
+    return Screen(
+        is_admin=settings.is_admin(telegram_user_id),
+        settings=settings,
+        plan=_premium_plan() if with_plan else None,
+    )
+
+
+def _save_telegram_user(chat_id, username, first_name, last_name):
+    try:
+        telegram_user, created = TelegramUser.objects.update_or_create(
+            chat_id=chat_id,
+            defaults={
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+            }
+        )
+        return created
+    except Exception as e:
+        logger.error(f"❌ Ошибка сохранения пользователя: {e}")
+        return False
+
+
+async def get_screen(context, telegram_user_id, with_plan=False):
+    """Данные экрана, не более одного обращения к БД за обновление"""
+    screen = getattr(context, 'alertme_screen', None)
+    if screen is None or (with_plan and screen.plan is None):
+        screen = await db_call(_load_screen)(telegram_user_id, with_plan)
+        context.alertme_screen = screen
+    return screen
+
+
+@db_call
+def _register_and_load_screen(chat_id, user_id, username, first_name, last_name):
+    created = _save_telegram_user(chat_id, username, first_name, last_name)
+    return created, _load_screen(user_id)
+
+
+async def register_user(context, chat_id, user):
+    """Сохранить пользователя Telegram и загрузить главный экран; вернет created"""
+    created, screen = await _register_and_load_screen(
+        chat_id, user.id, user.username, user.first_name, user.last_name
+    )
+    context.alertme_screen = screen
+    return created
+
+
+# ==================== CODES & PAYMENTS ====================
+
+def _create_activation_code(code, plan, user_id, is_test=False, payment_transaction=None):
+    settings = BotSettings.get_settings()
+
+    activation_code = ActivationCode.objects.create(
+        code=code,
+        plan=plan,
+        telegram_user_id=user_id,
+        payment_amount=plan.price_stars,
+        is_active=True,
+        is_test=is_test,
+        payment_transaction=payment_transaction,
+        expires_at=timezone.now() + timedelta(hours=settings.code_expiration_hours)
+    )
+
+    # Обновляем статистику
+    BotSettings.increment('total_codes_generated')
+
+    return activation_code
+
+
+def _create_payment_transaction(user_id, plan, telegram_payment_charge_id=None):
+    try:
+        # Получаем или создаем пользователя Django по Telegram ID
+        telegram_user = TelegramUser.objects.filter(chat_id=user_id).first()
+
+        # Создаем временную подписку для транзакции
+        django_user = User.objects.first()  # Fallback пользователь
+        if telegram_user and hasattr(telegram_user, 'user'):
+            django_user = telegram_user.user
+
+        subscription, _ = UserSubscription.objects.get_or_create(
+            user=django_user,
+            defaults={
+                'plan': plan,
+                'status': 'pending',
+                'payment_period': 'monthly',
+                'start_date': timezone.now(),
+                'end_date': timezone.now() + timedelta(days=30)
+            }
+        )
+
+        transaction = PaymentTransaction.objects.create(
+            user=django_user,
+            subscription=subscription,
+            amount=plan.price_stars,
+            currency='XTR',  # Telegram Stars
+            payment_method='telegram_stars',
+            transaction_id=f'TG_{telegram_payment_charge_id or secrets.token_hex(8)}',
+            telegram_payment_charge_id=telegram_payment_charge_id,
+            telegram_user_id=user_id,
+            status='completed' if telegram_payment_charge_id else 'pending'
+        )
+
+        if telegram_payment_charge_id:
+            BotSettings.increment('total_payments_received')
+
+        return transaction
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка создания транзакции: {e}", exc_info=True)
+        return None
+
+
+@db_call
+def create_activation_code(code, plan, user_id, is_test=False, payment_transaction=None):
+    """Создание кода активации"""
+    return _create_activation_code(code, plan, user_id, is_test, payment_transaction)
+
+
+@db_call
+def issue_paid_code(code, user_id, telegram_payment_charge_id):
+    """Записать оплату и выдать код активации; вернет (код, настройки)"""
+    plan = _premium_plan()
+    transaction = _create_payment_transaction(user_id, plan, telegram_payment_charge_id)
+    activation_code = _create_activation_code(
+        code, plan, user_id, is_test=False, payment_transaction=transaction
+    )
+    return activation_code, BotSettings.get_settings()
+
+
+def _check_activation_code(code):
+    try:
+        return ActivationCode.objects.select_related('plan').get(
+            code=code,
+            is_active=True,
+            is_used=False
+        )
+    except ActivationCode.DoesNotExist:
+        return None
+
+
+# ==================== CONVERSATION STATE ====================
+# Состояние диалога хранится в базе, а не в context.user_data: в режиме
+# webhook следующее сообщение может обработать другой воркер
+
+@db_call
+def await_code_input(chat_id):
+    """Следующее текстовое сообщение чата - код активации"""
+    TelegramUser.objects.update_or_create(chat_id=chat_id, defaults={'awaiting_code': True})
+
+
+@db_call
+def take_code_input(chat_id, code):
+    """
+    Принять код, если бот его ждал; вернет (ждал ли, код активации или None).
+
+    Ожидание снимается условным UPDATE, поэтому повтор того же сообщения
+    в другом воркере код уже не проверяет.
+    """
+    if not TelegramUser.objects.filter(chat_id=chat_id, awaiting_code=True).update(awaiting_code=False):
+        return False, None
+    return True, _check_activation_code(code)
+
+
+@db_call
+def get_user_codes(telegram_user_id):
+    """Получить коды пользователя"""
+    codes = ActivationCode.objects.filter(
+        telegram_user_id=telegram_user_id
+    ).select_related('plan').order_by('-created_at')[:10]
+    return list(codes)
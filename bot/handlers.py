@@ -5,28 +5,25 @@ from telegram.ext import (
     ContextTypes
 )
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
-from main import is_user_admin, get_bot_settings,get_premium_plan, save_telegram_user, create_activation_code,create_payment_transaction
-from admin import show_admin_panel,show_admin_stats, generate_test_code
+from .db import get_screen, instrumented, issue_paid_code, register_user
+from .admin import show_admin_panel, show_admin_stats, generate_test_code
 from .mangement import show_my_codes, prompt_activate_code
-from info_and_utils import generate_activation_code, show_info
+from .info_and_utils import generate_activation_code, show_info
+
+@instrumented
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     chat_id = update.effective_chat.id
     
-    created = await save_telegram_user(
-        chat_id, user.id, user.username, user.first_name, user.last_name
-    )
+    created = await register_user(context, chat_id, user)
     
     if created:
         logger.info(f"✅ Новый пользователь: @{user.username} (ID: {user.id})")
     
-    is_admin = await is_user_admin(user.id)
-    settings = await get_bot_settings()
+    screen = await get_screen(context, user.id)
+    is_admin = screen.is_admin
+    settings = screen.settings
     
     keyboard = []
     
@@ -76,6 +73,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@instrumented
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -85,7 +83,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif query.data == 'activate_code':
         await prompt_activate_code(query, context)
     elif query.data == 'info':
-        await show_info(query)
+        await show_info(query, context)
     elif query.data == 'my_codes':
         await show_my_codes(query, context)
     elif query.data == 'admin_panel':
@@ -103,8 +101,9 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def back_to_start(query, context):
     """Возврат в главное меню"""
     user = query.from_user
-    is_admin = await is_user_admin(user.id)
-    settings = await get_bot_settings()
+    screen = await get_screen(context, user.id)
+    is_admin = screen.is_admin
+    settings = screen.settings
     
     keyboard = []
     if is_admin:
@@ -128,9 +127,8 @@ async def back_to_start(query, context):
 
 async def show_payment(query, context):
     """Показать страницу оплаты"""
-    is_admin = await is_user_admin(query.from_user.id)
-    settings = await get_bot_settings()
-    plan = await get_premium_plan()
+    screen = await get_screen(context, query.from_user.id, with_plan=True)
+    is_admin, settings, plan = screen.is_admin, screen.settings, screen.plan
     
     keyboard = [
         [InlineKeyboardButton(f"💳 Оплатить {plan.price_stars} ⭐", callback_data='confirm_payment')],
@@ -164,8 +162,8 @@ async def show_payment(query, context):
 
 async def process_payment_invoice(query, context):
     """Создание инвойса для оплаты через Telegram Stars"""
-    plan = await get_premium_plan()
-    settings = await get_bot_settings()
+    screen = await get_screen(context, query.from_user.id, with_plan=True)
+    plan, settings = screen.plan, screen.settings
     
     title = "AlertMe Premium"
     description = f"Premium подписка на {settings.subscription_days} дней"
@@ -211,6 +209,7 @@ async def precheckout_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.answer(ok=True)
 
 
+@instrumented
 async def successful_payment_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка успешного платежа"""
     payment = update.message.successful_payment
@@ -219,21 +218,12 @@ async def successful_payment_callback(update: Update, context: ContextTypes.DEFA
     logger.info(f"✅ Успешный платеж от {user_id}: {payment.telegram_payment_charge_id}")
     
     try:
-        plan = await get_premium_plan()
-        
-        # Создаем транзакцию
-        transaction = await create_payment_transaction(
-            user_id, plan, payment.telegram_payment_charge_id
-        )
-        
-        # Генерируем код активации
+        # Транзакция и код активации создаются за одно обращение к БД
         code = generate_activation_code()
-        activation_code = await create_activation_code(
-            code, plan, user_id, is_test=False, payment_transaction=transaction
+        activation_code, settings = await issue_paid_code(
+            code, user_id, payment.telegram_payment_charge_id
         )
         
-        settings = await get_bot_settings()
-        
         await update.message.reply_text(
             f"🎉 <b>Оплата успешна!</b>\n\n"
             f"Ваш код активации:\n\n"
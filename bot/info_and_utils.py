@@ -1,16 +1,13 @@
 import secrets
 import logging
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
-from main import  get_bot_settings,get_premium_plan
-async def show_info(query):
+from .db import get_screen
+
+async def show_info(query, context):
     user = query.from_user
-    settings = await get_bot_settings()
-    plan = await get_premium_plan()
+    screen = await get_screen(context, user.id, with_plan=True)
+    settings, plan = screen.settings, screen.plan
     
     info_text = (
         "ℹ️ <b>Информация об AlertMe</b>\n\n"
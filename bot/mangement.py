@@ -1,23 +1,14 @@
-import os
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, LabeledPrice
 from telegram.ext import (
     ContextTypes
 )
-import django
-from main import check_activation_code, get_user_codes 
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AlertMe.settings')
-django.setup()
-
 from django.contrib.auth import get_user_model
 
+from .db import await_code_input, get_user_codes, instrumented, take_code_input
+
 User = get_user_model()
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 async def prompt_activate_code(query, context):
@@ -28,16 +19,16 @@ async def prompt_activate_code(query, context):
         "Формат: <code>XXXX-XXXX-XXXX</code>",
         parse_mode='HTML'
     )
-    context.user_data['waiting_for_code'] = True
+    await await_code_input(query.message.chat_id)
 
 
+@instrumented
 async def handle_code_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка ввода кода"""
-    if not context.user_data.get('waiting_for_code'):
-        return
-    
     code = update.message.text.strip().upper()
-    activation = await check_activation_code(code)
+    waiting, activation = await take_code_input(update.effective_chat.id, code)
+    if not waiting:
+        return
     
     if activation:
         test_label = "  [Тестовый]" if activation.is_test else ""
@@ -55,8 +46,6 @@ async def handle_code_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Проверьте правильность ввода или купите новый код.",
             parse_mode='HTML'
         )
-    
-    context.user_data['waiting_for_code'] = False
 
 
 async def show_my_codes(query, context):
@@ -0,0 +1,30 @@
+import asyncio
+import logging
+from telegram import Update
+
+from .application import build_application
+
+logger = logging.getLogger(__name__)
+
+# Один Application на процесс веб-сервера, инициализируется при первом обновлении
+_application = None
+_lock = asyncio.Lock()
+
+
+async def get_application():
+    global _application
+    if _application is None:
+        async with _lock:
+            if _application is None:
+                application = build_application(webhook=True)
+                await application.initialize()
+                _application = application
+                logger.info("🤖 Telegram бот запущен в режиме webhook")
+    return _application
+
+
+async def process_update(data):
+    """Передать JSON обновления от Telegram в обработчики бота"""
+    application = await get_application()
+    update = Update.de_json(data, application.bot)
+    await application.process_update(update)
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import EmergencyContact, ContactGroup
-from django.conf import settings
+from subscriptions.entitlements import get_entitlements
 
 
 class EmergencyContactSerializer(serializers.ModelSerializer):
@@ -21,11 +21,7 @@ class EmergencyContactSerializer(serializers.ModelSerializer):
                 is_active=True
             ).count()
             
-            try:
-                subscription = user.subscription
-                max_contacts = subscription.plan.max_contacts
-            except:
-                max_contacts = settings.MAX_FREE_CONTACTS
+            max_contacts = get_entitlements(user).max_contacts
             
             if existing_contacts >= max_contacts:
                 raise serializers.ValidationError(
@@ -1,12 +1,13 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import LocationHistory, Geozone, GeozoneEvent, SharedLocation
+from .models import (LocationHistory, LatestLocation, LocationRollup, Stay, Trip,
+                     Geozone, GeozoneEvent, GeozoneMembership, SharedLocation)
 
 
 @admin.register(LocationHistory)
 class LocationHistoryAdmin(admin.ModelAdmin):
     list_display = ['id', 'user_phone', 'coordinates', 'accuracy', 'activity_type',
-                    'battery_level', 'timestamp']
+                    'battery_level', 'dwell_count', 'timestamp']
     list_filter = ['activity_type', 'timestamp', 'created_at']
     search_fields = ['user__phone_number', 'address']
     readonly_fields = ['created_at', 'map_display']
@@ -25,7 +26,7 @@ class LocationHistoryAdmin(admin.ModelAdmin):
             'fields': ('speed', 'heading', 'activity_type')
         }),
         ('Дополнительно', {
-            'fields': ('address', 'battery_level', 'timestamp')
+            'fields': ('address', 'battery_level', 'timestamp', 'dwell_count', 'last_seen_at')
         }),
         ('Системная информация', {
             'fields': ('created_at',),
@@ -56,6 +57,136 @@ class LocationHistoryAdmin(admin.ModelAdmin):
         return qs.select_related('user')
 
 
+@admin.register(LatestLocation)
+class LatestLocationAdmin(admin.ModelAdmin):
+    list_display = ['user_phone', 'coordinates', 'accuracy', 'activity_type',
+                    'battery_level', 'timestamp', 'last_seen_at', 'map_display']
+    list_filter = ['activity_type', 'timestamp']
+    search_fields = ['user__phone_number', 'address']
+    readonly_fields = [field.name for field in LatestLocation._meta.fields] + ['map_display']
+    ordering = ['-timestamp']
+    
+    def user_phone(self, obj):
+        return obj.user.phone_number
+    user_phone.short_description = 'Телефон'
+    
+    def coordinates(self, obj):
+        return f"{obj.latitude:.6f}, {obj.longitude:.6f}"
+    coordinates.short_description = 'Координаты'
+    
+    def map_display(self, obj):
+        return format_html(
+            '<a href="https://www.google.com/maps/search/?api=1&query={},{}" target="_blank">'
+            'Открыть на карте</a>',
+            obj.latitude, obj.longitude
+        )
+    map_display.short_description = 'Карта'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('user')
+
+
+@admin.register(LocationRollup)
+class LocationRollupAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user_phone', 'bucket_start', 'point_count', 'distance_display',
+                    'coordinates']
+    list_filter = ['bucket_start']
+    search_fields = ['user__phone_number']
+    readonly_fields = [field.name for field in LocationRollup._meta.fields]
+    ordering = ['-bucket_start']
+    
+    raw_id_fields = ['user']
+    
+    def user_phone(self, obj):
+        return obj.user.phone_number
+    user_phone.short_description = 'Телефон'
+    
+    def coordinates(self, obj):
+        return f"{obj.latitude:.6f}, {obj.longitude:.6f}"
+    coordinates.short_description = 'Центр'
+    
+    def distance_display(self, obj):
+        return f"{obj.distance / 1000:.2f} км"
+    distance_display.short_description = 'Расстояние'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('user')
+
+
+@admin.register(Stay)
+class StayAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user_phone', 'arrival', 'departure', 'duration_display',
+                    'point_count', 'is_open', 'map_display']
+    list_filter = ['is_open', 'arrival']
+    search_fields = ['user__phone_number', 'address']
+    readonly_fields = [field.name for field in Stay._meta.fields] + ['map_display']
+    ordering = ['-arrival']
+    
+    raw_id_fields = ['user']
+    
+    def user_phone(self, obj):
+        return obj.user.phone_number
+    user_phone.short_description = 'Телефон'
+    
+    def duration_display(self, obj):
+        return f"{obj.duration / 60:.0f} мин"
+    duration_display.short_description = 'Длительность'
+    
+    def map_display(self, obj):
+        return format_html(
+            '<a href="https://www.google.com/maps/search/?api=1&query={},{}" target="_blank">'
+            'Открыть на карте</a>',
+            obj.latitude, obj.longitude
+        )
+    map_display.short_description = 'Карта'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('user')
+
+
+@admin.register(Trip)
+class TripAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user_phone', 'start_time', 'end_time', 'duration_display',
+                    'distance_display', 'point_count', 'is_open']
+    list_filter = ['is_open', 'start_time']
+    search_fields = ['user__phone_number']
+    readonly_fields = [field.name for field in Trip._meta.fields]
+    ordering = ['-start_time']
+    
+    raw_id_fields = ['user']
+    
+    def user_phone(self, obj):
+        return obj.user.phone_number
+    user_phone.short_description = 'Телефон'
+    
+    def duration_display(self, obj):
+        return f"{obj.duration / 60:.0f} мин"
+    duration_display.short_description = 'Длительность'
+    
+    def distance_display(self, obj):
+        return f"{obj.distance / 1000:.2f} км"
+    distance_display.short_description = 'Расстояние'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('user')
+
+
 @admin.register(Geozone)
 class GeozoneAdmin(admin.ModelAdmin):
     list_display = ['name', 'user_phone', 'zone_type_badge', 'radius', 
@@ -74,8 +205,8 @@ class GeozoneAdmin(admin.ModelAdmin):
             'fields': ('user', 'name', 'description', 'zone_type', 'is_active')
         }),
         ('Геометрия', {
-            'fields': ('latitude', 'longitude', 'radius', 'polygon_coordinates', 
-                      'map_display')
+            'fields': ('latitude', 'longitude', 'radius', 'enter_radius', 'exit_radius',
+                      'min_dwell_seconds', 'polygon_coordinates', 'map_display')
         }),
         ('Уведомления', {
             'fields': ('notify_on_enter', 'notify_on_exit', 'emergency_contacts')
@@ -183,6 +314,30 @@ class GeozoneEventAdmin(admin.ModelAdmin):
         return qs.select_related('user', 'geozone')
 
 
+@admin.register(GeozoneMembership)
+class GeozoneMembershipAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user_phone', 'geozone_name', 'state', 'pending_state',
+                    'pending_since', 'updated_at']
+    list_filter = ['state', 'pending_state']
+    search_fields = ['user__phone_number', 'geozone__name']
+    readonly_fields = ['updated_at']
+    ordering = ['-updated_at']
+    
+    raw_id_fields = ['user', 'geozone']
+    
+    def user_phone(self, obj):
+        return obj.user.phone_number
+    user_phone.short_description = 'Телефон'
+    
+    def geozone_name(self, obj):
+        return obj.geozone.name
+    geozone_name.short_description = 'Геозона'
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('user', 'geozone')
+
+
 @admin.register(SharedLocation)
 class SharedLocationAdmin(admin.ModelAdmin):
     list_display = ['id', 'user_phone', 'shared_with_name', 'status_badge',
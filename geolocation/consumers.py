@@ -0,0 +1,77 @@
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.utils import timezone
+
+from . import sharing
+from .models import LocationHistory
+from .serializers import LocationHistorySerializer
+
+CLOSE_INVALID_TOKEN = 4404
+CLOSE_SHARE_ENDED = 4410
+
+
+class SharedLocationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live feed for a share link: ``ws/shared-locations/<token>/``.
+
+    Sends the latest points on connect, then every new point as it is
+    ingested. The socket is closed when the share is cancelled or reaches
+    its ``end_time``.
+    """
+
+    group_name = None
+    expiry_task = None
+
+    async def connect(self):
+        token = self.scope['url_route']['kwargs']['token']
+        share = await database_sync_to_async(sharing.get_active_share)(token)
+        if share is None:
+            await self.close(code=CLOSE_INVALID_TOKEN)
+            return
+
+        self.group_name = sharing.share_group_name(share['id'])
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        await self.send_json({
+            'type': 'snapshot',
+            'end_time': share['end_time'].isoformat(),
+            'locations': await self._recent_locations(share),
+        })
+
+        delay = (share['end_time'] - timezone.now()).total_seconds()
+        self.expiry_task = asyncio.ensure_future(self._expire_after(delay))
+
+    async def disconnect(self, code):
+        if self.expiry_task:
+            self.expiry_task.cancel()
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Канал только на отправку, входящие сообщения игнорируем
+        pass
+
+    async def location_point(self, event):
+        await self.send_json({'type': 'location', 'location': event['location']})
+
+    async def share_ended(self, event):
+        await self._end(event['status'])
+
+    async def _expire_after(self, delay):
+        await asyncio.sleep(max(delay, 0))
+        await self._end('expired')
+
+    async def _end(self, share_status):
+        await self.send_json({'type': 'ended', 'status': share_status})
+        await self.close(code=CLOSE_SHARE_ENDED)
+
+    @database_sync_to_async
+    def _recent_locations(self, share):
+        locations = LocationHistory.objects.filter(
+            user_id=share['user_id'],
+            timestamp__gte=share['start_time']
+        ).order_by('-timestamp')[:50]
+        return LocationHistorySerializer(locations, many=True).data
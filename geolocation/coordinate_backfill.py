@@ -0,0 +1,85 @@
+"""
+Backfill of integer microdegree coordinate columns.
+
+The switch from ``DecimalField`` coordinates to ``MicrodegreeField`` runs in
+three migrations per app: add nullable ``latitude_e6``/``longitude_e6``
+columns, backfill them, then drop the decimal columns. The backfill works on
+raw SQL so it does not depend on model state. It copies rows in keyset
+batches and only touches rows whose ``latitude_e6`` is still empty, so it can
+be interrupted and rerun at any time.
+
+For large tables, apply the first migration, run ``manage.py
+backfill_coordinates`` (it commits every batch), then apply the rest. The
+backfill migration then only picks up the remaining rows.
+"""
+import logging
+
+from .fields import MICRODEGREES
+
+logger = logging.getLogger(__name__)
+
+COORDINATE_TABLES = [
+    'geolocation_locationhistory',
+    'geolocation_geozone',
+    'geolocation_geozoneevent',
+    'sos_sosalert',
+]
+
+
+def _columns(connection, table):
+    with connection.cursor() as cursor:
+        return {
+            column.name
+            for column in connection.introspection.get_table_description(cursor, table)
+        }
+
+
+def pending_tables(connection):
+    """Tables that still have both the decimal and the microdegree columns."""
+    existing = set(connection.introspection.table_names())
+    return [
+        table for table in COORDINATE_TABLES
+        if table in existing and {'latitude', 'latitude_e6'} <= _columns(connection, table)
+    ]
+
+
+def backfill_table(connection, table, batch_size=5000, max_batches=None):
+    """Copy decimal coordinates into the microdegree columns; returns the row count."""
+    quote = connection.ops.quote_name
+    missing = 'latitude_e6 IS NULL AND latitude IS NOT NULL'
+    select_sql = (
+        f'SELECT id FROM {quote(table)} WHERE id > %s AND {missing} '
+        f'ORDER BY id LIMIT %s'
+    )
+    update_sql = (
+        f'UPDATE {quote(table)} SET '
+        f'latitude_e6 = CAST(ROUND(latitude * {MICRODEGREES}) AS INTEGER), '
+        f'longitude_e6 = CAST(ROUND(longitude * {MICRODEGREES}) AS INTEGER) '
+        f'WHERE id BETWEEN %s AND %s AND {missing}'
+    )
+
+    last_id = 0
+    batches = updated = 0
+    while max_batches is None or batches < max_batches:
+        with connection.cursor() as cursor:
+            cursor.execute(select_sql, [last_id, batch_size])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            cursor.execute(update_sql, [ids[0], ids[-1]])
+            updated += cursor.rowcount
+
+        last_id = ids[-1]
+        batches += 1
+
+    if updated:
+        logger.info(f"📐 {table}: {updated} строк переведено в микроградусы")
+    return updated
+
+
+def backfill_coordinates(connection, tables=None, batch_size=5000, max_batches=None):
+    tables = [table for table in pending_tables(connection) if tables is None or table in tables]
+    return {
+        table: backfill_table(connection, table, batch_size, max_batches)
+        for table in tables
+    }
@@ -0,0 +1,125 @@
+"""Compact encodings for location tracks (``?format=polyline`` / ``?format=columnar``)."""
+from django.db.models import Q
+
+POLYLINE_PRECISION = 5
+
+TRACK_FIELDS = ['id', 'latitude', 'longitude', 'accuracy', 'altitude',
+                'speed', 'heading', 'address', 'activity_type',
+                'battery_level', 'timestamp']
+
+COMPACT_FORMATS = ('polyline', 'columnar')
+
+
+def _encode_signed(value):
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def encode_polyline(coordinates, precision=POLYLINE_PRECISION):
+    """Encode (lat, lng) pairs with the Google encoded polyline algorithm."""
+    factor = 10 ** precision
+    prev_lat = prev_lng = 0
+    result = []
+
+    for lat, lng in coordinates:
+        lat = int(round(float(lat) * factor))
+        lng = int(round(float(lng) * factor))
+        result.append(_encode_signed(lat - prev_lat))
+        result.append(_encode_signed(lng - prev_lng))
+        prev_lat, prev_lng = lat, lng
+
+    return ''.join(result)
+
+
+def extend_polyline(encoded, previous, point, precision=POLYLINE_PRECISION):
+    """Append ``point`` to an encoded polyline whose last vertex is ``previous`` (None if empty)."""
+    if previous is None:
+        return encoded + encode_polyline([point], precision)
+
+    factor = 10 ** precision
+    (prev_lat, prev_lng), (lat, lng) = (
+        [int(round(float(value) * factor)) for value in pair] for pair in (previous, point)
+    )
+    return encoded + _encode_signed(lat - prev_lat) + _encode_signed(lng - prev_lng)
+
+
+def _epoch(value):
+    return int(value.timestamp())
+
+
+def _to_float(value):
+    return float(value) if value is not None else None
+
+
+def encode_track(rows, track_format):
+    """
+    Encode location rows (model instances or named ``values_list`` rows).
+
+    ``polyline`` returns the path plus timestamps as a start epoch and
+    per-point deltas in seconds; ``columnar`` returns parallel arrays.
+    Rows are encoded oldest first whatever order they come in, so the
+    deltas are never negative.
+    """
+    rows = sorted(rows, key=lambda row: (row.timestamp, row.id))
+
+    if track_format == 'polyline':
+        timestamps = [_epoch(row.timestamp) for row in rows]
+        return {
+            'format': 'polyline',
+            'precision': POLYLINE_PRECISION,
+            'count': len(rows),
+            'polyline': encode_polyline((row.latitude, row.longitude) for row in rows),
+            'start': timestamps[0] if timestamps else None,
+            'time_deltas': [b - a for a, b in zip(timestamps, timestamps[1:])],
+        }
+
+    columns = {field: [] for field in TRACK_FIELDS}
+    for row in rows:
+        for field in TRACK_FIELDS:
+            columns[field].append(getattr(row, field))
+
+    columns['latitude'] = [_to_float(value) for value in columns['latitude']]
+    columns['longitude'] = [_to_float(value) for value in columns['longitude']]
+    columns['timestamp'] = [_epoch(value) for value in columns['timestamp']]
+
+    return {
+        'format': 'columnar',
+        'count': len(rows),
+        'columns': columns,
+    }
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield location rows as plain dicts ordered by (timestamp, id).
+
+    Rows are read in keyset chunks, one short query each, so no cursor
+    stays open while the previous chunk is being sent.
+    """
+    queryset = queryset.order_by('timestamp', 'id')
+    after = None
+    while True:
+        page = queryset
+        if after is not None:
+            page = page.filter(Q(timestamp__gt=after[0]) | Q(timestamp=after[0], id__gt=after[1]))
+        chunk = list(page.values_list(*TRACK_FIELDS)[:chunk_size])
+
+        for values in chunk:
+            row = dict(zip(TRACK_FIELDS, values))
+            row['latitude'] = _to_float(row['latitude'])
+            row['longitude'] = _to_float(row['longitude'])
+            row['timestamp'] = row['timestamp'].isoformat()
+            yield row
+
+        if len(chunk) < chunk_size:
+            return
+        last = dict(zip(TRACK_FIELDS, chunk[-1]))
+        after = (last['timestamp'], last['id'])
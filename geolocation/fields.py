@@ -0,0 +1,46 @@
+"""
+Fixed-point coordinate storage.
+
+``MicrodegreeField`` stores a coordinate as an integer number of
+microdegrees (1e-6°, about 11 cm) and exposes it to Python as a float, so
+geo code works on floats instead of ``Decimal`` objects and rows and indexes
+stay small.
+"""
+from django.db import models
+from rest_framework import serializers
+
+MICRODEGREES = 1_000_000
+
+
+def to_microdegrees(value):
+    return int(round(float(value) * MICRODEGREES))
+
+
+class MicrodegreeField(models.FloatField):
+    description = 'Coordinate stored as integer microdegrees'
+
+    def get_internal_type(self):
+        return 'IntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return value / MICRODEGREES
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        return to_microdegrees(value)
+
+
+class CoordinateField(serializers.FloatField):
+    """
+    Serializer counterpart of ``MicrodegreeField``.
+
+    Renders a fixed six-decimal string, as the ``DecimalField`` coordinates
+    did before, so the API format does not change.
+    """
+
+    def to_representation(self, value):
+        return f'{float(value):.6f}'
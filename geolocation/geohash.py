@@ -0,0 +1,74 @@
+"""Geohash encoding and grid helpers for proximity lookups."""
+from math import cos, radians
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+DEFAULT_PRECISION = 9
+METERS_PER_DEGREE = 111_320
+
+
+def encode(latitude, longitude, precision=DEFAULT_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+
+    chars = []
+    bit = value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coordinate >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(BASE32[value])
+            bit = value = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(lat_degrees, lon_degrees) covered by one cell of the given precision."""
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def precision_for_radius(radius, latitude=0.0):
+    """
+    Longest precision whose cells are at least ``radius`` meters on each side,
+    so that a cell and its eight neighbours cover the whole search circle.
+    """
+    shrink = max(cos(radians(float(latitude))), 0.01)
+    for precision in range(DEFAULT_PRECISION, 0, -1):
+        lat_deg, lon_deg = cell_size(precision)
+        if min(lat_deg, lon_deg * shrink) * METERS_PER_DEGREE >= radius:
+            return precision
+    return 1
+
+
+def covering_cells(latitude, longitude, precision):
+    """The cell containing the point plus its eight neighbours."""
+    lat_deg, lon_deg = cell_size(precision)
+    cells = set()
+    for dlat in (-lat_deg, 0, lat_deg):
+        lat = min(max(float(latitude) + dlat, -89.999999), 89.999999)
+        for dlon in (-lon_deg, 0, lon_deg):
+            lon = (float(longitude) + dlon + 180) % 360 - 180
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def prefix_range(prefix, length=DEFAULT_PRECISION):
+    """
+    Inclusive (low, high) bounds of all hashes starting with ``prefix``.
+
+    A range scan uses a plain B-tree index on every backend, unlike LIKE.
+    """
+    return prefix, prefix + BASE32[-1] * (length - len(prefix))
@@ -0,0 +1,114 @@
+"""
+Skip-ahead bounds for geozone evaluation.
+
+After each evaluation the distance from the evaluated point to the nearest
+zone boundary is cached per user. A later point cannot have crossed any
+boundary while ``elapsed seconds × GEOZONE_SKIP_MAX_SPEED`` is below that
+margin, so ``check_geozone_events`` skips it. The margin is dropped whenever
+one of the user's geozones changes.
+
+While a debounced transition is pending (see ``GeozoneMembership``) every
+fix has to be evaluated, so skipping and ingest merging are disabled.
+
+The enter/exit radii of the user's active zones are cached as well, for the
+reporting interval computed on every ingest.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Geozone
+
+HITS_KEY = 'geozone_skip:hits'
+MISSES_KEY = 'geozone_skip:misses'
+
+
+def _margin_key(user_id):
+    return f'geozone_margin:{user_id}'
+
+
+def _pending_key(user_id):
+    return f'geozone_pending:{user_id}'
+
+
+def _boundaries_key(user_id):
+    return f'geozone_boundaries:{user_id}'
+
+
+def set_pending(user_id, pending):
+    if pending:
+        cache.set(_pending_key(user_id), True, getattr(settings, 'GEOZONE_MARGIN_TTL', 3600))
+    else:
+        cache.delete(_pending_key(user_id))
+
+
+def has_pending(user_id):
+    return bool(cache.get(_pending_key(user_id)))
+
+
+def can_skip(user_id, timestamp):
+    """True if no zone boundary is reachable since the last evaluation."""
+    if has_pending(user_id):
+        return False
+
+    cached = cache.get(_margin_key(user_id))
+    if cached is None:
+        return False
+
+    margin, evaluated_at = cached
+    if margin is None:
+        # У пользователя нет активных зон
+        return True
+
+    elapsed = abs((timestamp - evaluated_at).total_seconds())
+    return elapsed * getattr(settings, 'GEOZONE_SKIP_MAX_SPEED', 50) < margin
+
+
+def set_margin(user_id, margin, timestamp):
+    cache.set(_margin_key(user_id), (margin, timestamp), getattr(settings, 'GEOZONE_MARGIN_TTL', 3600))
+
+
+def invalidate_margin(user_id):
+    cache.delete(_margin_key(user_id))
+
+
+def get_boundaries(user_id):
+    """``[(latitude, longitude, enter_radius, exit_radius), ...]`` of the user's active zones."""
+    boundaries = cache.get(_boundaries_key(user_id))
+    if boundaries is None:
+        boundaries = [
+            (zone.latitude, zone.longitude, zone.get_enter_radius(), zone.get_exit_radius())
+            for zone in Geozone.objects.filter(user_id=user_id, is_active=True)
+        ]
+        cache.set(_boundaries_key(user_id), boundaries, getattr(settings, 'GEOZONE_MARGIN_TTL', 3600))
+    return boundaries
+
+
+def invalidate_boundaries(user_id):
+    cache.delete(_boundaries_key(user_id))
+
+
+def _incr(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def record_hit():
+    _incr(HITS_KEY)
+
+
+def record_miss():
+    _incr(MISSES_KEY)
+
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
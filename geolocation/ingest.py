@@ -0,0 +1,79 @@
+"""
+Ingest filter for incoming location fixes.
+
+A fix that is close to the user's last stored point is merged into that
+point instead of being written as a new row: the stored point's
+``dwell_count`` is incremented and ``last_seen_at`` moves forward. Merged
+fixes skip geozone evaluation, because the position has not changed.
+
+"Close" is accuracy-aware: the distance threshold is the worse accuracy of
+the two fixes, bounded by ``LOCATION_DEDUP_MIN_DISTANCE`` and
+``LOCATION_DEDUP_MAX_DISTANCE``. A fix is always stored when it reports a
+speed above ``LOCATION_DEDUP_MAX_SPEED``, changes ``activity_type``, arrives
+out of order, or comes more than ``LOCATION_DEDUP_MAX_INTERVAL`` seconds
+after the last merged fix, so real movement and a sparse heartbeat for idle
+users are still kept. Nothing is merged while a geozone transition is
+pending, so the dwell timer keeps advancing.
+"""
+from django.conf import settings
+from django.db.models import F
+
+from .geozone_cache import has_pending
+from .models import LocationHistory
+from .tasks import calculate_distance
+
+
+def merge_duplicate_location(user, data):
+    """
+    Merge validated fix ``data`` into the user's last point if it is a duplicate.
+
+    Returns the updated ``LocationHistory`` or None when the fix has to be stored.
+    """
+    if not getattr(settings, 'LOCATION_DEDUP_ENABLED', True):
+        return None
+
+    if has_pending(user.id):
+        return None
+
+    speed = data.get('speed')
+    if speed is not None and speed > getattr(settings, 'LOCATION_DEDUP_MAX_SPEED', 1.0):
+        return None
+
+    last = LocationHistory.objects.filter(user=user).order_by('-timestamp').first()
+    if last is None:
+        return None
+
+    if data.get('activity_type', '') != last.activity_type:
+        return None
+
+    elapsed = (data['timestamp'] - (last.last_seen_at or last.timestamp)).total_seconds()
+    if elapsed < 0 or elapsed > getattr(settings, 'LOCATION_DEDUP_MAX_INTERVAL', 600):
+        return None
+
+    threshold = max(
+        getattr(settings, 'LOCATION_DEDUP_MIN_DISTANCE', 15),
+        last.accuracy,
+        data['accuracy'],
+    )
+    threshold = min(threshold, getattr(settings, 'LOCATION_DEDUP_MAX_DISTANCE', 75))
+    distance = calculate_distance(last.latitude, last.longitude, data['latitude'], data['longitude'])
+    if distance > threshold:
+        return None
+
+    updates = {
+        'dwell_count': F('dwell_count') + 1,
+        'last_seen_at': data['timestamp'],
+    }
+    # Более точная фиксация уточняет координаты сохранённой точки
+    if data['accuracy'] < last.accuracy:
+        updates.update(
+            latitude=data['latitude'],
+            longitude=data['longitude'],
+            accuracy=data['accuracy'],
+        )
+    if data.get('battery_level') is not None:
+        updates['battery_level'] = data['battery_level']
+
+    LocationHistory.objects.filter(id=last.id).update(**updates)
+    last.refresh_from_db()
+    return last
@@ -0,0 +1,113 @@
+"""
+Maintenance of ``LatestLocation``, the one-row-per-user current position.
+
+Ingest upserts the row with a conditional update, so a fix older than the
+stored one (out-of-order delivery, offline batches) never moves it back.
+A fix merged into the stored point (see ``ingest``) keeps its ``timestamp``
+and only moves ``last_seen_at``; freshness checks use ``last_seen_at``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import geohash
+from .models import LatestLocation, LocationHistory
+
+LATEST_FIELDS = ['latitude', 'longitude', 'accuracy', 'altitude', 'speed',
+                 'heading', 'address', 'activity_type', 'battery_level', 'timestamp']
+
+
+def _values(location):
+    values = {field: getattr(location, field) for field in LATEST_FIELDS}
+    values['location_id'] = location.id
+    # Слитые точки не меняют timestamp, только last_seen_at
+    values['last_seen_at'] = max(location.timestamp, location.last_seen_at or location.timestamp)
+    values['geohash'] = geohash.encode(location.latitude, location.longitude)
+    return values
+
+
+def update_latest_location(location):
+    """Upsert the user's latest position from a stored fix; returns True if it moved."""
+    values = _values(location)
+    values['updated_at'] = timezone.now()
+    newer_or_same = LatestLocation.objects.filter(
+        user_id=location.user_id,
+        timestamp__lte=location.timestamp
+    )
+
+    if newer_or_same.update(**values):
+        return True
+
+    _, created = LatestLocation.objects.get_or_create(user_id=location.user_id, defaults=values)
+    if created:
+        return True
+
+    # Строку мог создать параллельный запрос с более старой точкой
+    return bool(newer_or_same.update(**values))
+
+
+def refresh_latest_location(user_id):
+    """Rebuild the user's row from history, e.g. after a point was deleted."""
+    location = LocationHistory.objects.filter(user_id=user_id).order_by('-timestamp', '-id').first()
+    if location is None:
+        LatestLocation.objects.filter(user_id=user_id).delete()
+        return None
+
+    values = _values(location)
+    latest, _ = LatestLocation.objects.update_or_create(user_id=user_id, defaults=values)
+    return latest
+
+
+def get_latest_location(user_id):
+    return LatestLocation.objects.filter(user_id=user_id).first()
+
+
+def get_current_location(user_id):
+    """
+    The user's most recent ``LocationHistory`` row, found through ``LatestLocation``.
+
+    One joined lookup by primary key; falls back to scanning history when the
+    referenced point is gone (e.g. rolled up by retention).
+    """
+    latest = LatestLocation.objects.select_related('location').filter(user_id=user_id).first()
+    if latest is None:
+        return None
+    if latest.location is not None:
+        return latest.location
+    return LocationHistory.objects.filter(user_id=user_id).order_by('-timestamp', '-id').first()
+
+
+def get_latest_locations(user_ids):
+    """Latest positions for many users in one query, as ``{user_id: LatestLocation}``."""
+    return {
+        latest.user_id: latest
+        for latest in LatestLocation.objects.filter(user_id__in=user_ids)
+    }
+
+
+def fill_sos_location(data, user_id):
+    """
+    Fill missing SOS coordinates in ``data`` from the user's latest position.
+
+    Used when the app raises an SOS without a fresh fix (no GPS indoors,
+    timer expiry on the server). A position last seen more than
+    SOS_LOCATION_MAX_AGE seconds ago is not used; the last-seen time goes into
+    ``location_timestamp`` so contacts see how old the position is.
+    Returns True if coordinates were filled.
+    """
+    latest = get_latest_location(user_id)
+    if latest is None:
+        return False
+
+    max_age = getattr(settings, 'SOS_LOCATION_MAX_AGE', 1800)
+    if latest.last_seen_at < timezone.now() - timedelta(seconds=max_age):
+        return False
+
+    data['latitude'] = latest.latitude
+    data['longitude'] = latest.longitude
+    data['location_accuracy'] = latest.accuracy
+    data['location_timestamp'] = latest.last_seen_at
+    if not data.get('address'):
+        data['address'] = latest.address
+    return True
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from geolocation.retention import archive_rollups, rollup_raw_locations
+
+
+class Command(BaseCommand):
+    help = 'Сворачивание старой истории местоположений в почасовые сводки и архивация'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Размер пакета (по умолчанию LOCATION_RETENTION_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Максимум пакетов за запуск (по умолчанию - до конца)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        max_batches = options['max_batches']
+        
+        self.stdout.write(self.style.WARNING('='*60))
+        self.stdout.write(self.style.WARNING('📦 ХРАНЕНИЕ ИСТОРИИ МЕСТОПОЛОЖЕНИЙ'))
+        self.stdout.write(self.style.WARNING('='*60))
+        
+        self.stdout.write(f"\n🗓️ Сырые точки: {settings.LOCATION_RAW_RETENTION_DAYS} дней")
+        self.stdout.write(f"🗓️ Сводки: {settings.LOCATION_ROLLUP_RETENTION_DAYS} дней")
+        self.stdout.write(f"🗄️ Архив: {settings.LOCATION_ARCHIVE_DIR}\n")
+        
+        points = rollup_raw_locations(batch_size=batch_size, max_batches=max_batches)
+        self.stdout.write(self.style.SUCCESS(f"✅ Свернуто точек: {points}"))
+        
+        rollups = archive_rollups(batch_size=batch_size, max_batches=max_batches)
+        self.stdout.write(self.style.SUCCESS(f"✅ Заархивировано сводок: {rollups}"))
+        
+        self.stdout.write('='*60 + '\n')
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from geolocation.coordinate_backfill import backfill_table, pending_tables
+
+
+class Command(BaseCommand):
+    help = 'Перенос координат в целочисленные столбцы (микроградусы), можно перезапускать'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Размер пакета (по умолчанию 5000)'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Максимум пакетов на таблицу за запуск (по умолчанию - до конца)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('='*60))
+        self.stdout.write(self.style.WARNING('📐 ПЕРЕНОС КООРДИНАТ В МИКРОГРАДУСЫ'))
+        self.stdout.write(self.style.WARNING('='*60))
+
+        tables = pending_tables(connection)
+        if not tables:
+            self.stdout.write(self.style.SUCCESS(
+                "\n✅ Переносить нечего: столбцы уже переведены или ещё не добавлены"
+            ))
+            self.stdout.write('='*60 + '\n')
+            return
+
+        for table in tables:
+            updated = backfill_table(
+                connection,
+                table,
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches']
+            )
+            self.stdout.write(self.style.SUCCESS(f"✅ {table}: {updated} строк"))
+
+        self.stdout.write('='*60 + '\n')
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from geolocation.tasks import flush_geozone_notifications
+
+
+class Command(BaseCommand):
+    help = 'Отправка накопившихся уведомлений о геозонах (запуск из cron раз в минуту)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=None,
+            help='Отправлять уведомления старше N секунд (по умолчанию GEOZONE_NOTIFICATION_WINDOW)'
+        )
+
+    def handle(self, *args, **options):
+        min_age = options['min_age']
+        if min_age is None:
+            min_age = settings.GEOZONE_NOTIFICATION_WINDOW
+        
+        sent = flush_geozone_notifications(min_age=min_age)
+        self.stdout.write(self.style.SUCCESS(f"✅ Отправлено уведомлений о геозонах: {sent}"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from geolocation.models import LocationHistory
+from geolocation.segments import rebuild_segments
+
+
+class Command(BaseCommand):
+    help = 'Пересчет остановок и поездок по истории геолокации'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            default=None,
+            help='Только для одного пользователя (по умолчанию - для всех)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('='*60))
+        self.stdout.write(self.style.WARNING('🧭 ПЕРЕСЧЕТ ОСТАНОВОК И ПОЕЗДОК'))
+        self.stdout.write(self.style.WARNING('='*60))
+
+        if options['user_id']:
+            user_ids = [options['user_id']]
+        else:
+            user_ids = LocationHistory.objects.values_list('user_id', flat=True).distinct().order_by()
+
+        users = points = 0
+        for user_id in user_ids:
+            points += rebuild_segments(user_id)
+            users += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ Пользователей: {users}, точек обработано: {points}"
+        ))
+        self.stdout.write('='*60 + '\n')
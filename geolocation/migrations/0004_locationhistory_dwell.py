@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0003_locationrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locationhistory',
+            name='dwell_count',
+            field=models.PositiveIntegerField(default=1, help_text='Number of fixes merged into this point'),
+        ),
+        migrations.AddField(
+            model_name='locationhistory',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, help_text='Timestamp of the last merged fix', null=True),
+        ),
+    ]
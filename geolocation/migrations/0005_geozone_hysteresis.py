@@ -0,0 +1,48 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0004_locationhistory_dwell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geozone',
+            name='enter_radius',
+            field=models.FloatField(blank=True, help_text='Radius for entering in meters, defaults to radius', null=True),
+        ),
+        migrations.AddField(
+            model_name='geozone',
+            name='exit_radius',
+            field=models.FloatField(blank=True, help_text='Radius for exiting in meters, defaults to radius plus hysteresis', null=True),
+        ),
+        migrations.AddField(
+            model_name='geozone',
+            name='min_dwell_seconds',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds a transition must hold before it is committed', null=True),
+        ),
+        migrations.CreateModel(
+            name='GeozoneMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('inside', 'Inside'), ('outside', 'Outside')], default='outside', max_length=10)),
+                ('pending_state', models.CharField(blank=True, choices=[('inside', 'Inside'), ('outside', 'Outside')], max_length=10)),
+                ('pending_since', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('geozone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='geolocation.geozone')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geozone_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Geozone Membership',
+                'verbose_name_plural': 'Geozone Memberships',
+                'unique_together': {('user', 'geozone')},
+            },
+        ),
+    ]
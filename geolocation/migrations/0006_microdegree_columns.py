@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:10
+
+from django.db import migrations
+import geolocation.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0005_geozone_hysteresis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locationhistory',
+            name='latitude_e6',
+            field=geolocation.fields.MicrodegreeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='locationhistory',
+            name='longitude_e6',
+            field=geolocation.fields.MicrodegreeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geozone',
+            name='latitude_e6',
+            field=geolocation.fields.MicrodegreeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geozone',
+            name='longitude_e6',
+            field=geolocation.fields.MicrodegreeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geozoneevent',
+            name='latitude_e6',
+            field=geolocation.fields.MicrodegreeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='geozoneevent',
+            name='longitude_e6',
+            field=geolocation.fields.MicrodegreeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:10
+
+from django.db import migrations
+import geolocation.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0007_backfill_microdegrees'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='locationhistory',
+            name='latitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='locationhistory',
+                    name='latitude_e6',
+                ),
+                migrations.AddField(
+                    model_name='locationhistory',
+                    name='latitude',
+                    field=geolocation.fields.MicrodegreeField(blank=True, db_column='latitude_e6', null=True),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='locationhistory',
+            name='latitude',
+            field=geolocation.fields.MicrodegreeField(db_column='latitude_e6'),
+        ),
+        migrations.RemoveField(
+            model_name='locationhistory',
+            name='longitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='locationhistory',
+                    name='longitude_e6',
+                ),
+                migrations.AddField(
+                    model_name='locationhistory',
+                    name='longitude',
+                    field=geolocation.fields.MicrodegreeField(blank=True, db_column='longitude_e6', null=True),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='locationhistory',
+            name='longitude',
+            field=geolocation.fields.MicrodegreeField(db_column='longitude_e6'),
+        ),
+        migrations.RemoveField(
+            model_name='geozone',
+            name='latitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='geozone',
+                    name='latitude_e6',
+                ),
+                migrations.AddField(
+                    model_name='geozone',
+                    name='latitude',
+                    field=geolocation.fields.MicrodegreeField(blank=True, db_column='latitude_e6', null=True),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='geozone',
+            name='latitude',
+            field=geolocation.fields.MicrodegreeField(db_column='latitude_e6'),
+        ),
+        migrations.RemoveField(
+            model_name='geozone',
+            name='longitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='geozone',
+                    name='longitude_e6',
+                ),
+                migrations.AddField(
+                    model_name='geozone',
+                    name='longitude',
+                    field=geolocation.fields.MicrodegreeField(blank=True, db_column='longitude_e6', null=True),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='geozone',
+            name='longitude',
+            field=geolocation.fields.MicrodegreeField(db_column='longitude_e6'),
+        ),
+        migrations.RemoveField(
+            model_name='geozoneevent',
+            name='latitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='geozoneevent',
+                    name='latitude_e6',
+                ),
+                migrations.AddField(
+                    model_name='geozoneevent',
+                    name='latitude',
+                    field=geolocation.fields.MicrodegreeField(blank=True, db_column='latitude_e6', null=True),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='geozoneevent',
+            name='latitude',
+            field=geolocation.fields.MicrodegreeField(db_column='latitude_e6'),
+        ),
+        migrations.RemoveField(
+            model_name='geozoneevent',
+            name='longitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='geozoneevent',
+                    name='longitude_e6',
+                ),
+                migrations.AddField(
+                    model_name='geozoneevent',
+                    name='longitude',
+                    field=geolocation.fields.MicrodegreeField(blank=True, db_column='longitude_e6', null=True),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='geozoneevent',
+            name='longitude',
+            field=geolocation.fields.MicrodegreeField(db_column='longitude_e6'),
+        ),
+    ]
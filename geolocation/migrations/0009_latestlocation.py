@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:05
+
+import django.db.models.deletion
+import geolocation.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_groups_alter_user_user_permissions'),
+        ('geolocation', '0008_switch_to_microdegrees'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestLocation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_location', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('latitude', geolocation.fields.MicrodegreeField(db_column='latitude_e6')),
+                ('longitude', geolocation.fields.MicrodegreeField(db_column='longitude_e6')),
+                ('accuracy', models.FloatField(help_text='Location accuracy in meters')),
+                ('altitude', models.FloatField(blank=True, null=True)),
+                ('speed', models.FloatField(blank=True, help_text='Speed in m/s', null=True)),
+                ('heading', models.FloatField(blank=True, help_text='Heading in degrees', null=True)),
+                ('address', models.TextField(blank=True)),
+                ('activity_type', models.CharField(blank=True, max_length=50)),
+                ('battery_level', models.IntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='geolocation.locationhistory')),
+            ],
+            options={
+                'verbose_name': 'Latest Location',
+                'verbose_name_plural': 'Latest Locations',
+            },
+        ),
+    ]
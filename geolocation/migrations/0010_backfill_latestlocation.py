@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:20
+
+from django.db import migrations
+
+LATEST_FIELDS = ['latitude', 'longitude', 'accuracy', 'altitude', 'speed',
+                 'heading', 'address', 'activity_type', 'battery_level', 'timestamp']
+
+
+def backfill(apps, schema_editor):
+    LocationHistory = apps.get_model('geolocation', 'LocationHistory')
+    LatestLocation = apps.get_model('geolocation', 'LatestLocation')
+
+    user_ids = LocationHistory.objects.values_list('user_id', flat=True).distinct().order_by()
+    batch = []
+    for user_id in user_ids.iterator():
+        location = LocationHistory.objects.filter(user_id=user_id).order_by('-timestamp', '-id').first()
+        batch.append(LatestLocation(
+            user_id=user_id,
+            location_id=location.id,
+            **{field: getattr(location, field) for field in LATEST_FIELDS}
+        ))
+        if len(batch) >= 1000:
+            LatestLocation.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    LatestLocation.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0009_latestlocation'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
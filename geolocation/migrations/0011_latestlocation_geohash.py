@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:45
+
+from django.db import migrations, models
+
+from geolocation import geohash
+
+
+def backfill(apps, schema_editor):
+    LatestLocation = apps.get_model('geolocation', 'LatestLocation')
+
+    batch = []
+    for latest in LatestLocation.objects.filter(geohash='').iterator():
+        latest.geohash = geohash.encode(latest.latitude, latest.longitude)
+        batch.append(latest)
+        if len(batch) >= 1000:
+            LatestLocation.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    LatestLocation.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0010_backfill_latestlocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='latestlocation',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
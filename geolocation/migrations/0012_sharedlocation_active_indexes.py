@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0002_emergencycontact_telegram_username'),
+        ('geolocation', '0011_latestlocation_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sharedlocation',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['end_time'], name='sharedloc_active_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sharedlocation',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['user', 'end_time'], name='sharedloc_active_user_idx'),
+        ),
+    ]
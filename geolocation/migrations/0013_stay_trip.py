@@ -0,0 +1,70 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:30
+
+import django.db.models.deletion
+import geolocation.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0012_sharedlocation_active_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Stay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', geolocation.fields.MicrodegreeField(db_column='latitude_e6')),
+                ('longitude', geolocation.fields.MicrodegreeField(db_column='longitude_e6')),
+                ('address', models.TextField(blank=True)),
+                ('arrival', models.DateTimeField()),
+                ('departure', models.DateTimeField(help_text='Time of the last fix at this place')),
+                ('point_count', models.PositiveIntegerField(default=1)),
+                ('is_open', models.BooleanField(default=True, help_text='The user is still here')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stays', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stay',
+                'verbose_name_plural': 'Stays',
+                'ordering': ['-arrival'],
+                'indexes': [models.Index(fields=['user', '-arrival'], name='geolocation_user_id_9e9e65_idx'), models.Index(condition=models.Q(('is_open', True)), fields=['user'], name='stay_open_user_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Trip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('start_latitude', geolocation.fields.MicrodegreeField(db_column='start_latitude_e6')),
+                ('start_longitude', geolocation.fields.MicrodegreeField(db_column='start_longitude_e6')),
+                ('end_latitude', geolocation.fields.MicrodegreeField(db_column='end_latitude_e6')),
+                ('end_longitude', geolocation.fields.MicrodegreeField(db_column='end_longitude_e6')),
+                ('distance', models.FloatField(default=0, help_text='Distance travelled in meters')),
+                ('path', models.TextField(blank=True, help_text='Encoded polyline of the simplified path')),
+                ('point_count', models.PositiveIntegerField(default=1)),
+                ('is_open', models.BooleanField(default=True, help_text='The user is still moving')),
+                ('anchor_latitude', geolocation.fields.MicrodegreeField(db_column='anchor_latitude_e6')),
+                ('anchor_longitude', geolocation.fields.MicrodegreeField(db_column='anchor_longitude_e6')),
+                ('anchor_time', models.DateTimeField()),
+                ('anchor_distance', models.FloatField(default=0)),
+                ('anchor_path_length', models.PositiveIntegerField(default=0)),
+                ('anchor_point_count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trips', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trip',
+                'verbose_name_plural': 'Trips',
+                'ordering': ['-start_time'],
+                'indexes': [models.Index(fields=['user', '-start_time'], name='geolocation_user_id_c63be6_idx'), models.Index(condition=models.Q(('is_open', True)), fields=['user'], name='trip_open_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:10
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill(apps, schema_editor):
+    LocationHistory = apps.get_model('geolocation', 'LocationHistory')
+    LatestLocation = apps.get_model('geolocation', 'LatestLocation')
+
+    merged_until = LocationHistory.objects.filter(pk=OuterRef('location_id')).values('last_seen_at')[:1]
+    LatestLocation.objects.update(
+        last_seen_at=Greatest(F('timestamp'), Coalesce(Subquery(merged_until), F('timestamp')))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0013_stay_trip'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='latestlocation',
+            name='last_seen_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='latestlocation',
+            name='last_seen_at',
+            field=models.DateTimeField(help_text='Time of the last fix at this position, merged fixes included'),
+        ),
+    ]
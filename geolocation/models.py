@@ -3,11 +3,13 @@ from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from .fields import MicrodegreeField
+
 
 class LocationHistory(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='location_history')
-    latitude = models.DecimalField(max_digits=12, decimal_places=8)
-    longitude = models.DecimalField(max_digits=12, decimal_places=8)
+    latitude = MicrodegreeField(db_column='latitude_e6')
+    longitude = MicrodegreeField(db_column='longitude_e6')
     accuracy = models.FloatField(help_text=_('Location accuracy in meters'))
     altitude = models.FloatField(null=True, blank=True)
     speed = models.FloatField(null=True, blank=True, help_text=_('Speed in m/s'))
@@ -23,6 +25,8 @@ class LocationHistory(models.Model):
     
     battery_level = models.IntegerField(null=True, blank=True)
     timestamp = models.DateTimeField()
+    dwell_count = models.PositiveIntegerField(default=1, help_text=_('Number of fixes merged into this point'))
+    last_seen_at = models.DateTimeField(null=True, blank=True, help_text=_('Timestamp of the last merged fix'))
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -38,6 +42,111 @@ class LocationHistory(models.Model):
         return f"{self.user.phone_number} at {self.timestamp}"
 
 
+class LatestLocation(models.Model):
+    """Most recent fix per user, kept in sync on ingest."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                primary_key=True, related_name='latest_location')
+    location = models.ForeignKey(LocationHistory, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='+')
+    latitude = MicrodegreeField(db_column='latitude_e6')
+    longitude = MicrodegreeField(db_column='longitude_e6')
+    accuracy = models.FloatField(help_text=_('Location accuracy in meters'))
+    altitude = models.FloatField(null=True, blank=True)
+    speed = models.FloatField(null=True, blank=True, help_text=_('Speed in m/s'))
+    heading = models.FloatField(null=True, blank=True, help_text=_('Heading in degrees'))
+    address = models.TextField(blank=True)
+    activity_type = models.CharField(max_length=50, blank=True)
+    battery_level = models.IntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+    last_seen_at = models.DateTimeField(help_text=_('Time of the last fix at this position, merged fixes included'))
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Latest Location')
+        verbose_name_plural = _('Latest Locations')
+
+    def __str__(self):
+        return f"{self.user.phone_number} at {self.timestamp}"
+
+
+class Stay(models.Model):
+    """A place the user stayed at, built incrementally by ``segments``."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stays')
+    latitude = MicrodegreeField(db_column='latitude_e6')
+    longitude = MicrodegreeField(db_column='longitude_e6')
+    address = models.TextField(blank=True)
+    arrival = models.DateTimeField()
+    departure = models.DateTimeField(help_text=_('Time of the last fix at this place'))
+    point_count = models.PositiveIntegerField(default=1)
+    is_open = models.BooleanField(default=True, help_text=_('The user is still here'))
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Stay')
+        verbose_name_plural = _('Stays')
+        ordering = ['-arrival']
+        indexes = [
+            models.Index(fields=['user', '-arrival']),
+            models.Index(fields=['user'], condition=models.Q(is_open=True), name='stay_open_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.phone_number} stay at {self.arrival}"
+
+    @property
+    def duration(self):
+        return (self.departure - self.arrival).total_seconds()
+
+
+class Trip(models.Model):
+    """
+    Movement between two stays, built incrementally by ``segments``.
+
+    ``path`` is an encoded polyline simplified on ingest. The ``anchor_*``
+    fields hold the segmenter state of an open trip: the point where the
+    user may have stopped, and the trip's distance and path length at it.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='trips')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    start_latitude = MicrodegreeField(db_column='start_latitude_e6')
+    start_longitude = MicrodegreeField(db_column='start_longitude_e6')
+    end_latitude = MicrodegreeField(db_column='end_latitude_e6')
+    end_longitude = MicrodegreeField(db_column='end_longitude_e6')
+    distance = models.FloatField(default=0, help_text=_('Distance travelled in meters'))
+    path = models.TextField(blank=True, help_text=_('Encoded polyline of the simplified path'))
+    point_count = models.PositiveIntegerField(default=1)
+    is_open = models.BooleanField(default=True, help_text=_('The user is still moving'))
+
+    anchor_latitude = MicrodegreeField(db_column='anchor_latitude_e6')
+    anchor_longitude = MicrodegreeField(db_column='anchor_longitude_e6')
+    anchor_time = models.DateTimeField()
+    anchor_distance = models.FloatField(default=0)
+    anchor_path_length = models.PositiveIntegerField(default=0)
+    anchor_point_count = models.PositiveIntegerField(default=1)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Trip')
+        verbose_name_plural = _('Trips')
+        ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['user', '-start_time']),
+            models.Index(fields=['user'], condition=models.Q(is_open=True), name='trip_open_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.phone_number} trip at {self.start_time}"
+
+    @property
+    def duration(self):
+        return (self.end_time - self.start_time).total_seconds()
+
+
 class Geozone(models.Model):
     ZONE_TYPE_CHOICES = [
         ('safe', 'Safe Zone'),
@@ -49,9 +158,15 @@ class Geozone(models.Model):
     name = models.CharField(max_length=255, verbose_name=_('Zone Name'))
     description = models.TextField(blank=True)
     zone_type = models.CharField(max_length=20, choices=ZONE_TYPE_CHOICES, default='safe')
-    latitude = models.DecimalField(max_digits=9, decimal_places=6)
-    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    latitude = MicrodegreeField(db_column='latitude_e6')
+    longitude = MicrodegreeField(db_column='longitude_e6')
     radius = models.FloatField(help_text=_('Radius in meters'))
+    enter_radius = models.FloatField(null=True, blank=True,
+                                     help_text=_('Radius for entering in meters, defaults to radius'))
+    exit_radius = models.FloatField(null=True, blank=True,
+                                    help_text=_('Radius for exiting in meters, defaults to radius plus hysteresis'))
+    min_dwell_seconds = models.PositiveIntegerField(null=True, blank=True,
+                                                    help_text=_('Seconds a transition must hold before it is committed'))
     polygon_coordinates = models.JSONField(null=True, blank=True, 
                                           help_text=_('Array of [lat, lng] coordinates'))
     
@@ -74,6 +189,33 @@ class Geozone(models.Model):
     def __str__(self):
         return f"{self.name} ({self.zone_type})"
 
+    def get_enter_radius(self):
+        return self.enter_radius if self.enter_radius is not None else self.radius
+
+    def get_exit_radius(self):
+        if self.exit_radius is not None:
+            return self.exit_radius
+        return self.get_enter_radius() + getattr(settings, 'GEOZONE_DEFAULT_HYSTERESIS', 25)
+
+    def get_min_dwell_seconds(self):
+        if self.min_dwell_seconds is not None:
+            return self.min_dwell_seconds
+        return getattr(settings, 'GEOZONE_MIN_DWELL_SECONDS', 60)
+
+    def observe(self, distance, accuracy):
+        """
+        Classify a fix as 'inside', 'outside' or None (undecided).
+
+        The whole accuracy circle must lie within ``enter_radius`` to count as
+        inside and beyond ``exit_radius`` to count as outside.
+        """
+        accuracy = accuracy or 0
+        if distance + accuracy <= self.get_enter_radius():
+            return 'inside'
+        if distance - accuracy > self.get_exit_radius():
+            return 'outside'
+        return None
+
 
 class GeozoneEvent(models.Model):
     EVENT_TYPE_CHOICES = [
@@ -85,8 +227,8 @@ class GeozoneEvent(models.Model):
     geozone = models.ForeignKey(Geozone, on_delete=models.CASCADE, related_name='events')
     event_type = models.CharField(max_length=10, choices=EVENT_TYPE_CHOICES)
     
-    latitude = models.DecimalField(max_digits=9, decimal_places=6)
-    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    latitude = MicrodegreeField(db_column='latitude_e6')
+    longitude = MicrodegreeField(db_column='longitude_e6')
     
     notification_sent = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -104,6 +246,63 @@ class GeozoneEvent(models.Model):
         return f"{self.user.phone_number} {self.event_type} {self.geozone.name}"
 
 
+class GeozoneMembership(models.Model):
+    """Debounced inside/outside state of a user relative to a geozone."""
+    STATE_CHOICES = [
+        ('inside', 'Inside'),
+        ('outside', 'Outside'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='geozone_memberships')
+    geozone = models.ForeignKey(Geozone, on_delete=models.CASCADE, related_name='memberships')
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='outside')
+    pending_state = models.CharField(max_length=10, choices=STATE_CHOICES, blank=True)
+    pending_since = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Geozone Membership')
+        verbose_name_plural = _('Geozone Memberships')
+        unique_together = ['user', 'geozone']
+
+    def __str__(self):
+        return f"{self.user.phone_number} {self.state} {self.geozone.name}"
+
+    @property
+    def is_pending(self):
+        return bool(self.pending_state)
+
+    def advance(self, observation, timestamp, min_dwell_seconds):
+        """
+        Feed one observation into the state machine.
+
+        A differing observation opens a pending transition; it is committed
+        once it has held for ``min_dwell_seconds``. An observation matching the
+        current state cancels the pending transition, an undecided one (None)
+        leaves it untouched. Returns the new state when a transition is
+        committed, otherwise None. The caller saves the instance.
+        """
+        if observation is None:
+            return None
+
+        if observation == self.state:
+            self.pending_state = ''
+            self.pending_since = None
+            return None
+
+        if self.pending_state != observation:
+            self.pending_state = observation
+            self.pending_since = timestamp
+
+        if (timestamp - self.pending_since).total_seconds() < min_dwell_seconds:
+            return None
+
+        self.state = observation
+        self.pending_state = ''
+        self.pending_since = None
+        return observation
+
+
 class SharedLocation(models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
@@ -128,7 +327,47 @@ class SharedLocation(models.Model):
         verbose_name = _('Shared Location')
         verbose_name_plural = _('Shared Locations')
         ordering = ['-created_at']
+        indexes = [
+            # Только живые строки: истекшие переводит в 'expired' фоновая задача
+            models.Index(fields=['end_time'], condition=models.Q(status='active'),
+                         name='sharedloc_active_end_idx'),
+            models.Index(fields=['user', 'end_time'], condition=models.Q(status='active'),
+                         name='sharedloc_active_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.phone_number} sharing with {self.shared_with.name}"
- 
\ No newline at end of file
+ 
+
+class LocationRollup(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='location_rollups')
+    bucket_start = models.DateTimeField(help_text=_('Start of the hour (UTC)'))
+    point_count = models.PositiveIntegerField(default=0)
+    
+    latitude = models.FloatField(help_text=_('Centroid latitude'))
+    longitude = models.FloatField(help_text=_('Centroid longitude'))
+    min_latitude = models.FloatField()
+    max_latitude = models.FloatField()
+    min_longitude = models.FloatField()
+    max_longitude = models.FloatField()
+    distance = models.FloatField(default=0, help_text=_('Distance travelled in meters'))
+    
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    last_latitude = models.FloatField()
+    last_longitude = models.FloatField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Location Rollup')
+        verbose_name_plural = _('Location Rollups')
+        ordering = ['-bucket_start']
+        unique_together = ['user', 'bucket_start']
+        indexes = [
+            models.Index(fields=['bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.phone_number} {self.bucket_start:%Y-%m-%d %H}:00 ({self.point_count})"
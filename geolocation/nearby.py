@@ -0,0 +1,90 @@
+"""
+Proximity queries over ``LatestLocation``.
+
+Candidates are fetched with range scans on the indexed ``geohash`` column
+over the cell containing the point and its eight neighbours, with the
+precision picked so that the 3×3 block covers the search radius. Exact
+distances are then computed only for those candidates. Positions last seen
+more than NEARBY_LOCATION_MAX_AGE ago are ignored: the user is no longer
+known to be there.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+from . import geohash
+from .models import LatestLocation
+from .tasks import calculate_distance
+
+User = get_user_model()
+
+
+def nearest_users(latitude, longitude, radius, user_ids=None, limit=None, max_age=None):
+    """
+    ``[(LatestLocation, distance_m), ...]`` within ``radius`` meters, closest first.
+
+    Only positions seen within ``max_age`` seconds (NEARBY_LOCATION_MAX_AGE) count.
+    """
+    max_age = max_age or getattr(settings, 'NEARBY_LOCATION_MAX_AGE', 3600)
+    precision = geohash.precision_for_radius(radius, latitude)
+    cells = Q()
+    for cell in geohash.covering_cells(latitude, longitude, precision):
+        low, high = geohash.prefix_range(cell)
+        cells |= Q(geohash__gte=low, geohash__lte=high)
+
+    candidates = LatestLocation.objects.filter(
+        cells, last_seen_at__gte=timezone.now() - timedelta(seconds=max_age)
+    )
+    if user_ids is not None:
+        candidates = candidates.filter(user_id__in=user_ids)
+
+    results = []
+    for latest in candidates:
+        distance = calculate_distance(latitude, longitude, latest.latitude, latest.longitude)
+        if distance <= radius:
+            results.append((latest, distance))
+
+    results.sort(key=lambda item: item[1])
+    return results[:limit] if limit else results
+
+
+def contact_distances(latitude, longitude, contacts, radius=None):
+    """
+    Distance in meters from a point to each contact who uses the app.
+
+    Contacts are matched to users by phone number. Returns
+    ``{contact_id: (user_id, distance_m)}`` for contacts whose latest
+    position is recent and within ``radius`` (SOS_RESPONDER_RADIUS).
+    """
+    radius = radius or getattr(settings, 'SOS_RESPONDER_RADIUS', 50_000)
+    contacts = list(contacts)
+    users_by_phone = dict(
+        User.objects.filter(
+            phone_number__in=[str(contact.phone_number) for contact in contacts]
+        ).values_list('phone_number', 'id')
+    )
+    users_by_phone = {str(phone): user_id for phone, user_id in users_by_phone.items()}
+    if not users_by_phone:
+        return {}
+
+    distances = {
+        latest.user_id: distance
+        for latest, distance in nearest_users(latitude, longitude, radius,
+                                              user_ids=users_by_phone.values())
+    }
+
+    result = {}
+    for contact in contacts:
+        user_id = users_by_phone.get(str(contact.phone_number))
+        if user_id in distances:
+            result[contact.id] = (user_id, distances[user_id])
+    return result
+
+
+def format_distance(meters):
+    if meters < 1000:
+        return f"{int(round(meters, -1))} м"
+    return f"{meters / 1000:.1f} км"
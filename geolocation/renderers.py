@@ -0,0 +1,101 @@
+import csv
+import json
+from datetime import datetime, timezone as dt_timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+
+class PolylineRenderer(JSONRenderer):
+    """JSON renderer selected with ``?format=polyline``"""
+    format = 'polyline'
+
+
+class ColumnarRenderer(JSONRenderer):
+    """JSON renderer selected with ``?format=columnar``"""
+    format = 'columnar'
+
+
+TRACK_RENDERER_CLASSES = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    PolylineRenderer,
+    ColumnarRenderer,
+]
+
+
+class StreamingRowRenderer(BaseRenderer):
+    """
+    Renderer for row-oriented exports.
+
+    ``stream(rows)`` yields text chunks and is used directly by streaming
+    views; ``render`` covers regular responses such as errors.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(self.stream(rows)).encode(self.charset)
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRowRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def stream(self, rows):
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(StreamingRowRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(_Echo())
+        header = None
+        for row in rows:
+            if header is None:
+                header = list(row)
+                yield writer.writerow(header)
+            yield writer.writerow(['' if row.get(key) is None else row.get(key) for key in header])
+
+
+class GPXRenderer(StreamingRowRenderer):
+    media_type = 'application/gpx+xml'
+    format = 'gpx'
+
+    def _time(self, value):
+        return datetime.fromisoformat(value).astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def stream(self, rows):
+        yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<gpx version="1.1" creator="AlertMe" xmlns="http://www.topografix.com/GPX/1/1">\n')
+        segment_open = False
+        for row in rows:
+            if 'latitude' not in row:
+                yield f"<metadata><desc>{escape(json.dumps(row, ensure_ascii=False))}</desc></metadata>\n"
+                continue
+            if not segment_open:
+                yield '<trk><name>AlertMe</name><trkseg>\n'
+                segment_open = True
+            point = f'<trkpt lat={quoteattr(str(row["latitude"]))} lon={quoteattr(str(row["longitude"]))}>'
+            if row.get('altitude') is not None:
+                point += f'<ele>{row["altitude"]}</ele>'
+            point += f'<time>{self._time(row["timestamp"])}</time></trkpt>\n'
+            yield point
+        if segment_open:
+            yield '</trkseg></trk>\n'
+        yield '</gpx>\n'
+
+
+EXPORT_RENDERER_CLASSES = [NDJSONRenderer, CSVRenderer, GPXRenderer]
@@ -0,0 +1,88 @@
+"""
+Recommended reporting interval returned with every location ingest.
+
+The client should report again before it can cross the nearest geozone
+boundary: ``interval = distance_to_boundary / speed * safety factor``,
+clamped to ``[LOCATION_REPORT_MIN_INTERVAL, LOCATION_REPORT_MAX_INTERVAL]``.
+An active SOS or location share overrides this with its own rate.
+
+Zone radii and the SOS flag come from the cache, so a regular ingest does
+not query geozones or SOS alerts; both are reset by signals on change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from sos.models import SOSAlert
+
+from .geozone_cache import get_boundaries
+from .sharing import get_active_share_ids
+from .tasks import calculate_distance
+
+SAFETY_FACTOR = 0.5
+SOS_ACTIVE_TTL = 60
+
+
+def _sos_active_key(user_id):
+    return f'sos_active:{user_id}'
+
+
+def is_sos_active(user_id):
+    active = cache.get(_sos_active_key(user_id))
+    if active is None:
+        active = SOSAlert.objects.filter(user_id=user_id, status='active').exists()
+        cache.set(_sos_active_key(user_id), active, SOS_ACTIVE_TTL)
+    return active
+
+
+def invalidate_sos_active(user_id):
+    cache.delete(_sos_active_key(user_id))
+
+
+def nearest_boundary_distance(user_id, latitude, longitude):
+    """
+    Distance in meters to the closest boundary of an active geozone, or None.
+
+    Both the enter and the exit radius count: crossing either one moves the
+    debounced membership (see ``GeozoneMembership``).
+    """
+    distances = []
+    for zone_lat, zone_lon, enter_radius, exit_radius in get_boundaries(user_id):
+        distance = calculate_distance(latitude, longitude, zone_lat, zone_lon)
+        distances.append(min(abs(distance - enter_radius), abs(distance - exit_radius)))
+    return min(distances) if distances else None
+
+
+def recommend_report_interval(user_id, latitude, longitude, speed=None):
+    min_interval = getattr(settings, 'LOCATION_REPORT_MIN_INTERVAL', 10)
+    max_interval = getattr(settings, 'LOCATION_REPORT_MAX_INTERVAL', 300)
+
+    sos_active = is_sos_active(user_id)
+    sharing_active = bool(get_active_share_ids(user_id))
+    boundary = nearest_boundary_distance(user_id, latitude, longitude)
+
+    if sos_active:
+        interval = getattr(settings, 'LOCATION_REPORT_SOS_INTERVAL', 5)
+        reason = 'sos'
+    else:
+        if boundary is None:
+            interval = max_interval
+            reason = 'idle'
+        else:
+            # Без скорости считаем, что пользователь идёт пешком
+            speed = max(speed or 0, getattr(settings, 'LOCATION_REPORT_ASSUMED_SPEED', 1.5))
+            interval = boundary / speed * SAFETY_FACTOR
+            interval = int(min(max(interval, min_interval), max_interval))
+            reason = 'geozone'
+
+        share_interval = getattr(settings, 'LOCATION_REPORT_SHARE_INTERVAL', 15)
+        if sharing_active and share_interval < interval:
+            interval = share_interval
+            reason = 'sharing'
+
+    return {
+        'interval': interval,
+        'reason': reason,
+        'sos_active': sos_active,
+        'sharing_active': sharing_active,
+        'nearest_boundary': round(boundary, 1) if boundary is not None else None,
+    }
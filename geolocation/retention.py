@@ -0,0 +1,184 @@
+"""
+Tiered retention for location history.
+
+Raw ``LocationHistory`` points older than ``LOCATION_RAW_RETENTION_DAYS`` are
+folded into per-user hourly ``LocationRollup`` rows and deleted. Rollups older
+than ``LOCATION_ROLLUP_RETENTION_DAYS`` are written to gzipped NDJSON files in
+``LOCATION_ARCHIVE_DIR`` and deleted.
+
+Every batch commits on its own, and the source tables are the only job state,
+so an interrupted run resumes on the next call.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LocationHistory, LocationRollup
+from .tasks import calculate_distance
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_UPDATE_FIELDS = [
+    'point_count', 'latitude', 'longitude', 'min_latitude', 'max_latitude',
+    'min_longitude', 'max_longitude', 'distance', 'first_timestamp',
+    'last_timestamp', 'last_latitude', 'last_longitude', 'updated_at',
+]
+
+
+def _batch_size(batch_size):
+    return batch_size or getattr(settings, 'LOCATION_RETENTION_BATCH_SIZE', 2000)
+
+
+def _merge_points(rollup, points):
+    """Fold chronologically ordered (lat, lon, timestamp) points into a rollup."""
+    count = rollup.point_count
+    if count:
+        sum_lat = rollup.latitude * count
+        sum_lon = rollup.longitude * count
+        previous = (rollup.last_latitude, rollup.last_longitude)
+    else:
+        first_lat, first_lon, first_ts = points[0]
+        sum_lat = sum_lon = 0.0
+        previous = None
+        rollup.distance = 0.0
+        rollup.min_latitude = rollup.max_latitude = first_lat
+        rollup.min_longitude = rollup.max_longitude = first_lon
+        rollup.first_timestamp = rollup.last_timestamp = first_ts
+
+    for lat, lon, ts in points:
+        if previous:
+            rollup.distance += calculate_distance(previous[0], previous[1], lat, lon)
+        previous = (lat, lon)
+        sum_lat += lat
+        sum_lon += lon
+        count += 1
+        rollup.min_latitude = min(rollup.min_latitude, lat)
+        rollup.max_latitude = max(rollup.max_latitude, lat)
+        rollup.min_longitude = min(rollup.min_longitude, lon)
+        rollup.max_longitude = max(rollup.max_longitude, lon)
+        rollup.first_timestamp = min(rollup.first_timestamp, ts)
+        rollup.last_timestamp = max(rollup.last_timestamp, ts)
+
+    rollup.point_count = count
+    rollup.latitude = sum_lat / count
+    rollup.longitude = sum_lon / count
+    rollup.last_latitude, rollup.last_longitude = previous
+
+
+def rollup_raw_locations(batch_size=None, max_batches=None, now=None):
+    """Downsample raw points past the raw retention window into hourly rollups."""
+    batch_size = _batch_size(batch_size)
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.LOCATION_RAW_RETENTION_DAYS)
+
+    batches = points_total = 0
+    while max_batches is None or batches < max_batches:
+        rows = list(
+            LocationHistory.objects.filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'id')
+            .values_list('id', 'user_id', 'latitude', 'longitude', 'timestamp')[:batch_size]
+        )
+        if not rows:
+            break
+
+        buckets = {}
+        for _, user_id, lat, lon, ts in rows:
+            bucket_start = ts.replace(minute=0, second=0, microsecond=0)
+            buckets.setdefault((user_id, bucket_start), []).append((float(lat), float(lon), ts))
+
+        with transaction.atomic():
+            existing = {
+                (rollup.user_id, rollup.bucket_start): rollup
+                for rollup in LocationRollup.objects.select_for_update().filter(
+                    user_id__in={key[0] for key in buckets},
+                    bucket_start__in={key[1] for key in buckets},
+                )
+            }
+            to_create, to_update = [], []
+            for (user_id, bucket_start), points in buckets.items():
+                rollup = existing.get((user_id, bucket_start))
+                if rollup is None:
+                    rollup = LocationRollup(user_id=user_id, bucket_start=bucket_start)
+                    to_create.append(rollup)
+                else:
+                    rollup.updated_at = now
+                    to_update.append(rollup)
+                _merge_points(rollup, points)
+
+            LocationRollup.objects.bulk_create(to_create)
+            if to_update:
+                LocationRollup.objects.bulk_update(to_update, ROLLUP_UPDATE_FIELDS)
+            LocationHistory.objects.filter(id__in=[row[0] for row in rows]).delete()
+
+        batches += 1
+        points_total += len(rows)
+
+    if points_total:
+        logger.info(f"📦 Свернуто {points_total} точек в почасовые сводки ({batches} пакетов)")
+    return points_total
+
+
+def _rollup_to_dict(rollup):
+    return {
+        'user_id': rollup.user_id,
+        'bucket_start': rollup.bucket_start.isoformat(),
+        'point_count': rollup.point_count,
+        'latitude': rollup.latitude,
+        'longitude': rollup.longitude,
+        'bbox': [rollup.min_latitude, rollup.min_longitude,
+                 rollup.max_latitude, rollup.max_longitude],
+        'distance': rollup.distance,
+        'first_timestamp': rollup.first_timestamp.isoformat(),
+        'last_timestamp': rollup.last_timestamp.isoformat(),
+    }
+
+
+def archive_rollups(batch_size=None, max_batches=None, now=None):
+    """Move rollups past the retention horizon to compressed files on disk."""
+    batch_size = _batch_size(batch_size)
+    now = now or timezone.now()
+    horizon = now - timedelta(days=settings.LOCATION_ROLLUP_RETENTION_DAYS)
+    archive_dir = Path(settings.LOCATION_ARCHIVE_DIR)
+
+    batches = archived = 0
+    while max_batches is None or batches < max_batches:
+        rollups = list(
+            LocationRollup.objects.filter(bucket_start__lt=horizon).order_by('id')[:batch_size]
+        )
+        if not rollups:
+            break
+
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        # Имя файла определяется диапазоном id, поэтому повторный запуск
+        # после сбоя перезапишет тот же файл, а не создаст дубликат
+        path = archive_dir / f'location_rollups_{rollups[0].id:012d}_{rollups[-1].id:012d}.ndjson.gz'
+        tmp_path = path.with_name(path.name + '.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive:
+            for rollup in rollups:
+                archive.write(json.dumps(_rollup_to_dict(rollup)) + '\n')
+        os.replace(tmp_path, path)
+
+        LocationRollup.objects.filter(id__in=[rollup.id for rollup in rollups]).delete()
+
+        batches += 1
+        archived += len(rollups)
+
+    if archived:
+        logger.info(f"🗄️ В архив перенесено {archived} сводок ({batches} файлов)")
+    return archived
+
+
+def run_location_retention(batch_size=None, max_batches=None):
+    """Run both retention tiers and return the processed counts."""
+    now = timezone.now()
+    return {
+        'rolled_up_points': rollup_raw_locations(batch_size, max_batches, now=now),
+        'archived_rollups': archive_rollups(batch_size, max_batches, now=now),
+    }
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .consumers import SharedLocationConsumer
+
+websocket_urlpatterns = [
+    path('ws/shared-locations/<str:token>/', SharedLocationConsumer.as_asgi()),
+]
@@ -0,0 +1,199 @@
+"""
+Incremental segmentation of location history into stays and trips.
+
+Every stored fix is fed to ``segment_location``, which only reads and
+updates the user's single open segment:
+
+* an open ``Stay`` absorbs fixes that may lie within ``LOCATION_STAY_RADIUS``
+  of its centre (accuracy counts in its favour, so a noisy indoor fix does
+  not end it) and closes on the first fix clearly outside;
+* an open ``Trip`` appends a vertex to its path whenever the user moved
+  ``LOCATION_TRIP_PATH_TOLERANCE`` meters from the last one. It also keeps an
+  anchor: the last fix that left the stay radius of the previous anchor.
+  Once the user has been within the radius of the anchor for
+  ``LOCATION_STAY_MIN_DURATION`` seconds, the trip is cut back to the anchor
+  and a stay opens there.
+
+A gap in the data longer than ``LOCATION_SEGMENT_MAX_GAP`` closes an open
+trip, and the next fix starts a new one. Fixes older than the open segment
+are ignored. Deleting points does not rewrite segments; run
+``manage.py rebuild_location_segments`` for that.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .encoding import extend_polyline
+from .fields import MICRODEGREES, to_microdegrees
+from .models import Stay, Trip
+from .tasks import calculate_distance
+
+Fix = namedtuple('Fix', 'latitude longitude timestamp accuracy address')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def segment_location(user_id, latitude, longitude, timestamp, accuracy=None, address=''):
+    """Feed one fix to the user's open segment; returns the segment it ended up in."""
+    fix = Fix(
+        to_microdegrees(latitude) / MICRODEGREES,
+        to_microdegrees(longitude) / MICRODEGREES,
+        timestamp,
+        accuracy or 0,
+        address or '',
+    )
+
+    with transaction.atomic():
+        stay = Stay.objects.select_for_update().filter(user_id=user_id, is_open=True).first()
+        if stay:
+            return _extend_stay(stay, fix)
+
+        trip = Trip.objects.select_for_update().filter(user_id=user_id, is_open=True).first()
+        if trip:
+            return _extend_trip(trip, fix)
+
+        return _open_trip(user_id, fix)
+
+
+def _extend_stay(stay, fix):
+    if fix.timestamp < stay.departure:
+        return stay
+
+    radius = _setting('LOCATION_STAY_RADIUS', 100)
+    distance = calculate_distance(stay.latitude, stay.longitude, fix.latitude, fix.longitude)
+
+    if distance - min(fix.accuracy, radius) <= radius:
+        stay.point_count += 1
+        if distance <= radius:
+            stay.latitude += (fix.latitude - stay.latitude) / stay.point_count
+            stay.longitude += (fix.longitude - stay.longitude) / stay.point_count
+        stay.departure = fix.timestamp
+        stay.address = stay.address or fix.address
+        stay.save()
+        return stay
+
+    stay.is_open = False
+    stay.save(update_fields=['is_open', 'updated_at'])
+
+    if (fix.timestamp - stay.departure).total_seconds() > _setting('LOCATION_SEGMENT_MAX_GAP', 21600):
+        return _open_trip(stay.user_id, fix)
+
+    start = Fix(stay.latitude, stay.longitude, stay.departure, 0, stay.address)
+    return _extend_trip(_open_trip(stay.user_id, start), fix)
+
+
+def _open_trip(user_id, fix):
+    path = extend_polyline('', None, (fix.latitude, fix.longitude))
+    return Trip.objects.create(
+        user_id=user_id,
+        start_time=fix.timestamp,
+        end_time=fix.timestamp,
+        start_latitude=fix.latitude,
+        start_longitude=fix.longitude,
+        end_latitude=fix.latitude,
+        end_longitude=fix.longitude,
+        path=path,
+        anchor_latitude=fix.latitude,
+        anchor_longitude=fix.longitude,
+        anchor_time=fix.timestamp,
+        anchor_path_length=len(path),
+    )
+
+
+def _append_vertex(trip, fix):
+    trip.distance += calculate_distance(trip.end_latitude, trip.end_longitude,
+                                        fix.latitude, fix.longitude)
+    trip.path = extend_polyline(trip.path, (trip.end_latitude, trip.end_longitude),
+                                (fix.latitude, fix.longitude))
+    trip.end_latitude = fix.latitude
+    trip.end_longitude = fix.longitude
+
+
+def _extend_trip(trip, fix):
+    if fix.timestamp < trip.end_time:
+        return trip
+
+    if (fix.timestamp - trip.end_time).total_seconds() > _setting('LOCATION_SEGMENT_MAX_GAP', 21600):
+        trip.is_open = False
+        trip.save(update_fields=['is_open', 'updated_at'])
+        return _open_trip(trip.user_id, fix)
+
+    radius = _setting('LOCATION_STAY_RADIUS', 100)
+    trip.point_count += 1
+    trip.end_time = fix.timestamp
+
+    from_anchor = calculate_distance(trip.anchor_latitude, trip.anchor_longitude,
+                                     fix.latitude, fix.longitude)
+    if from_anchor > radius:
+        _append_vertex(trip, fix)
+        trip.anchor_latitude = fix.latitude
+        trip.anchor_longitude = fix.longitude
+        trip.anchor_time = fix.timestamp
+        trip.anchor_distance = trip.distance
+        trip.anchor_path_length = len(trip.path)
+        trip.anchor_point_count = trip.point_count
+    else:
+        from_end = calculate_distance(trip.end_latitude, trip.end_longitude,
+                                      fix.latitude, fix.longitude)
+        if from_end >= _setting('LOCATION_TRIP_PATH_TOLERANCE', 25):
+            _append_vertex(trip, fix)
+
+        dwell = (fix.timestamp - trip.anchor_time).total_seconds()
+        if dwell >= _setting('LOCATION_STAY_MIN_DURATION', 300):
+            return _settle(trip, fix)
+
+    trip.save()
+    return trip
+
+
+def _settle(trip, fix):
+    """Cut the trip back to its anchor and open a stay there."""
+    stay = Stay.objects.create(
+        user_id=trip.user_id,
+        latitude=trip.anchor_latitude,
+        longitude=trip.anchor_longitude,
+        address=fix.address,
+        arrival=trip.anchor_time,
+        departure=fix.timestamp,
+        point_count=trip.point_count - trip.anchor_point_count + 1,
+    )
+
+    if trip.anchor_time == trip.start_time:
+        # Пользователь так и не покинул начальную точку
+        trip.delete()
+        return stay
+
+    trip.path = trip.path[:trip.anchor_path_length]
+    trip.distance = trip.anchor_distance
+    trip.end_latitude = trip.anchor_latitude
+    trip.end_longitude = trip.anchor_longitude
+    trip.end_time = trip.anchor_time
+    trip.point_count = trip.anchor_point_count
+    trip.is_open = False
+    trip.save()
+    return stay
+
+
+def rebuild_segments(user_id, batch_size=2000):
+    """Replay the user's whole history; returns the number of fixes fed."""
+    from .models import LocationHistory
+
+    with transaction.atomic():
+        Stay.objects.filter(user_id=user_id).delete()
+        Trip.objects.filter(user_id=user_id).delete()
+
+    rows = (
+        LocationHistory.objects.filter(user_id=user_id)
+        .order_by('timestamp', 'id')
+        .values_list('latitude', 'longitude', 'timestamp', 'accuracy', 'address', 'last_seen_at')
+    )
+    count = 0
+    for latitude, longitude, timestamp, accuracy, address, last_seen_at in rows.iterator(chunk_size=batch_size):
+        segment_location(user_id, latitude, longitude, timestamp, accuracy, address)
+        if last_seen_at and last_seen_at > timestamp:
+            segment_location(user_id, latitude, longitude, last_seen_at, accuracy, address)
+        count += 1
+    return count
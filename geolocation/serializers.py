@@ -1,19 +1,67 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
-from .models import LocationHistory, Geozone, GeozoneEvent, SharedLocation
+from .models import LocationHistory, LatestLocation, Stay, Trip, Geozone, GeozoneEvent, SharedLocation
+from .fields import CoordinateField
 from contacts.serializers import EmergencyContactSerializer
+from subscriptions.entitlements import get_entitlements
 
 
 class LocationHistorySerializer(serializers.ModelSerializer):
+    latitude = CoordinateField(min_value=-90, max_value=90)
+    longitude = CoordinateField(min_value=-180, max_value=180)
+    
     class Meta:
         model = LocationHistory
         fields = ['id', 'latitude', 'longitude', 'accuracy', 'altitude',
                  'speed', 'heading', 'address', 'activity_type',
-                 'battery_level', 'timestamp', 'created_at']
-        read_only_fields = ['id', 'created_at']
+                 'battery_level', 'timestamp', 'dwell_count', 'last_seen_at',
+                 'created_at']
+        read_only_fields = ['id', 'dwell_count', 'last_seen_at', 'created_at']
+
+
+class LatestLocationSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='location_id', read_only=True)
+    latitude = CoordinateField(read_only=True)
+    longitude = CoordinateField(read_only=True)
+    
+    class Meta:
+        model = LatestLocation
+        fields = ['id', 'user', 'latitude', 'longitude', 'accuracy', 'altitude',
+                 'speed', 'heading', 'address', 'activity_type',
+                 'battery_level', 'timestamp', 'last_seen_at', 'updated_at']
+        read_only_fields = fields
+
+
+class StaySerializer(serializers.ModelSerializer):
+    latitude = CoordinateField(read_only=True)
+    longitude = CoordinateField(read_only=True)
+    duration = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = Stay
+        fields = ['id', 'latitude', 'longitude', 'address', 'arrival', 'departure',
+                 'duration', 'point_count', 'is_open']
+        read_only_fields = fields
+
+
+class TripSerializer(serializers.ModelSerializer):
+    start_latitude = CoordinateField(read_only=True)
+    start_longitude = CoordinateField(read_only=True)
+    end_latitude = CoordinateField(read_only=True)
+    end_longitude = CoordinateField(read_only=True)
+    duration = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = Trip
+        fields = ['id', 'start_time', 'end_time', 'start_latitude', 'start_longitude',
+                 'end_latitude', 'end_longitude', 'distance', 'duration', 'path',
+                 'point_count', 'is_open']
+        read_only_fields = fields
 
 
 class GeozoneSerializer(serializers.ModelSerializer):
+    latitude = CoordinateField(min_value=-90, max_value=90)
+    longitude = CoordinateField(min_value=-180, max_value=180)
     emergency_contacts = EmergencyContactSerializer(many=True, read_only=True)
     contact_ids = serializers.ListField(
         child=serializers.IntegerField(),
@@ -24,7 +72,8 @@ class GeozoneSerializer(serializers.ModelSerializer):
     class Meta:
         model = Geozone
         fields = ['id', 'name', 'description', 'zone_type', 'latitude',
-                 'longitude', 'radius', 'polygon_coordinates',
+                 'longitude', 'radius', 'enter_radius', 'exit_radius',
+                 'min_dwell_seconds', 'polygon_coordinates',
                  'notify_on_enter', 'notify_on_exit', 'is_active',
                  'emergency_contacts', 'contact_ids', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -32,17 +81,18 @@ class GeozoneSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         user = self.context['request'].user
         
-        if not self.instance:
-            try:
-                subscription = user.subscription
-                if not subscription.plan.geozones_enabled:
-                    raise serializers.ValidationError(
-                        'Geozones feature requires Premium subscription'
-                    )
-            except:
-                raise serializers.ValidationError(
-                    'Geozones feature requires Premium subscription'
-                )
+        if not self.instance and not get_entitlements(user).geozones_enabled:
+            raise serializers.ValidationError(
+                'Geozones feature requires Premium subscription'
+            )
+        
+        radius = attrs.get('radius', getattr(self.instance, 'radius', None))
+        enter_radius = attrs.get('enter_radius', getattr(self.instance, 'enter_radius', None))
+        exit_radius = attrs.get('exit_radius', getattr(self.instance, 'exit_radius', None))
+        if exit_radius is not None and exit_radius < (enter_radius if enter_radius is not None else radius):
+            raise serializers.ValidationError(
+                'exit_radius must not be smaller than enter_radius'
+            )
         
         return attrs
     
@@ -63,6 +113,8 @@ class GeozoneSerializer(serializers.ModelSerializer):
 
 class GeozoneEventSerializer(serializers.ModelSerializer):
     geozone_name = serializers.CharField(source='geozone.name', read_only=True)
+    latitude = CoordinateField(min_value=-90, max_value=90)
+    longitude = CoordinateField(min_value=-180, max_value=180)
     
     class Meta:
         model = GeozoneEvent
@@ -0,0 +1,168 @@
+"""
+Caching for the public share-link endpoint (``track_by_token``).
+
+Contacts poll the share link, so every lookup here goes through the cache:
+
+* the share itself is cached by token until it expires; saving or deleting
+  the share (cancel, admin edit, contact deletion) drops it via ``signals``;
+* each user's location version - the newest location id and the
+  ``last_seen_at`` of the newest point - is kept up to date on ingest, so
+  merging a fix into an existing point changes it too;
+* the rendered payload is cached for a few seconds, keyed by token, location
+  version, format and cursor. The same key is used as the ``ETag``.
+
+Live viewers subscribe over a WebSocket (see ``consumers``); every new point
+is fanned out to the channel-layer group of each active share of its owner.
+"""
+import hashlib
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import LocationHistory, SharedLocation
+
+logger = logging.getLogger(__name__)
+
+
+def _share_key(token):
+    return f'shared_location:{token}'
+
+
+def _latest_key(user_id):
+    return f'location_version:{user_id}'
+
+
+def get_active_share(token):
+    """Return a dict describing an active, unexpired share, or None."""
+    share = cache.get(_share_key(token))
+
+    if share is None:
+        share = (
+            SharedLocation.objects.filter(share_token=token, status='active')
+            .values('id', 'user_id', 'start_time', 'end_time')
+            .first()
+        )
+        if share is None:
+            return None
+        ttl = int((share['end_time'] - timezone.now()).total_seconds())
+        if ttl > 0:
+            cache.set(_share_key(token), share, ttl)
+
+    if share['end_time'] <= timezone.now():
+        return None
+    return share
+
+
+def invalidate_share(token):
+    cache.delete(_share_key(token))
+
+
+def share_group_name(share_id):
+    return f'shared_location_{share_id}'
+
+
+def _active_shares_key(user_id):
+    return f'active_shares:{user_id}'
+
+
+def get_active_share_ids(user_id):
+    """Ids of the user's shares that are active right now."""
+    shares = cache.get(_active_shares_key(user_id))
+    if shares is None:
+        shares = list(
+            SharedLocation.objects.filter(
+                user_id=user_id, status='active', end_time__gt=timezone.now()
+            ).values_list('id', 'end_time')
+        )
+        cache.set(_active_shares_key(user_id), shares, 3600)
+
+    now = timezone.now()
+    return [share_id for share_id, end_time in shares if end_time > now]
+
+
+def invalidate_active_shares(user_id):
+    cache.delete(_active_shares_key(user_id))
+
+
+def _group_send(share_id, message):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(share_group_name(share_id), message)
+    except Exception as e:
+        logger.error(f"❌ Ошибка отправки в канал {share_group_name(share_id)}: {e}")
+
+
+def publish_location(user_id, location_data):
+    """Push a serialized point to the live viewers of the user's active shares."""
+    for share_id in get_active_share_ids(user_id):
+        _group_send(share_id, {
+            'type': 'location.point',
+            'location': location_data,
+        })
+
+
+def publish_share_ended(share_id, share_status):
+    _group_send(share_id, {
+        'type': 'share.ended',
+        'status': share_status,
+    })
+
+
+def _stamp(last_seen_at):
+    return last_seen_at.isoformat() if last_seen_at else ''
+
+
+def note_new_location(user_id, location_id):
+    """Record the user's newest location id right after ingest."""
+    latest = cache.get(_latest_key(user_id))
+    if latest is not None and location_id > latest[0]:
+        cache.set(_latest_key(user_id), (location_id, latest[1]), None)
+
+
+def note_merged_location(user_id, location):
+    """Bump the version after a fix was merged into ``location`` (the newest point)."""
+    latest = cache.get(_latest_key(user_id))
+    if latest is not None:
+        cache.set(_latest_key(user_id), (max(latest[0], location.id), _stamp(location.last_seen_at)), None)
+
+
+def forget_latest_location(user_id):
+    cache.delete(_latest_key(user_id))
+
+
+def get_location_version(user_id):
+    """``(newest location id, last_seen_at of the newest point)`` for the user."""
+    latest = cache.get(_latest_key(user_id))
+    if latest is None:
+        locations = LocationHistory.objects.filter(user_id=user_id)
+        latest_id = locations.order_by('-id').values_list('id', flat=True).first() or 0
+        last_seen_at = (
+            locations.order_by('-timestamp', '-id')
+            .values_list('last_seen_at', flat=True)
+            .first()
+        )
+        latest = (latest_id, _stamp(last_seen_at))
+        cache.set(_latest_key(user_id), latest, None)
+    return latest
+
+
+def track_etag(token, version, track_format=None, since=None):
+    latest_id, last_seen = version
+    digest = hashlib.md5(
+        f'{token}:{latest_id}:{last_seen}:{track_format or "json"}:{since or ""}'.encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def get_cached_track(etag):
+    return cache.get(f'shared_track:{etag}')
+
+
+def set_cached_track(etag, payload):
+    cache.set(f'shared_track:{etag}', payload, getattr(settings, 'SHARED_LOCATION_CACHE_TTL', 15))
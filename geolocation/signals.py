@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from sos.models import SOSAlert
+
+from . import sharing
+from .geozone_cache import invalidate_boundaries, invalidate_margin
+from .models import Geozone, SharedLocation
+from .reporting import invalidate_sos_active
+
+
+@receiver([post_save, post_delete], sender=Geozone)
+def reset_geozone_margin(sender, instance, **kwargs):
+    invalidate_margin(instance.user_id)
+    invalidate_boundaries(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=SOSAlert)
+def reset_sos_active(sender, instance, **kwargs):
+    invalidate_sos_active(instance.user_id)
+
+
+@receiver(post_save, sender=SharedLocation)
+def reset_shared_location(sender, instance, **kwargs):
+    # Отмена через API, правка в админке: ссылка и рассылка точек сразу видят статус
+    sharing.invalidate_share(instance.share_token)
+    sharing.invalidate_active_shares(instance.user_id)
+    if instance.status != 'active':
+        sharing.publish_share_ended(instance.id, instance.status)
+
+
+@receiver(post_delete, sender=SharedLocation)
+def drop_shared_location(sender, instance, **kwargs):
+    # В том числе каскадом при удалении контакта
+    sharing.invalidate_share(instance.share_token)
+    sharing.invalidate_active_shares(instance.user_id)
+    sharing.publish_share_ended(instance.id, 'cancelled')
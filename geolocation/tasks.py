@@ -1,8 +1,24 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import LocationHistory, Geozone, GeozoneEvent
+from django.core.cache import cache
+from django.utils import timezone
+from .models import LocationHistory, Geozone, GeozoneEvent, GeozoneMembership
+from . import geozone_cache
 from math import radians, sin, cos, sqrt, atan2
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+FLUSH_SCHEDULED_KEY = 'geozone_notifications:flush_scheduled'
+FLUSH_LOCK_KEY = 'geozone_notifications:flush_lock'
+FLUSH_LOCK_TIMEOUT = 300
+FLUSH_RETRY_DELAY = 5
 
 
 def calculate_distance(lat1, lon1, lat2, lon2):
@@ -20,11 +36,37 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return R * c
 
 
+def _bootstrap_membership(user, geozone):
+    """Create a membership whose state follows the zone's last recorded event."""
+    last_event = GeozoneEvent.objects.filter(
+        user=user,
+        geozone=geozone
+    ).order_by('-timestamp').first()
+    state = 'inside' if last_event and last_event.event_type == 'enter' else 'outside'
+    membership, _ = GeozoneMembership.objects.get_or_create(
+        user=user,
+        geozone=geozone,
+        defaults={'state': state}
+    )
+    return membership
+
+
 def check_geozone_events(user_id, location_id):
     try:
-        user = User.objects.get(id=user_id)
         current_location = LocationHistory.objects.get(id=location_id)
+        if geozone_cache.can_skip(user_id, current_location.timestamp):
+            geozone_cache.record_hit()
+            return True
+        geozone_cache.record_miss()
+        
+        user = User.objects.get(id=user_id)
         geozones = Geozone.objects.filter(user=user, is_active=True)
+        memberships = {
+            membership.geozone_id: membership
+            for membership in GeozoneMembership.objects.filter(user=user, geozone__in=geozones)
+        }
+        margin = None
+        pending = False
         
         for geozone in geozones:
             distance = calculate_distance(
@@ -34,95 +76,201 @@ def check_geozone_events(user_id, location_id):
                 geozone.longitude
             )
             
-            is_inside = distance <= geozone.radius
-            last_event = GeozoneEvent.objects.filter(
-                user=user,
-                geozone=geozone
-            ).order_by('-timestamp').first()
-            if last_event:
-                was_inside = last_event.event_type == 'enter'
-                
-                if is_inside and not was_inside and geozone.notify_on_enter:
-                    event = GeozoneEvent.objects.create(
-                        user=user,
-                        geozone=geozone,
-                        event_type='enter',
-                        latitude=current_location.latitude,
-                        longitude=current_location.longitude
-                    )
-                    send_geozone_notification(event.id)
-                
-                elif not is_inside and was_inside and geozone.notify_on_exit:
-                    event = GeozoneEvent.objects.create(
-                        user=user,
-                        geozone=geozone,
-                        event_type='exit',
-                        latitude=current_location.latitude,
-                        longitude=current_location.longitude
-                    )
-                    send_geozone_notification(event.id)
-            else:
-                if is_inside and geozone.notify_on_enter:
-                    event = GeozoneEvent.objects.create(
-                        user=user,
-                        geozone=geozone,
-                        event_type='enter',
-                        latitude=current_location.latitude,
-                        longitude=current_location.longitude
-                    )
-                    send_geozone_notification(event.id)
+            boundary_distance = min(
+                abs(distance - geozone.get_enter_radius()),
+                abs(distance - geozone.get_exit_radius())
+            )
+            boundary_distance = max(boundary_distance - (current_location.accuracy or 0), 0)
+            if margin is None or boundary_distance < margin:
+                margin = boundary_distance
+            
+            membership = memberships.get(geozone.id) or _bootstrap_membership(user, geozone)
+            observation = geozone.observe(distance, current_location.accuracy)
+            previous = (membership.state, membership.pending_state, membership.pending_since)
+            new_state = membership.advance(
+                observation,
+                current_location.timestamp,
+                geozone.get_min_dwell_seconds()
+            )
+            if (membership.state, membership.pending_state, membership.pending_since) != previous:
+                membership.save(update_fields=['state', 'pending_state', 'pending_since', 'updated_at'])
+            pending = pending or membership.is_pending
+            
+            if new_state is None:
+                continue
+            
+            event_type = 'enter' if new_state == 'inside' else 'exit'
+            if (event_type == 'enter' and geozone.notify_on_enter) or \
+                    (event_type == 'exit' and geozone.notify_on_exit):
+                event = GeozoneEvent.objects.create(
+                    user=user,
+                    geozone=geozone,
+                    event_type=event_type,
+                    latitude=current_location.latitude,
+                    longitude=current_location.longitude
+                )
+                send_geozone_notification(event.id)
         
+        geozone_cache.set_pending(user_id, pending)
+        geozone_cache.set_margin(user_id, margin, current_location.timestamp)
         return True
     except Exception as e:
-        print(f"Error checking geozone events: {e}")
+        logger.exception(f"❌ Ошибка проверки геозон для пользователя {user_id}: {e}")
         return False
 
 
 def send_geozone_notification(event_id):
+    """
+    Queue notifications for a geozone event.
+
+    One pending SMS row is recorded per contact; delivery is deferred by
+    GEOZONE_NOTIFICATION_WINDOW seconds so that events for the same phone
+    number are merged into one digest (see flush_geozone_notifications).
+    """
     try:
-        event = GeozoneEvent.objects.get(id=event_id)
+        from contacts.models import EmergencyContact
+        from sos.models import SOSNotification
+        
+        event = GeozoneEvent.objects.select_related('geozone', 'user').get(id=event_id)
         geozone = event.geozone
         contacts = geozone.emergency_contacts.filter(is_active=True)
         
         if not contacts.exists():
-            from contacts.models import EmergencyContact
             contacts = EmergencyContact.objects.filter(
                 user=event.user,
                 is_active=True
             )
-        for contact in contacts:
-            message = _generate_geozone_message(event)
-            
-            from notifications.sms_service import SMSService
-            from sos.models import SOSNotification
-            
-            notif = SOSNotification.objects.create(
-                sos_alert=None,
+        
+        message = _generate_geozone_message(event)
+        SOSNotification.objects.bulk_create([
+            SOSNotification(
+                geozone_event=event,
                 contact=contact,
                 notification_type='sms',
                 content=message
             )
-            sms_service = SMSService()
-            success = sms_service.send_sms(
-                to_phone=str(contact.phone_number),
-                message=message
-            )
-            
-            if success:
-                notif.status = 'sent'
-            else:
-                notif.status = 'failed'
-            notif.save()
-        
-        event.notification_sent = True
-        event.save()
+            for contact in contacts
+        ])
         
+        _schedule_geozone_flush()
         return True
     except Exception as e:
-        print(f"Error sending geozone notification: {e}")
+        logger.exception(f"❌ Ошибка постановки уведомления о геозоне (событие {event_id}): {e}")
         return False
 
 
+def _schedule_geozone_flush(delay=None):
+    window = getattr(settings, 'GEOZONE_NOTIFICATION_WINDOW', 60)
+    if delay is None and window <= 0:
+        flush_geozone_notifications()
+        return
+    
+    # Первое событие в окне запускает отложенную отправку, остальные к ней
+    # присоединяются. Ключ снимается в начале отправки, так что события,
+    # пришедшие во время нее, запускают следующую
+    delay = delay or window
+    if not cache.add(FLUSH_SCHEDULED_KEY, True, delay + FLUSH_LOCK_TIMEOUT):
+        return
+    
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        # Без брокера countdown не работает - ждем в потоке процесса;
+        # таймер, потерянный при перезапуске, подберет команда flush_geozone_notifications (cron)
+        timer = threading.Timer(delay, _flush_in_thread)
+        timer.daemon = True
+        timer.start()
+    else:
+        flush_geozone_notifications.apply_async(countdown=delay)
+
+
+def _flush_in_thread():
+    from django.db import connection
+    
+    try:
+        flush_geozone_notifications()
+    finally:
+        connection.close()
+
+
+@shared_task
+def flush_geozone_notifications(min_age=0):
+    """
+    Send pending geozone notifications as one digest per phone number.
+
+    Digests with identical text go out in a single bulk request. Rows younger
+    than ``min_age`` seconds are left for the flush that owns their window.
+    If another flush holds the lock, this one is re-armed instead of dropped:
+    rows created after the other flush read the queue would otherwise wait
+    for the periodic fallback.
+    """
+    from notifications.sms_service import SMSService
+    from sos.models import SOSNotification
+    
+    cache.delete(FLUSH_SCHEDULED_KEY)
+    if not cache.add(FLUSH_LOCK_KEY, True, FLUSH_LOCK_TIMEOUT):
+        _schedule_geozone_flush(delay=FLUSH_RETRY_DELAY)
+        return 0
+    
+    try:
+        pending = SOSNotification.objects.filter(
+            geozone_event__isnull=False,
+            notification_type='sms',
+            status='pending',
+            created_at__lte=timezone.now() - timedelta(seconds=min_age)
+        ).select_related('contact').order_by('created_at', 'id')
+        
+        by_phone = defaultdict(list)
+        for notif in pending:
+            by_phone[str(notif.contact.phone_number)].append(notif)
+        
+        if not by_phone:
+            return 0
+        
+        by_text = defaultdict(list)
+        for phone, notifications in by_phone.items():
+            by_text[_build_geozone_digest(notifications)].append(phone)
+        
+        sms_service = SMSService()
+        sent_ids, failed_ids = [], []
+        for text, phones in by_text.items():
+            if len(phones) > 1:
+                success = sms_service.send_bulk_sms(phones=phones, message=text).get('success', False)
+            else:
+                success = sms_service.send_sms(to_phone=phones[0], message=text)
+            
+            ids = [notif.id for phone in phones for notif in by_phone[phone]]
+            (sent_ids if success else failed_ids).extend(ids)
+        
+        now = timezone.now()
+        SOSNotification.objects.filter(id__in=sent_ids).update(status='sent', sent_at=now)
+        SOSNotification.objects.filter(id__in=failed_ids).update(status='failed')
+        
+        # Событие считается оповещенным, только если хоть одно SMS по нему ушло
+        delivered = set(sent_ids)
+        event_ids = {
+            notif.geozone_event_id
+            for notifications in by_phone.values() for notif in notifications
+            if notif.id in delivered
+        }
+        GeozoneEvent.objects.filter(id__in=event_ids).update(notification_sent=True)
+        
+        logger.info(
+            f"📨 Геозоны: {len(sent_ids) + len(failed_ids)} уведомлений отправлено "
+            f"{len(by_text)} сообщениями на {len(by_phone)} номеров"
+        )
+        return len(sent_ids)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def _build_geozone_digest(notifications):
+    if len(notifications) == 1:
+        return notifications[0].content
+    
+    parts = [f"📍 Уведомления о геозонах ({len(notifications)}):"]
+    parts.extend(notif.content for notif in notifications)
+    return "\n\n".join(parts)
+
+
 def _generate_geozone_message(event):
     """Generate notification message for geozone event"""
     user = event.user
@@ -139,15 +287,55 @@ def _generate_geozone_message(event):
     return message
 
 
+@shared_task
+def flush_stale_geozone_notifications():
+    """Periodic fallback for digests whose scheduled flush was lost"""
+    return flush_geozone_notifications(
+        min_age=getattr(settings, 'GEOZONE_NOTIFICATION_WINDOW', 60)
+    )
+
+
+@shared_task
 def cleanup_old_location_history():
-    """Clean up location history older than 90 days"""
-    from django.utils import timezone
-    from datetime import timedelta
+    """Roll up raw points past the retention window and archive expired rollups"""
+    from .retention import run_location_retention
+    
+    return run_location_retention()
+
+
+@shared_task
+def expire_shared_locations(batch_size=None):
+    """Move shares past their end_time to 'expired' in batches"""
+    from .models import SharedLocation
+    from . import sharing
     
-    cutoff_date = timezone.now() - timedelta(days=90)
+    batch_size = batch_size or getattr(settings, 'EXPIRY_SWEEP_BATCH_SIZE', 500)
+    now = timezone.now()
+    total = 0
     
-    deleted_count = LocationHistory.objects.filter(
-        timestamp__lt=cutoff_date
-    ).delete()[0]
+    while True:
+        batch = list(
+            SharedLocation.objects.filter(status='active', end_time__lte=now)
+            .values_list('id', 'user_id', 'share_token')[:batch_size]
+        )
+        if not batch:
+            break
+        
+        SharedLocation.objects.filter(
+            id__in=[share_id for share_id, _, _ in batch],
+            status='active'
+        ).update(status='expired', updated_at=now)
+        
+        for share_id, user_id, token in batch:
+            sharing.invalidate_share(token)
+            sharing.publish_share_ended(share_id, 'expired')
+        for user_id in {user_id for _, user_id, _ in batch}:
+            sharing.invalidate_active_shares(user_id)
+        
+        total += len(batch)
+        if len(batch) < batch_size:
+            break
     
-    return deleted_count
\ No newline at end of file
+    if total:
+        logger.info(f"⌛ Истекших ссылок на геолокацию: {total}")
+    return total
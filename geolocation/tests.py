@@ -1,3 +1,1198 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import warnings
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from contacts.models import EmergencyContact
+from sos.models import SOSAlert, SOSNotification
+
+from . import geozone_cache, sharing, tasks
+from .consumers import CLOSE_INVALID_TOKEN, CLOSE_SHARE_ENDED
+from .coordinate_backfill import backfill_table
+from .encoding import encode_polyline, encode_track, extend_polyline, iter_export_rows
+from .fields import to_microdegrees
+from .ingest import merge_duplicate_location
+from .latest import fill_sos_location, get_latest_location
+from .models import (Geozone, GeozoneEvent, GeozoneMembership, LatestLocation,
+                     LocationHistory, LocationRollup, SharedLocation, Stay, Trip)
+from .nearby import nearest_users
+from .reporting import recommend_report_interval
+from .retention import archive_rollups, rollup_raw_locations
+from .routing import websocket_urlpatterns
+from .segments import rebuild_segments, segment_location
+from .serializers import LocationHistorySerializer
+from .tasks import check_geozone_events, flush_geozone_notifications, send_geozone_notification
+
+User = get_user_model()
+
+
+class GeozoneMembershipAdvanceTests(SimpleTestCase):
+    """Переходы вход/выход фиксируются только после MIN_DWELL секунд"""
+
+    def setUp(self):
+        self.t0 = timezone.now()
+
+    def _at(self, seconds):
+        return self.t0 + timedelta(seconds=seconds)
+
+    def test_enter_is_committed_after_dwell(self):
+        membership = GeozoneMembership(state='outside')
+
+        self.assertIsNone(membership.advance('inside', self._at(0), 60))
+        self.assertEqual((membership.state, membership.pending_state), ('outside', 'inside'))
+        self.assertEqual(membership.pending_since, self._at(0))
+
+        self.assertIsNone(membership.advance('inside', self._at(59), 60))
+        self.assertEqual(membership.advance('inside', self._at(60), 60), 'inside')
+        self.assertEqual(membership.state, 'inside')
+        self.assertFalse(membership.is_pending)
+        self.assertIsNone(membership.pending_since)
+
+    def test_exit_is_committed_after_dwell(self):
+        membership = GeozoneMembership(state='inside')
+
+        self.assertIsNone(membership.advance('outside', self._at(0), 30))
+        self.assertEqual(membership.advance('outside', self._at(45), 30), 'outside')
+        self.assertEqual(membership.state, 'outside')
+
+    def test_zero_dwell_commits_at_once(self):
+        membership = GeozoneMembership(state='outside')
+
+        self.assertEqual(membership.advance('inside', self._at(0), 0), 'inside')
+
+    def test_matching_observation_cancels_pending_transition(self):
+        membership = GeozoneMembership(state='outside')
+        membership.advance('inside', self._at(0), 60)
+
+        self.assertIsNone(membership.advance('outside', self._at(30), 60))
+        self.assertFalse(membership.is_pending)
+
+        # Дребезг на границе: таймер перехода начинается заново
+        self.assertIsNone(membership.advance('inside', self._at(70), 60))
+        self.assertEqual(membership.pending_since, self._at(70))
+        self.assertEqual(membership.advance('inside', self._at(130), 60), 'inside')
+
+    def test_undecided_observation_keeps_pending_transition(self):
+        membership = GeozoneMembership(state='outside')
+        membership.advance('inside', self._at(0), 60)
+
+        self.assertIsNone(membership.advance(None, self._at(40), 60))
+        self.assertEqual(membership.pending_state, 'inside')
+        self.assertEqual(membership.advance('inside', self._at(60), 60), 'inside')
+
+    def test_observation_uses_hysteresis_band(self):
+        geozone = Geozone(radius=100, exit_radius=150)
+
+        self.assertEqual(geozone.observe(90, 5), 'inside')
+        self.assertIsNone(geozone.observe(98, 5))
+        self.assertIsNone(geozone.observe(140, 5))
+        self.assertEqual(geozone.observe(160, 5), 'outside')
+
+
+@override_settings(
+    LOCATION_REPORT_MIN_INTERVAL=10,
+    LOCATION_REPORT_MAX_INTERVAL=300,
+    LOCATION_REPORT_SOS_INTERVAL=5,
+    LOCATION_REPORT_SHARE_INTERVAL=15,
+    LOCATION_REPORT_ASSUMED_SPEED=1.5,
+    GEOZONE_DEFAULT_HYSTERESIS=25,
+)
+class ReportIntervalTests(TestCase):
+    """Рекомендуемый интервал отправки: до ближайшей границы зоны, SOS и шаринг"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+996555000150')
+
+    def _zone(self, **extra):
+        return Geozone.objects.create(
+            user=self.user, name='Дом', latitude=42.87, longitude=74.6, radius=100, **extra
+        )
+
+    def test_no_zones_is_idle(self):
+        result = recommend_report_interval(self.user.id, 42.87, 74.6)
+
+        self.assertEqual((result['interval'], result['reason']), (300, 'idle'))
+        self.assertIsNone(result['nearest_boundary'])
+
+    def test_interval_reaches_nearest_boundary_at_half_time(self):
+        self._zone(exit_radius=150)
+        distance = tasks.calculate_distance(42.87, 74.6, 42.878, 74.6)
+
+        walking = recommend_report_interval(self.user.id, 42.878, 74.6)
+        cycling = recommend_report_interval(self.user.id, 42.878, 74.6, speed=5)
+        driving = recommend_report_interval(self.user.id, 42.878, 74.6, speed=10)
+
+        # Ближе граница выхода (150 м), а не входа (100 м)
+        self.assertAlmostEqual(walking['nearest_boundary'], distance - 150, delta=0.1)
+        self.assertEqual(walking['reason'], 'geozone')
+        self.assertEqual(walking['interval'], int((distance - 150) / 1.5 * 0.5))
+        self.assertEqual(cycling['interval'], int((distance - 150) / 5 * 0.5))
+        self.assertEqual(driving['interval'], int((distance - 150) / 10 * 0.5))
+
+    def test_interval_is_clamped(self):
+        self._zone()
+
+        near = recommend_report_interval(self.user.id, 42.87, 74.6012)
+        far = recommend_report_interval(self.user.id, 43.5, 74.6)
+
+        self.assertEqual(near['interval'], 10)
+        self.assertEqual(far['interval'], 300)
+
+    def test_zone_change_resets_cached_boundaries(self):
+        self.assertEqual(recommend_report_interval(self.user.id, 42.87, 74.6)['reason'], 'idle')
+
+        self._zone()
+
+        self.assertEqual(recommend_report_interval(self.user.id, 42.8718, 74.6)['reason'], 'geozone')
+
+    def test_active_share_and_sos_override(self):
+        contact = EmergencyContact.objects.create(user=self.user, name='Мама', phone_number='+996700000005')
+        SharedLocation.objects.create(
+            user=self.user, shared_with=contact, share_token='token-150', duration_minutes=30,
+            start_time=timezone.now(), end_time=timezone.now() + timedelta(minutes=30),
+        )
+        sharing_result = recommend_report_interval(self.user.id, 42.87, 74.6)
+        self.assertEqual((sharing_result['interval'], sharing_result['reason']), (15, 'sharing'))
+
+        SOSAlert.objects.create(user=self.user)
+        sos_result = recommend_report_interval(self.user.id, 42.87, 74.6)
+        self.assertEqual((sos_result['interval'], sos_result['reason']), (5, 'sos'))
+        self.assertTrue(sos_result['sos_active'])
+
+
+class GeozoneSkipAheadTests(TestCase):
+    """Точки, с которых граница зоны недостижима, не проверяются"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+996555000100')
+        self.geozone = Geozone.objects.create(
+            user=self.user,
+            name='Дом',
+            latitude=42.87,
+            longitude=74.6,
+            radius=100,
+            min_dwell_seconds=0,
+            notify_on_enter=False,
+            notify_on_exit=False,
+        )
+        self.t0 = timezone.now()
+
+    def _fix(self, latitude, seconds):
+        location = LocationHistory.objects.create(
+            user=self.user,
+            latitude=latitude,
+            longitude=74.6,
+            accuracy=5,
+            timestamp=self.t0 + timedelta(seconds=seconds),
+        )
+        before = geozone_cache.get_stats()
+        check_geozone_events(self.user.id, location.id)
+        after = geozone_cache.get_stats()
+        return after['hits'] - before['hits'] == 1
+
+    def test_fix_is_skipped_while_boundary_is_out_of_reach(self):
+        # ~5 км от центра зоны: при 50 м/с граница достижима через ~100 с
+        self.assertFalse(self._fix(42.915, 0))
+        self.assertTrue(self._fix(42.915, 10))
+        self.assertFalse(self._fix(42.915, 200))
+
+    def test_geozone_change_drops_margin(self):
+        self._fix(42.915, 0)
+
+        self.geozone.radius = 200
+        self.geozone.save()
+
+        self.assertFalse(self._fix(42.915, 10))
+
+    def test_entering_zone_updates_membership(self):
+        self._fix(42.915, 0)
+        self._fix(42.87, 600)
+
+        membership = GeozoneMembership.objects.get(user=self.user, geozone=self.geozone)
+        self.assertEqual(membership.state, 'inside')
+
+    def test_pending_transition_disables_skipping(self):
+        self.geozone.min_dwell_seconds = 60
+        self.geozone.save()
+
+        self.assertFalse(self._fix(42.87, 0))
+        self.assertTrue(geozone_cache.has_pending(self.user.id))
+        self.assertFalse(self._fix(42.87, 1))
+
+    def test_failure_is_logged_with_traceback(self):
+        with self.assertLogs('geolocation.tasks', level='ERROR') as logs:
+            self.assertFalse(check_geozone_events(self.user.id, 0))
+
+        self.assertIsNotNone(logs.records[0].exc_info)
+
+
+@override_settings(LOCATION_RAW_RETENTION_DAYS=90, LOCATION_ROLLUP_RETENTION_DAYS=365)
+class LocationRetentionTests(TestCase):
+    """Старые точки сворачиваются в почасовые сводки, старые сводки уходят в архив"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+996555000200')
+        self.now = timezone.now()
+        self.hour = (self.now - timedelta(days=100)).replace(minute=0, second=0, microsecond=0)
+
+    def _point(self, timestamp, latitude=42.87):
+        return LocationHistory.objects.create(
+            user=self.user, latitude=latitude, longitude=74.6, accuracy=5, timestamp=timestamp
+        )
+
+    def _old_points(self):
+        for minute, latitude in ((5, 42.87), (20, 42.871), (40, 42.872)):
+            self._point(self.hour + timedelta(minutes=minute), latitude)
+        self._point(self.hour + timedelta(hours=1, minutes=10))
+        return self._point(self.now - timedelta(days=1))
+
+    def test_old_points_are_rolled_up_per_hour(self):
+        recent = self._old_points()
+
+        self.assertEqual(rollup_raw_locations(now=self.now), 4)
+
+        self.assertEqual(list(LocationHistory.objects.values_list('id', flat=True)), [recent.id])
+        rollup = LocationRollup.objects.get(user=self.user, bucket_start=self.hour)
+        self.assertEqual(rollup.point_count, 3)
+        self.assertAlmostEqual(rollup.latitude, 42.871, places=6)
+        self.assertEqual((rollup.min_latitude, rollup.max_latitude), (42.87, 42.872))
+        self.assertAlmostEqual(rollup.distance, 222, delta=2)
+        self.assertEqual(rollup.first_timestamp, self.hour + timedelta(minutes=5))
+        self.assertEqual(rollup.last_timestamp, self.hour + timedelta(minutes=40))
+        self.assertEqual(LocationRollup.objects.count(), 2)
+
+    def test_interrupted_run_resumes_into_same_rollup(self):
+        self._old_points()
+
+        self.assertEqual(rollup_raw_locations(batch_size=2, max_batches=1, now=self.now), 2)
+        self.assertEqual(rollup_raw_locations(batch_size=2, now=self.now), 2)
+
+        rollup = LocationRollup.objects.get(user=self.user, bucket_start=self.hour)
+        self.assertEqual(rollup.point_count, 3)
+        self.assertAlmostEqual(rollup.latitude, 42.871, places=6)
+        self.assertAlmostEqual(rollup.distance, 222, delta=2)
+
+    def test_expired_rollups_are_archived(self):
+        self._old_points()
+        rollup_raw_locations(now=self.now)
+        expired_hour = self.now.replace(minute=0, second=0, microsecond=0) - timedelta(days=400)
+        LocationRollup.objects.filter(bucket_start=self.hour).update(bucket_start=expired_hour)
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            with override_settings(LOCATION_ARCHIVE_DIR=archive_dir):
+                self.assertEqual(archive_rollups(now=self.now), 1)
+
+            files = list(Path(archive_dir).iterdir())
+            self.assertEqual(len(files), 1)
+            with gzip.open(files[0], 'rt', encoding='utf-8') as archive:
+                rows = [json.loads(line) for line in archive]
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['point_count'], 3)
+        self.assertEqual(rows[0]['bucket_start'], expired_hour.isoformat())
+        self.assertEqual(
+            list(LocationRollup.objects.values_list('bucket_start', flat=True)),
+            [self.hour + timedelta(hours=1)]
+        )
+
+
+@override_settings(
+    LOCATION_DEDUP_ENABLED=True,
+    LOCATION_DEDUP_MIN_DISTANCE=15,
+    LOCATION_DEDUP_MAX_DISTANCE=75,
+    LOCATION_DEDUP_MAX_INTERVAL=600,
+    LOCATION_DEDUP_MAX_SPEED=1.0,
+)
+class LocationDedupTests(TestCase):
+    """Повторная точка рядом с последней сливается с ней, а не пишется заново"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+996555000300')
+        self.t0 = timezone.now() - timedelta(hours=1)
+        self.last = LocationHistory.objects.create(
+            user=self.user, latitude=42.87, longitude=74.6, accuracy=20, timestamp=self.t0
+        )
+
+    def _data(self, seconds=60, latitude=42.8701, **extra):
+        data = {
+            'latitude': latitude,
+            'longitude': 74.6,
+            'accuracy': 20,
+            'timestamp': self.t0 + timedelta(seconds=seconds),
+        }
+        data.update(extra)
+        return data
+
+    def test_close_fix_is_merged(self):
+        merged = merge_duplicate_location(self.user, self._data(battery_level=40))
+
+        self.assertEqual(merged.id, self.last.id)
+        self.assertEqual(merged.dwell_count, 2)
+        self.assertEqual(merged.last_seen_at, self.t0 + timedelta(seconds=60))
+        self.assertEqual(merged.battery_level, 40)
+        self.assertEqual(float(merged.latitude), 42.87)
+
+    def test_more_accurate_fix_refines_position(self):
+        merged = merge_duplicate_location(self.user, self._data(accuracy=5))
+
+        self.assertEqual(float(merged.latitude), 42.8701)
+        self.assertEqual(merged.accuracy, 5)
+
+    def test_movement_is_stored(self):
+        cases = {
+            'далеко': self._data(latitude=42.872),
+            'скорость': self._data(speed=3.0),
+            'активность': self._data(activity_type='walking'),
+            'давно': self._data(seconds=700),
+            'не по порядку': self._data(seconds=-10),
+        }
+        for name, data in cases.items():
+            with self.subTest(name):
+                self.assertIsNone(merge_duplicate_location(self.user, data))
+
+    def test_pending_geozone_transition_disables_merge(self):
+        geozone_cache.set_pending(self.user.id, True)
+
+        self.assertIsNone(merge_duplicate_location(self.user, self._data()))
+
+    def test_merged_post_is_published_and_changes_share_version(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        version = sharing.get_location_version(self.user.id)
+        data = self._data()
+        data['timestamp'] = data['timestamp'].isoformat()
+
+        with mock.patch.object(sharing, 'publish_location') as publish:
+            response = client.post('/api/location-history/', data, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['dwell_count'], 2)
+        self.assertEqual(LocationHistory.objects.filter(user=self.user).count(), 1)
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args[0][1]['id'], self.last.id)
+        self.assertNotEqual(sharing.get_location_version(self.user.id), version)
+
+
+class MicrodegreeFieldTests(TestCase):
+    """Координаты хранятся целыми микроградусами и читаются как float"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+996555000360')
+
+    def _raw(self, location):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT latitude_e6, longitude_e6 FROM geolocation_locationhistory WHERE id = %s',
+                [location.id]
+            )
+            return cursor.fetchone()
+
+    def test_round_trip_rounds_to_microdegrees(self):
+        location = LocationHistory.objects.create(
+            user=self.user, latitude=42.87462149, longitude=-74.00000051, accuracy=5,
+            timestamp=timezone.now(),
+        )
+
+        self.assertEqual(self._raw(location), (42874621, -74000001))
+        location.refresh_from_db()
+        self.assertEqual((location.latitude, location.longitude), (42.874621, -74.000001))
+        self.assertIsInstance(location.latitude, float)
+
+    def test_extremes_and_lookups(self):
+        for latitude, longitude in ((90, 180), (-90, -180), (0, 0)):
+            location = LocationHistory.objects.create(
+                user=self.user, latitude=latitude, longitude=longitude, accuracy=5,
+                timestamp=timezone.now(),
+            )
+            self.assertEqual(self._raw(location), (latitude * 1_000_000, longitude * 1_000_000))
+
+        self.assertEqual(LocationHistory.objects.filter(latitude__gte=89.9999995).count(), 1)
+        self.assertEqual(to_microdegrees('-0.0000004'), 0)
+
+    def test_nullable_coordinates_stay_null(self):
+        alert = SOSAlert.objects.create(user=self.user)
+
+        alert.refresh_from_db()
+        self.assertIsNone(alert.latitude)
+
+    def test_serializer_validates_range_and_formats_six_decimals(self):
+        data = {'latitude': 42.87, 'longitude': 74.6, 'accuracy': 5, 'timestamp': timezone.now()}
+        for field, value in (('latitude', 90.000001), ('latitude', -91), ('longitude', 180.5)):
+            with self.subTest(field=field, value=value):
+                serializer = LocationHistorySerializer(data={**data, field: value})
+                self.assertFalse(serializer.is_valid())
+                self.assertIn(field, serializer.errors)
+
+        location = LocationHistory.objects.create(user=self.user, **data)
+        location.refresh_from_db()
+        self.assertEqual(LocationHistorySerializer(location).data['latitude'], '42.870000')
+
+
+class CoordinateBackfillTests(TestCase):
+    """Перенос десятичных координат в микроградусы пачками с продолжением"""
+
+    table = 'test_backfill_coordinates'
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {self.table} (id INTEGER PRIMARY KEY, latitude REAL, longitude REAL, '
+                f'latitude_e6 INTEGER NULL, longitude_e6 INTEGER NULL)'
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (id, latitude, longitude) VALUES (%s, %s, %s)',
+                [(1, 42.8746215, 74.6), (2, -33.8688197, 151.2092955), (3, None, None),
+                 (4, 0.0000004, -0.0000006), (5, 89.999999, -179.999999)]
+            )
+        self.addCleanup(self._drop)
+
+    def _drop(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {self.table}')
+
+    def _rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id, latitude_e6, longitude_e6 FROM {self.table} ORDER BY id')
+            return cursor.fetchall()
+
+    def test_interrupted_backfill_resumes(self):
+        self.assertEqual(backfill_table(connection, self.table, batch_size=2, max_batches=1), 2)
+        self.assertEqual(self._rows()[2:], [(3, None, None), (4, None, None), (5, None, None)])
+
+        self.assertEqual(backfill_table(connection, self.table, batch_size=2), 2)
+        self.assertEqual(backfill_table(connection, self.table, batch_size=2), 0)
+
+        self.assertEqual(self._rows(), [
+            (1, 42874622, 74600000),
+            (2, -33868820, 151209296),
+            (3, None, None),
+            (4, 0, -1),
+            (5, 89999999, -179999999),
+        ])
+
+    def test_already_converted_rows_are_not_touched(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {self.table} SET latitude_e6 = 1, longitude_e6 = 1 WHERE id = 1')
+
+        self.assertEqual(backfill_table(connection, self.table), 3)
+        self.assertEqual(self._rows()[0], (1, 1, 1))
+
+
+class TrackEncodingTests(SimpleTestCase):
+    """Компактные форматы трека: polyline и columnar"""
+
+    def _row(self, row_id, latitude, longitude, seconds):
+        return SimpleNamespace(
+            id=row_id, latitude=latitude, longitude=longitude, accuracy=5, altitude=None,
+            speed=None, heading=None, address='', activity_type='', battery_level=None,
+            timestamp=datetime(2026, 1, 1, tzinfo=dt_timezone.utc) + timedelta(seconds=seconds),
+        )
+
+    def test_google_reference_polyline(self):
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+
+        self.assertEqual(encode_polyline(points), '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+
+    def test_zero_and_negative_deltas(self):
+        self.assertEqual(encode_polyline([(0, 0), (0, 0)]), '????')
+        self.assertEqual(encode_polyline([(0.00001, 0), (0, -0.00001)]), 'A?@@')
+        self.assertEqual(encode_polyline([]), '')
+
+    def test_extend_matches_full_encoding(self):
+        points = [(42.87, 74.6), (42.8712, 74.5981), (42.8712, 74.5981)]
+
+        encoded = ''
+        previous = None
+        for point in points:
+            encoded = extend_polyline(encoded, previous, point)
+            previous = point
+
+        self.assertEqual(encoded, encode_polyline(points))
+
+    def test_polyline_track_is_oldest_first(self):
+        rows = [self._row(3, 42.88, 74.6, 120), self._row(2, 42.871, 74.6, 0), self._row(1, 42.87, 74.6, 0)]
+
+        track = encode_track(rows, 'polyline')
+
+        self.assertEqual(track['count'], 3)
+        self.assertEqual(track['polyline'], encode_polyline([(42.87, 74.6), (42.871, 74.6), (42.88, 74.6)]))
+        self.assertEqual(track['start'], int(rows[2].timestamp.timestamp()))
+        self.assertEqual(track['time_deltas'], [0, 120])
+
+    def test_columnar_track_has_parallel_arrays(self):
+        rows = [self._row(2, 42.88, 74.61, 60), self._row(1, 42.87, 74.6, 0)]
+
+        track = encode_track(rows, 'columnar')
+
+        self.assertEqual(track['format'], 'columnar')
+        self.assertEqual(track['columns']['id'], [1, 2])
+        self.assertEqual(track['columns']['latitude'], [42.87, 42.88])
+        self.assertEqual(track['columns']['timestamp'][1] - track['columns']['timestamp'][0], 60)
+        self.assertTrue(all(len(column) == 2 for column in track['columns'].values()))
+
+    def test_empty_track(self):
+        self.assertEqual(encode_track([], 'polyline')['start'], None)
+        self.assertEqual(encode_track([], 'columnar')['count'], 0)
+
+
+class TrackFormatTests(TestCase):
+    """?format= выбирает компактный формат на эндпоинтах трека"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+996555000305')
+        t0 = timezone.now() - timedelta(hours=1)
+        self.points = [
+            LocationHistory.objects.create(
+                user=self.user, latitude=42.87 + i / 100, longitude=74.6, accuracy=10,
+                timestamp=t0 + timedelta(minutes=i),
+            )
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_track_formats(self):
+        polyline = self.client.get('/api/location-history/track/', {'format': 'polyline'})
+        self.assertEqual(polyline.status_code, 200)
+        self.assertEqual(
+            polyline.json()['polyline'],
+            encode_polyline([(point.latitude, point.longitude) for point in self.points])
+        )
+
+        columnar = self.client.get('/api/location-history/track/', {'format': 'columnar'}).json()
+        self.assertEqual(columnar['columns']['id'], [point.id for point in self.points])
+
+        plain = self.client.get('/api/location-history/track/').json()
+        self.assertEqual([point['id'] for point in plain], [point.id for point in self.points])
+
+    def test_paginated_list_is_encoded_per_page(self):
+        response = self.client.get('/api/location-history/', {'format': 'columnar'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(
+            sorted(response.json()['results']['columns']['id']), [point.id for point in self.points]
+        )
+
+    def test_unknown_format_is_not_acceptable(self):
+        response = self.client.get('/api/location-history/track/', {'format': 'kml'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class LocationExportTests(TestCase):
+    """Выгрузка истории: форматы, продолжение с after_id, потоковая отдача под ASGI"""
+
+    url = '/api/location-history/export/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+996555000310')
+        t0 = timezone.now() - timedelta(hours=1)
+        self.points = [
+            LocationHistory.objects.create(
+                user=self.user, latitude=42.87 + i / 1000, longitude=74.6, accuracy=10,
+                altitude=800 if i == 0 else None, timestamp=t0 + timedelta(minutes=i),
+            )
+            for i in range(3)
+        ]
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def _export(self, **params):
+        response = await self.async_client.get(self.url, params, headers=self.headers)
+        if not response.streaming:
+            return response, None
+        # Как ASGI-обработчик: синхронный итератор здесь был бы собран в память целиком
+        with warnings.catch_warnings():
+            warnings.filterwarnings('error', message='StreamingHttpResponse must consume')
+            body = b''.join([chunk async for chunk in response])
+        return response, body.decode()
+
+    async def test_ndjson_is_streamed_asynchronously(self):
+        response, body = await self._export()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [point.id for point in self.points])
+        self.assertEqual(rows[1]['latitude'], 42.871)
+
+    async def test_csv_has_header_and_rows(self):
+        response, body = await self._export(format='csv')
+
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0][:3], ['id', 'latitude', 'longitude'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [point.id for point in self.points])
+        self.assertEqual(rows[2][4], '')
+
+    async def test_gpx_track(self):
+        response, body = await self._export(format='gpx')
+
+        self.assertTrue(response['Content-Type'].startswith('application/gpx+xml'))
+        self.assertEqual(body.count('<trkpt '), 3)
+        self.assertIn('<ele>800.0</ele>', body)
+        self.assertTrue(body.rstrip().endswith('</gpx>'))
+
+    async def test_after_id_resumes_after_row(self):
+        response, body = await self._export(after_id=self.points[0].id)
+
+        ids = [json.loads(line)['id'] for line in body.splitlines()]
+        self.assertEqual(ids, [point.id for point in self.points[1:]])
+
+        response, _ = await self._export(after_id='nope')
+        self.assertEqual(response.status_code, 400)
+
+    def test_keyset_chunks_do_not_skip_equal_timestamps(self):
+        same = self.points[1].timestamp
+        extra = [
+            LocationHistory.objects.create(
+                user=self.user, latitude=42.9, longitude=74.6, accuracy=10, timestamp=same
+            )
+            for _ in range(3)
+        ]
+
+        rows = iter_export_rows(LocationHistory.objects.filter(user=self.user), chunk_size=2)
+
+        expected = [self.points[0], self.points[1], *extra, self.points[2]]
+        self.assertEqual([row['id'] for row in rows], [point.id for point in expected])
+
+
+class SharedLocationTrackTests(TestCase):
+    """Публичная ссылка: ETag/304, курсор since и отзыв ссылки"""
+
+    url = '/api/shared-locations/track_by_token/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+996555000320')
+        self.contact = EmergencyContact.objects.create(
+            user=self.user, name='Мама', phone_number='+996700000003'
+        )
+        now = timezone.now()
+        self.share = SharedLocation.objects.create(
+            user=self.user, shared_with=self.contact, share_token='token-320',
+            duration_minutes=60, start_time=now - timedelta(minutes=10),
+            end_time=now + timedelta(minutes=50),
+        )
+        self.points = [self._add_point(minutes) for minutes in (9, 6, 3)]
+        self.client = APIClient()
+
+    def _add_point(self, minutes_ago):
+        location = LocationHistory.objects.create(
+            user=self.user, latitude=42.87, longitude=74.6, accuracy=10,
+            timestamp=timezone.now() - timedelta(minutes=minutes_ago),
+        )
+        sharing.note_new_location(self.user.id, location.id)
+        return location
+
+    def _get(self, **params):
+        headers = {}
+        if 'etag' in params:
+            headers['HTTP_IF_NONE_MATCH'] = params.pop('etag')
+        return self.client.get(self.url, {'token': 'token-320', **params}, **headers)
+
+    def test_matching_etag_gets_304_until_new_point(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['locations']), 3)
+        etag = response['ETag']
+
+        self.assertEqual(self._get(etag=etag).status_code, 304)
+
+        self._add_point(0)
+        response = self._get(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_since_returns_points_after_cursor(self):
+        cursor = self._get().data['cursor']
+        self.assertEqual(cursor, self.points[-1].id)
+
+        newer = self._add_point(0)
+        response = self._get(since=cursor)
+
+        self.assertEqual([point['id'] for point in response.data['locations']], [newer.id])
+        self.assertEqual(response.data['cursor'], newer.id)
+        self.assertEqual(self._get(since=newer.id).data['locations'], [])
+
+    def test_compact_format_has_its_own_etag(self):
+        plain = self._get()
+        polyline = self._get(format='polyline')
+
+        self.assertEqual(polyline.status_code, 200)
+        self.assertEqual(polyline.data['locations']['count'], 3)
+        self.assertEqual(
+            polyline.data['locations']['polyline'],
+            encode_polyline([(point.latitude, point.longitude) for point in self.points])
+        )
+        self.assertNotEqual(polyline['ETag'], plain['ETag'])
+
+    def test_cancel_revokes_link(self):
+        self.assertEqual(self._get().status_code, 200)
+
+        self.share.status = 'cancelled'
+        self.share.save()
+
+        self.assertEqual(self._get().status_code, 404)
+
+    def test_contact_deletion_revokes_link(self):
+        self.assertEqual(self._get().status_code, 200)
+
+        with mock.patch.object(sharing, 'publish_share_ended') as ended:
+            self.contact.delete()
+
+        self.assertEqual(self._get().status_code, 404)
+        ended.assert_called_once_with(self.share.id, 'cancelled')
+
+    def test_share_deleted_behind_stale_cache_is_404(self):
+        share = sharing.get_active_share('token-320')
+        self.share.delete()
+        cache.set(sharing._share_key('token-320'), share, 60)
+
+        self.assertEqual(self._get().status_code, 404)
+        self.assertIsNone(cache.get(sharing._share_key('token-320')))
+
+
+class ExpireSharedLocationsTests(TestCase):
+    """Истекшие ссылки закрываются пачками, кэш ссылок сбрасывается"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+996555000340')
+        self.contact = EmergencyContact.objects.create(
+            user=self.user, name='Мама', phone_number='+996700000006'
+        )
+
+    def _shares(self, count, minutes_left):
+        now = timezone.now()
+        return [
+            SharedLocation.objects.create(
+                user=self.user, shared_with=self.contact, share_token=f'token-{minutes_left}-{i}',
+                duration_minutes=30, start_time=now - timedelta(minutes=30),
+                end_time=now + timedelta(minutes=minutes_left),
+            )
+            for i in range(count)
+        ]
+
+    def test_expired_shares_are_closed_in_batches(self):
+        expired = self._shares(5, -1)
+        live = self._shares(1, 10)
+
+        with mock.patch.object(sharing, 'publish_share_ended') as ended, \
+                mock.patch.object(sharing, 'invalidate_share', wraps=sharing.invalidate_share) as dropped, \
+                mock.patch.object(SharedLocation.objects, 'filter', wraps=SharedLocation.objects.filter) as query:
+            self.assertEqual(tasks.expire_shared_locations(batch_size=2), 5)
+
+        # 3 выборки пачек (2 + 2 + 1) и 3 UPDATE
+        self.assertEqual(query.call_count, 6)
+        self.assertEqual(
+            sorted(call.args[0] for call in ended.call_args_list), [share.id for share in expired]
+        )
+        self.assertEqual(SharedLocation.objects.filter(status='expired').count(), 5)
+        self.assertEqual(SharedLocation.objects.get(id=live[0].id).status, 'active')
+        self.assertEqual(
+            sorted(call.args[0] for call in dropped.call_args_list),
+            sorted(share.share_token for share in expired)
+        )
+        self.assertEqual(sharing.get_active_share_ids(self.user.id), [live[0].id])
+
+    def test_exact_multiple_of_batch_size(self):
+        self._shares(4, -1)
+
+        with mock.patch.object(sharing, 'publish_share_ended'):
+            self.assertEqual(tasks.expire_shared_locations(batch_size=2), 4)
+            self.assertEqual(tasks.expire_shared_locations(batch_size=2), 0)
+
+        self.assertFalse(SharedLocation.objects.filter(status='active').exists())
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class SharedLocationConsumerTests(TransactionTestCase):
+    """WebSocket ссылки: снимок при подключении, новые точки и завершение"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+996555000330')
+        self.contact = EmergencyContact.objects.create(
+            user=self.user, name='Папа', phone_number='+996700000004'
+        )
+        now = timezone.now()
+        self.share = SharedLocation.objects.create(
+            user=self.user, shared_with=self.contact, share_token='token-330',
+            duration_minutes=60, start_time=now - timedelta(minutes=10),
+            end_time=now + timedelta(minutes=50),
+        )
+        self.location = LocationHistory.objects.create(
+            user=self.user, latitude=42.87, longitude=74.6, accuracy=10,
+            timestamp=now - timedelta(minutes=5),
+        )
+
+    def _communicator(self, token='token-330'):
+        return WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/shared-locations/{token}/')
+
+    def test_snapshot_then_live_points(self):
+        async def scenario():
+            communicator = self._communicator()
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual(snapshot['type'], 'snapshot')
+            self.assertEqual([point['id'] for point in snapshot['locations']], [self.location.id])
+
+            await sync_to_async(sharing.publish_location)(self.user.id, {'id': 999})
+            self.assertEqual(
+                await communicator.receive_json_from(),
+                {'type': 'location', 'location': {'id': 999}}
+            )
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_cancel_ends_live_feed(self):
+        async def scenario():
+            communicator = self._communicator()
+            await communicator.connect()
+            await communicator.receive_json_from()
+
+            self.share.status = 'cancelled'
+            await sync_to_async(self.share.save)()
+
+            self.assertEqual(
+                await communicator.receive_json_from(),
+                {'type': 'ended', 'status': 'cancelled'}
+            )
+            self.assertEqual(
+                await communicator.receive_output(),
+                {'type': 'websocket.close', 'code': CLOSE_SHARE_ENDED}
+            )
+
+        async_to_sync(scenario)()
+
+    def test_contact_deletion_stops_location_pushes(self):
+        self.assertEqual(sharing.get_active_share_ids(self.user.id), [self.share.id])
+
+        self.contact.delete()
+
+        self.assertEqual(sharing.get_active_share_ids(self.user.id), [])
+
+    def test_inactive_token_is_rejected(self):
+        SharedLocation.objects.filter(pk=self.share.pk).update(status='expired')
+
+        async def scenario():
+            for token in ('token-330', 'unknown'):
+                connected, code = await self._communicator(token).connect()
+                self.assertFalse(connected)
+                self.assertEqual(code, CLOSE_INVALID_TOKEN)
+
+        async_to_sync(scenario)()
+
+
+@override_settings(
+    LOCATION_DEDUP_ENABLED=True,
+    LOCATION_DEDUP_MAX_INTERVAL=600,
+    SOS_LOCATION_MAX_AGE=1800,
+    NEARBY_LOCATION_MAX_AGE=3600,
+)
+class LatestLocationTests(TestCase):
+    """Последняя позиция свежа, пока приходят точки, даже слитые в одну"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+996555000350')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _report_stationary(self, hours=3, every=300):
+        start = timezone.now() - timedelta(hours=hours)
+        timestamps = [start + timedelta(seconds=every * i) for i in range(hours * 3600 // every + 1)]
+        for timestamp in timestamps:
+            response = self.client.post('/api/location-history/', {
+                'latitude': 42.87,
+                'longitude': 74.6,
+                'accuracy': 10,
+                'timestamp': timestamp.isoformat(),
+            }, format='json')
+            self.assertIn(response.status_code, (200, 201))
+        return start, timestamps[-1]
+
+    def test_merged_fixes_keep_sos_fallback_fresh(self):
+        start, last = self._report_stationary()
+
+        self.assertEqual(LocationHistory.objects.filter(user=self.user).count(), 1)
+        latest = get_latest_location(self.user.id)
+        self.assertEqual(latest.timestamp, start)
+        self.assertEqual(latest.last_seen_at, last)
+
+        data = {}
+        self.assertTrue(fill_sos_location(data, self.user.id))
+        self.assertEqual(data['location_timestamp'], last)
+        self.assertEqual(float(data['latitude']), 42.87)
+
+    def test_position_not_seen_recently_is_not_used_for_sos(self):
+        self._report_stationary(hours=1)
+        LatestLocation.objects.filter(user=self.user).update(
+            last_seen_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertFalse(fill_sos_location({}, self.user.id))
+
+    def test_stationary_user_reporting_is_found_nearby(self):
+        self._report_stationary()
+
+        found = nearest_users(42.871, 74.6, 1000)
+
+        self.assertEqual([latest.user_id for latest, _ in found], [self.user.id])
+        self.assertAlmostEqual(found[0][1], 111, delta=2)
+
+    def test_position_not_seen_recently_is_not_nearby(self):
+        self._report_stationary(hours=1)
+        LatestLocation.objects.filter(user=self.user).update(
+            last_seen_at=timezone.now() - timedelta(hours=2)
+        )
+
+        self.assertEqual(nearest_users(42.871, 74.6, 1000), [])
+
+
+@override_settings(GEOZONE_NOTIFICATION_WINDOW=60, CELERY_TASK_ALWAYS_EAGER=True)
+class GeozoneDigestTests(TestCase):
+    """Уведомления о геозонах за окно уходят одним SMS на номер"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+996555000400')
+        self.home, self.school = [
+            Geozone.objects.create(user=self.user, name=name, latitude=42.87, longitude=74.6, radius=100)
+            for name in ('Дом', 'Школа')
+        ]
+        self.mom, self.dad = [
+            EmergencyContact.objects.create(user=self.user, name=name, phone_number=phone)
+            for name, phone in (('Мама', '+996700000001'), ('Папа', '+996700000002'))
+        ]
+        timer = mock.patch.object(tasks.threading, 'Timer')
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+
+    def _queue(self, geozone, event_type='enter'):
+        event = GeozoneEvent.objects.create(
+            user=self.user, geozone=geozone, event_type=event_type, latitude=42.87, longitude=74.6
+        )
+        send_geozone_notification(event.id)
+        return event
+
+    def _flush(self, **kwargs):
+        with mock.patch('notifications.sms_service.SMSService') as service:
+            sms = service.return_value
+            sms.send_sms.return_value = True
+            sms.send_bulk_sms.return_value = {'success': True}
+            sent = flush_geozone_notifications(**kwargs)
+        return sent, sms
+
+    def test_missing_event_is_logged_with_traceback(self):
+        with self.assertLogs('geolocation.tasks', level='ERROR') as logs:
+            self.assertFalse(send_geozone_notification(0))
+
+        self.assertIsNotNone(logs.records[0].exc_info)
+        self.timer.assert_not_called()
+
+    def test_events_wait_for_one_window_timer(self):
+        self._queue(self.home)
+        self._queue(self.school, 'exit')
+
+        self.assertEqual(SOSNotification.objects.filter(status='pending').count(), 4)
+        self.timer.assert_called_once()
+        self.assertEqual(self.timer.call_args[0][0], 60)
+
+    def test_identical_digests_go_in_one_bulk_request(self):
+        events = [self._queue(self.home), self._queue(self.school, 'exit')]
+
+        sent, sms = self._flush()
+
+        self.assertEqual(sent, 4)
+        sms.send_sms.assert_not_called()
+        sms.send_bulk_sms.assert_called_once()
+        phones = sms.send_bulk_sms.call_args.kwargs['phones']
+        message = sms.send_bulk_sms.call_args.kwargs['message']
+        self.assertEqual(sorted(phones), ['+996700000001', '+996700000002'])
+        self.assertTrue(message.startswith('📍 Уведомления о геозонах (2):'))
+        self.assertIn("'Дом'", message)
+        self.assertIn("'Школа'", message)
+        self.assertFalse(SOSNotification.objects.exclude(status='sent').exists())
+        self.assertEqual(
+            GeozoneEvent.objects.filter(id__in=[e.id for e in events], notification_sent=True).count(), 2
+        )
+
+    def test_each_phone_gets_its_own_digest(self):
+        self.home.emergency_contacts.add(self.mom)
+        self._queue(self.home)
+        self._queue(self.school)
+
+        sent, sms = self._flush()
+
+        self.assertEqual(sent, 3)
+        sms.send_bulk_sms.assert_not_called()
+        messages = {
+            call.kwargs['to_phone']: call.kwargs['message'] for call in sms.send_sms.call_args_list
+        }
+        self.assertTrue(messages['+996700000001'].startswith('📍 Уведомления о геозонах (2):'))
+        self.assertIn("'Школа'", messages['+996700000002'])
+        self.assertNotIn("'Дом'", messages['+996700000002'])
+
+    def test_failed_sms_does_not_mark_event_notified(self):
+        self.home.emergency_contacts.add(self.mom)
+        home = self._queue(self.home)
+        school = self._queue(self.school)
+
+        with mock.patch('notifications.sms_service.SMSService') as service:
+            service.return_value.send_sms.side_effect = lambda to_phone, message: to_phone == '+996700000002'
+            sent = flush_geozone_notifications()
+
+        self.assertEqual(sent, 1)
+        self.assertEqual(SOSNotification.objects.filter(status='failed').count(), 2)
+        home.refresh_from_db()
+        school.refresh_from_db()
+        self.assertFalse(home.notification_sent)
+        self.assertTrue(school.notification_sent)
+
+    def test_fresh_rows_are_left_to_their_window(self):
+        self._queue(self.home)
+
+        sent, sms = self._flush(min_age=60)
+
+        self.assertEqual(sent, 0)
+        self.assertEqual(SOSNotification.objects.filter(status='pending').count(), 2)
+
+    def test_busy_flush_is_rescheduled(self):
+        self._queue(self.home)
+        self.timer.reset_mock()
+        cache.add(tasks.FLUSH_LOCK_KEY, True, 300)
+
+        sent, sms = self._flush()
+
+        self.assertEqual(sent, 0)
+        sms.send_sms.assert_not_called()
+        self.timer.assert_called_once()
+        self.assertEqual(self.timer.call_args[0][0], tasks.FLUSH_RETRY_DELAY)
+
+
+@override_settings(
+    LOCATION_STAY_RADIUS=100,
+    LOCATION_STAY_MIN_DURATION=300,
+    LOCATION_TRIP_PATH_TOLERANCE=25,
+    LOCATION_SEGMENT_MAX_GAP=21600,
+)
+class LocationSegmentTests(TestCase):
+    """История делится на остановки и поездки по мере поступления точек"""
+
+    # Стоим в A, проезжаем ~1.5 км на север и стоим в B
+    ROUTE = (
+        [(seconds, 42.87) for seconds in range(0, 301, 60)]
+        + [(360, 42.8745), (420, 42.879), (480, 42.8835)]
+        + [(seconds, 42.8835) for seconds in range(540, 781, 60)]
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+996555000500')
+        self.t0 = timezone.now() - timedelta(days=1)
+
+    def _at(self, seconds):
+        return self.t0 + timedelta(seconds=seconds)
+
+    def _feed(self, route):
+        for seconds, latitude in route:
+            segment_location(self.user.id, latitude, 74.6, self._at(seconds), 10)
+
+    def test_staying_put_becomes_a_stay(self):
+        self._feed(self.ROUTE[:6])
+
+        self.assertFalse(Trip.objects.exists())
+        stay = Stay.objects.get(user=self.user)
+        self.assertTrue(stay.is_open)
+        self.assertEqual((stay.arrival, stay.departure), (self._at(0), self._at(300)))
+        self.assertEqual(stay.point_count, 6)
+
+    def test_trip_between_two_stays(self):
+        self._feed(self.ROUTE)
+
+        first, second = Stay.objects.filter(user=self.user).order_by('arrival')
+        self.assertFalse(first.is_open)
+        self.assertTrue(second.is_open)
+        self.assertEqual((second.arrival, second.departure), (self._at(480), self._at(780)))
+        self.assertAlmostEqual(float(second.latitude), 42.8835, places=6)
+
+        trip = Trip.objects.get(user=self.user)
+        self.assertFalse(trip.is_open)
+        self.assertEqual((trip.start_time, trip.end_time), (self._at(300), self._at(480)))
+        self.assertAlmostEqual(trip.distance, 1500, delta=10)
+        self.assertEqual(float(trip.end_latitude), 42.8835)
+
+    def test_long_gap_closes_open_trip(self):
+        self._feed([(0, 42.87), (60, 42.8745)])
+        self._feed([(60 + 7 * 3600, 42.879)])
+
+        closed, opened = Trip.objects.filter(user=self.user).order_by('start_time')
+        self.assertFalse(closed.is_open)
+        self.assertEqual(closed.end_time, self._at(60))
+        self.assertTrue(opened.is_open)
+        self.assertEqual(opened.start_time, self._at(60 + 7 * 3600))
+
+    def test_out_of_order_fix_is_ignored(self):
+        self._feed([(0, 42.87), (120, 42.8745)])
+        self._feed([(60, 42.879)])
+
+        trip = Trip.objects.get(user=self.user)
+        self.assertEqual(trip.point_count, 2)
+        self.assertEqual(trip.end_time, self._at(120))
+
+    def test_rebuild_replays_history_into_same_segments(self):
+        for seconds, latitude in self.ROUTE:
+            LocationHistory.objects.create(
+                user=self.user, latitude=latitude, longitude=74.6, accuracy=10, timestamp=self._at(seconds)
+            )
+
+        self.assertEqual(rebuild_segments(self.user.id), len(self.ROUTE))
+
+        self.assertEqual(Stay.objects.filter(user=self.user).count(), 2)
+        trip = Trip.objects.get(user=self.user)
+        self.assertEqual((trip.start_time, trip.end_time), (self._at(300), self._at(480)))
+        self.assertAlmostEqual(trip.distance, 1500, delta=10)
+
+    def test_timeline_lists_segments_oldest_first(self):
+        self._feed(self.ROUTE)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/location-history/timeline/', {'hours': 48})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([segment['type'] for segment in response.data], ['stay', 'trip', 'stay'])
+
+    def test_non_numeric_hours_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        for url in ('/api/location-history/timeline/', '/api/location-history/track/'):
+            for hours in ('abc', '-1', '0'):
+                with self.subTest(url=url, hours=hours):
+                    response = client.get(url, {'hours': hours})
+                    self.assertEqual(response.status_code, 400)
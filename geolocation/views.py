@@ -1,22 +1,75 @@
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
 from django.utils import timezone
 from datetime import timedelta
-from .models import LocationHistory, Geozone, GeozoneEvent, SharedLocation
-from .serializers import (LocationHistorySerializer, GeozoneSerializer, 
-                          GeozoneEventSerializer, SharedLocationSerializer)
+from .models import LocationHistory, Geozone, GeozoneEvent, SharedLocation, Stay, Trip
+from .serializers import (LocationHistorySerializer, LatestLocationSerializer,
+                          GeozoneSerializer, GeozoneEventSerializer,
+                          SharedLocationSerializer, StaySerializer, TripSerializer)
 from .tasks import check_geozone_events
+from .ingest import merge_duplicate_location
+from .reporting import recommend_report_interval
+from .latest import (get_current_location, get_latest_locations,
+                     refresh_latest_location, update_latest_location)
+from .segments import segment_location
+from .encoding import COMPACT_FORMATS, TRACK_FIELDS, encode_track, iter_export_rows
+from .renderers import EXPORT_RENDERER_CLASSES, TRACK_RENDERER_CLASSES
+from . import geozone_cache, sharing
 import secrets
 
 
+def get_track_format(request):
+    """Compact track format chosen via ``?format=polyline|columnar`` or None"""
+    track_format = getattr(request.accepted_renderer, 'format', None)
+    return track_format if track_format in COMPACT_FORMATS else None
+
+
+def _buffered(chunks, size=64 * 1024):
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def _aiter(iterator):
+    """
+    Drive a blocking iterator from the event loop, one ``next`` per thread hop.
+
+    Under ASGI Django buffers a sync iterator passed to StreamingHttpResponse
+    in full; with this wrapper each keyset chunk is read only when the client
+    is ready for more.
+    """
+    done = object()
+    try:
+        while True:
+            chunk = await sync_to_async(next)(iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(iterator.close)()
+
+
 class LocationHistoryViewSet(viewsets.ModelViewSet):
     serializer_class = LocationHistorySerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = TRACK_RENDERER_CLASSES
 
     def get_queryset(self):
-        queryset = LocationHistory.objects.filter(user=self.request.user)
+        return self._filter_dates(LocationHistory.objects.filter(user=self.request.user))
+
+    def _filter_dates(self, queryset):
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
         
@@ -27,15 +80,65 @@ class LocationHistoryViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        track_format = get_track_format(request)
+        if not track_format:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(encode_track(page, track_format))
+
+        rows = queryset.order_by('timestamp', 'id').values_list(*TRACK_FIELDS, named=True)
+        return Response(encode_track(rows, track_format))
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        data = serializer.validated_data
+        reporting = recommend_report_interval(
+            request.user.id, data['latitude'], data['longitude'], data.get('speed')
+        )
+        
+        merged = merge_duplicate_location(request.user, data)
+        if merged:
+            # timestamp точки не меняется, у последней позиции двигается last_seen_at
+            update_latest_location(merged)
+            sharing.note_merged_location(request.user.id, merged)
+            segment_location(request.user.id, data['latitude'], data['longitude'],
+                             data['timestamp'], data['accuracy'], data.get('address'))
+            merged_data = self.get_serializer(merged).data
+            # Зрители видят уточненную точку и обновленный last_seen_at
+            sharing.publish_location(request.user.id, merged_data)
+            response_data = dict(merged_data)
+            response_data['reporting'] = reporting
+            return Response(response_data, status=status.HTTP_200_OK)
+        
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        response_data = dict(serializer.data)
+        response_data['reporting'] = reporting
+        return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
+
     def perform_create(self, serializer):
         location = serializer.save(user=self.request.user)
+        update_latest_location(location)
+        segment_location(location.user_id, location.latitude, location.longitude,
+                         location.timestamp, location.accuracy, location.address)
+        sharing.note_new_location(self.request.user.id, location.id)
+        sharing.publish_location(self.request.user.id, serializer.data)
         check_geozone_events(self.request.user.id, location.id)
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        refresh_latest_location(instance.user_id)
+        sharing.forget_latest_location(instance.user_id)
+
     @action(detail=False, methods=['get'])
     def current(self, request):
-        location = LocationHistory.objects.filter(
-            user=request.user
-        ).order_by('-timestamp').first()
+        location = get_current_location(request.user.id)
         
         if location:
             serializer = self.get_serializer(location)
@@ -46,9 +149,38 @@ class LocationHistoryViewSet(viewsets.ModelViewSet):
             status=status.HTTP_404_NOT_FOUND
         )
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def latest(self, request):
+        """Latest positions of many users: ``?user_ids=1,2,3``"""
+        raw_ids = request.query_params.get('user_ids', '')
+        try:
+            user_ids = [int(user_id) for user_id in raw_ids.split(',') if user_id.strip()]
+        except ValueError:
+            return Response(
+                {'error': 'user_ids must be a comma-separated list of ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        latest = get_latest_locations(user_ids[:500])
+        serializer = LatestLocationSerializer(latest.values(), many=True)
+        return Response(serializer.data)
+
+    def _hours_param(self):
+        """``?hours=`` as a positive int (24 by default), or None if invalid"""
+        hours = self.request.query_params.get('hours', '24')
+        return int(hours) if hours.isdigit() and int(hours) > 0 else None
+
+    def _invalid_hours(self):
+        return Response(
+            {'error': 'hours must be a positive integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     @action(detail=False, methods=['get'])
     def track(self, request):
-        hours = int(request.query_params.get('hours', 24))
+        hours = self._hours_param()
+        if hours is None:
+            return self._invalid_hours()
         since = timezone.now() - timedelta(hours=hours)
         
         locations = LocationHistory.objects.filter(
@@ -56,9 +188,94 @@ class LocationHistoryViewSet(viewsets.ModelViewSet):
             timestamp__gte=since
         ).order_by('timestamp')
         
+        track_format = get_track_format(request)
+        if track_format:
+            rows = locations.values_list(*TRACK_FIELDS, named=True)
+            return Response(encode_track(rows, track_format))
+        
         serializer = self.get_serializer(locations, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def timeline(self, request):
+        """
+        Stays and trips overlapping a period, oldest first.
+
+        The period is ``?start_date=&end_date=`` or the last ``?hours=`` (24).
+        """
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        if not start_date and not end_date:
+            hours = self._hours_param()
+            if hours is None:
+                return self._invalid_hours()
+            start_date = timezone.now() - timedelta(hours=hours)
+        
+        stays = Stay.objects.filter(user=request.user)
+        trips = Trip.objects.filter(user=request.user)
+        if start_date:
+            stays = stays.filter(departure__gte=start_date)
+            trips = trips.filter(end_time__gte=start_date)
+        if end_date:
+            stays = stays.filter(arrival__lte=end_date)
+            trips = trips.filter(start_time__lte=end_date)
+        
+        segments = [(stay.arrival, 'stay', StaySerializer(stay).data) for stay in stays]
+        segments += [(trip.start_time, 'trip', TripSerializer(trip).data) for trip in trips]
+        segments.sort(key=lambda segment: segment[0])
+        
+        return Response([
+            {'type': segment_type, **data}
+            for _, segment_type, data in segments
+        ])
+
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERER_CLASSES)
+    def export(self, request):
+        """
+        Streams history as NDJSON (default), CSV or GPX (``?format=`` or Accept).
+
+        Rows are ordered by (timestamp, id); an interrupted download is
+        resumed with ``?after_id=<id of the last received row>``.
+        Staff may export another user's history with ``?user_id=``.
+        """
+        owner_id = request.user.id
+        if request.user.is_staff and request.query_params.get('user_id'):
+            try:
+                owner_id = int(request.query_params['user_id'])
+            except ValueError:
+                return Response(
+                    {'error': 'user_id must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        queryset = self._filter_dates(LocationHistory.objects.filter(user_id=owner_id))
+        
+        after_id = request.query_params.get('after_id')
+        if after_id:
+            anchor = None
+            if after_id.isdigit():
+                anchor = queryset.filter(id=after_id).values_list('timestamp', flat=True).first()
+            if anchor is None:
+                return Response(
+                    {'error': 'Unknown after_id'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            queryset = queryset.filter(
+                Q(timestamp__gt=anchor) | Q(timestamp=anchor, id__gt=after_id)
+            )
+        
+        renderer = request.accepted_renderer
+        rows = iter_export_rows(queryset)
+        response = StreamingHttpResponse(
+            _aiter(_buffered(renderer.stream(rows))),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="location-history-{owner_id}.{renderer.format}"'
+        )
+        response['Cache-Control'] = 'no-store'
+        return response
+
 
 class GeozoneViewSet(viewsets.ModelViewSet):
     serializer_class = GeozoneSerializer
@@ -84,10 +301,15 @@ class GeozoneViewSet(viewsets.ModelViewSet):
         serializer = GeozoneEventSerializer(events, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def skip_stats(self, request):
+        return Response(geozone_cache.get_stats())
+
 
 class SharedLocationViewSet(viewsets.ModelViewSet):
     serializer_class = SharedLocationSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = TRACK_RENDERER_CLASSES
 
     def get_queryset(self):
         return SharedLocation.objects.filter(user=self.request.user)
@@ -115,6 +337,13 @@ class SharedLocationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def track_by_token(self, request):
+        """
+        Public endpoint polled through the share link.
+
+        Responses carry an ``ETag``; a poll with a matching ``If-None-Match``
+        gets 304 until a new point arrives. ``since=<cursor>`` returns only
+        points newer than the ``cursor`` of a previous response.
+        """
         token = request.query_params.get('token')
         
         if not token:
@@ -123,23 +352,73 @@ class SharedLocationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            shared_location = SharedLocation.objects.get(
-                share_token=token,
-                status='active',
-                end_time__gt=timezone.now()
+        since = request.query_params.get('since')
+        if since is not None and not since.isdigit():
+            return Response(
+                {'error': 'since must be a location id'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        except SharedLocation.DoesNotExist:
+        
+        share = sharing.get_active_share(token)
+        if share is None:
             return Response(
                 {'error': 'Invalid or expired token'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        
+        track_format = get_track_format(request)
+        version = sharing.get_location_version(share['user_id'])
+        latest_id = version[0]
+        etag = sharing.track_etag(token, version, track_format, since)
+        
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+        
+        payload = sharing.get_cached_track(etag)
+        if payload is None:
+            payload = self._build_track_payload(share, latest_id, track_format, since)
+            if payload is None:
+                sharing.invalidate_share(token)
+                return Response(
+                    {'error': 'Invalid or expired token'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            sharing.set_cached_track(etag, payload)
+        
+        response = Response(payload)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def _build_track_payload(self, share, latest_id, track_format, since):
         locations = LocationHistory.objects.filter(
-            user=shared_location.user,
-            timestamp__gte=shared_location.start_time
-        ).order_by('-timestamp')[:50]
+            user_id=share['user_id'],
+            timestamp__gte=share['start_time']
+        )
+        if since is not None:
+            # Самые старые из новых точек, чтобы курсор не перескакивал
+            # через точки, если их накопилось больше 50
+            locations = list(locations.filter(id__gt=since).order_by('id')[:50])[::-1]
+            cursor = max((location.id for location in locations), default=int(since))
+        else:
+            locations = list(locations.order_by('-timestamp')[:50])
+            cursor = latest_id
         
-        return Response({
+        if track_format:
+            locations_data = encode_track(locations, track_format)
+        else:
+            locations_data = LocationHistorySerializer(locations, many=True).data
+        
+        try:
+            shared_location = SharedLocation.objects.select_related('shared_with').get(id=share['id'])
+        except SharedLocation.DoesNotExist:
+            # Удалена, пока описание ссылки лежало в кэше
+            return None
+        return {
             'shared_location': self.get_serializer(shared_location).data,
-            'locations': LocationHistorySerializer(locations, many=True).data
-        })
\ No newline at end of file
+            'locations': locations_data,
+            'cursor': cursor,
+        }
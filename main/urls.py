@@ -19,7 +19,7 @@ from subscriptions.views import (
     PaymentViewSet,
     ActivationCodeViewSet  
 )
-from notifications.views import media_preview
+from notifications.views import media_preview, telegram_webhook
 
 router = DefaultRouter()
 
@@ -63,6 +63,7 @@ urlpatterns = [
         'put': 'update_profile'
     }), name='user-update-profile'),
     path('media/sos/<int:sos_id>/', media_preview, name='media_preview'),
+    path('telegram/webhook/', telegram_webhook, name='telegram_webhook'),
 ]
 
 if settings.DEBUG:
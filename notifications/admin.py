@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import TelegramUser, MediaAccessToken, SOSMediaLog
+from django.contrib import admin, messages
+from django.utils import timezone
+from django.utils.html import format_html
+from .broadcast import start_broadcast_thread
+from .models import TelegramUser, MediaAccessToken, SOSMediaLog, Broadcast
 
 
 @admin.register(TelegramUser)
@@ -34,4 +37,72 @@ class SOSMediaLogAdmin(admin.ModelAdmin):
     list_display = ('sos_alert', 'media_type', 'file_path', 'file_size', 'upload_status', 'created_at')
     list_filter = ('media_type', 'upload_status', 'created_at')
     search_fields = ('sos_alert__id', 'file_path')
-    readonly_fields = ('created_at', 'uploaded_at')
\ No newline at end of file
+    readonly_fields = ('telegram_file_id', 'created_at', 'uploaded_at')
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('title', 'status_colored', 'progress_display', 'blocked_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('title', 'text')
+    readonly_fields = (
+        'status', 'total_count', 'sent_count', 'failed_count', 'blocked_count', 'last_user_id',
+        'error_message', 'created_by', 'created_at', 'started_at', 'finished_at', 'updated_at'
+    )
+    actions = ['start_broadcast', 'cancel_broadcast']
+    
+    fieldsets = (
+        ('Сообщение', {
+            'fields': ('title', 'text', 'parse_mode')
+        }),
+        ('Прогресс', {
+            'fields': ('status', 'total_count', 'sent_count', 'failed_count', 'blocked_count', 'last_user_id', 'error_message')
+        }),
+        ('Даты', {
+            'fields': ('created_by', 'created_at', 'started_at', 'finished_at', 'updated_at'),
+            'classes': ('collapse',)
+        }),
+    )
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+    
+    def status_colored(self, obj):
+        colors = {
+            'pending': 'gray',
+            'running': 'blue',
+            'completed': 'green',
+            'cancelled': 'orange',
+            'failed': 'red',
+        }
+        return format_html(
+            '<span style="color: {}; font-weight: bold;">{}</span>',
+            colors.get(obj.status, 'black'),
+            obj.get_status_display()
+        )
+    status_colored.short_description = 'Статус'
+    
+    def progress_display(self, obj):
+        return f"{obj.processed_count} / {obj.total_count} ({obj.progress_percent}%)"
+    progress_display.short_description = 'Прогресс'
+    
+    def start_broadcast(self, request, queryset):
+        started = 0
+        # Зависшие 'running' тоже передаем: run_broadcast сам решит, можно ли их подхватить
+        for broadcast in queryset.exclude(status='completed'):
+            start_broadcast_thread(broadcast.id)
+            started += 1
+        if started:
+            self.message_user(request, f'📣 Запущено рассылок: {started}. Обновите страницу, чтобы увидеть прогресс')
+        else:
+            self.message_user(request, '⚠️ Нечего запускать: рассылки уже идут или завершены', messages.WARNING)
+    start_broadcast.short_description = 'Запустить / продолжить рассылку'
+    
+    def cancel_broadcast(self, request, queryset):
+        cancelled = queryset.filter(status__in=['pending', 'running']).update(
+            status='cancelled', updated_at=timezone.now()
+        )
+        self.message_user(request, f'⏹ Остановлено рассылок: {cancelled}')
+    cancel_broadcast.short_description = 'Остановить рассылку'
@@ -0,0 +1,219 @@
+"""
+Рассылка сообщений всем активным пользователям Telegram бота.
+
+Пользователи читаются пачками по возрастанию id (keyset), пачка отправляется
+пулом корутин через общий ограничитель скорости (лимит Telegram - около
+30 сообщений в секунду). 429 с retry_after приостанавливает всю рассылку,
+заблокировавшие бота пользователи деактивируются одним UPDATE на пачку.
+После каждой пачки прогресс и контрольная точка (last_user_id) сохраняются,
+поэтому прерванную рассылку можно продолжить с того же места.
+"""
+import uuid
+import asyncio
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Broadcast, TelegramUser
+
+logger = logging.getLogger(__name__)
+
+RESUMABLE_STATUSES = ('pending', 'cancelled', 'failed')
+MAX_SEND_ATTEMPTS = 5
+
+
+class RateLimiter:
+    """Равномерно распределяет отправки: не чаще rate в секунду на все корутины"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_at = 0.0
+
+    async def wait(self):
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_at)
+        self.next_at = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds):
+        """Сдвинуть все следующие отправки (ответ 429 от Telegram)"""
+        now = asyncio.get_running_loop().time()
+        self.next_at = max(self.next_at, now + seconds)
+
+
+class ChunkSender:
+    def __init__(self, bot, text, parse_mode, rate, workers):
+        self.bot = bot
+        self.text = text
+        self.parse_mode = parse_mode or None
+        self.limiter = RateLimiter(rate)
+        self.semaphore = asyncio.Semaphore(workers)
+
+    async def send_chunk(self, chats):
+        """Отправить пачке [(pk, chat_id)]; вернет (sent, failed, blocked_pks)"""
+        results = await asyncio.gather(*(self._send(pk, chat_id) for pk, chat_id in chats))
+        sent = results.count('sent')
+        failed = results.count('failed')
+        blocked = [pk for (pk, _), result in zip(chats, results) if result == 'blocked']
+        return sent, failed, blocked
+
+    async def _send(self, pk, chat_id):
+        from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+        async with self.semaphore:
+            for _ in range(MAX_SEND_ATTEMPTS):
+                await self.limiter.wait()
+                try:
+                    await self.bot.send_message(chat_id, self.text, parse_mode=self.parse_mode)
+                    return 'sent'
+                except RetryAfter as e:
+                    logger.warning(f"⏳ Telegram просит подождать {e.retry_after} с")
+                    self.limiter.pause(e.retry_after)
+                except Forbidden:
+                    return 'blocked'
+                except BadRequest as e:
+                    if 'chat not found' in str(e).lower():
+                        return 'blocked'
+                    logger.error(f"❌ Рассылка, chat_id {chat_id}: {e}")
+                    return 'failed'
+                except TelegramError as e:
+                    logger.error(f"❌ Рассылка, chat_id {chat_id}: {e}")
+                    return 'failed'
+            return 'failed'
+
+
+def claim_broadcast(broadcast_id):
+    """
+    Перевести рассылку в 'running', если ее никто не отправляет; вернет токен или None.
+
+    'running' без обновлений дольше TELEGRAM_BROADCAST_STALE_AFTER считается
+    брошенной (процесс упал) и тоже может быть продолжена. Новый токен
+    отстраняет прежнего отправителя, если тот все-таки жив.
+    """
+    now = timezone.now()
+    stale_after = getattr(settings, 'TELEGRAM_BROADCAST_STALE_AFTER', 300)
+    token = uuid.uuid4().hex
+    claimed = (
+        Broadcast.objects.filter(pk=broadcast_id)
+        .filter(
+            Q(status__in=RESUMABLE_STATUSES)
+            | Q(status='running', updated_at__lt=now - timedelta(seconds=stale_after))
+        )
+        .update(
+            status='running',
+            started_at=Coalesce(F('started_at'), now),
+            finished_at=None,
+            error_message='',
+            run_token=token,
+            updated_at=now,
+        )
+    )
+    return token if claimed else None
+
+
+def run_broadcast(broadcast_id):
+    """Отправить (или продолжить) рассылку; блокирует до конца. Вернет False, если уже идет"""
+    token = claim_broadcast(broadcast_id)
+    if token is None:
+        logger.warning(f"⚠️ Рассылка {broadcast_id} уже идет или завершена")
+        return False
+
+    # Все записи отправителя - только пока токен его
+    own = Broadcast.objects.filter(pk=broadcast_id, run_token=token)
+    broadcast = Broadcast.objects.get(pk=broadcast_id)
+    recipients = TelegramUser.objects.filter(is_active=True).order_by('pk')
+    own.update(
+        total_count=broadcast.processed_count + recipients.filter(pk__gt=broadcast.last_user_id).count()
+    )
+    logger.info(f"📣 Рассылка {broadcast_id} «{broadcast.title}» запущена")
+
+    from telegram import Bot
+    from telegram.request import HTTPXRequest
+
+    workers = getattr(settings, 'TELEGRAM_BROADCAST_WORKERS', 8)
+    chunk_size = getattr(settings, 'TELEGRAM_BROADCAST_CHUNK_SIZE', 500)
+    bot = Bot(settings.TELEGRAM_BOT_TOKEN, request=HTTPXRequest(connection_pool_size=workers))
+    loop = asyncio.new_event_loop()
+    last_user_id = broadcast.last_user_id
+
+    try:
+        loop.run_until_complete(bot.initialize())
+        sender = ChunkSender(
+            bot,
+            broadcast.text,
+            broadcast.parse_mode,
+            rate=getattr(settings, 'TELEGRAM_BROADCAST_RATE', 25),
+            workers=workers,
+        )
+
+        while True:
+            chats = list(
+                recipients.filter(pk__gt=last_user_id).values_list('pk', 'chat_id')[:chunk_size]
+            )
+            if not chats:
+                own.filter(status='running').update(
+                    status='completed', finished_at=timezone.now(), updated_at=timezone.now()
+                )
+                logger.info(f"✅ Рассылка {broadcast_id} завершена")
+                break
+
+            sent, failed, blocked = loop.run_until_complete(sender.send_chunk(chats))
+            last_user_id = chats[-1][0]
+
+            with transaction.atomic():
+                if blocked:
+                    TelegramUser.objects.filter(pk__in=blocked).update(is_active=False)
+                # Пачка уже ушла: контрольная точка сохраняется при любом статусе,
+                # иначе после отмены и продолжения пачка уйдет повторно
+                still_owner = own.update(
+                    last_user_id=last_user_id,
+                    sent_count=F('sent_count') + sent,
+                    failed_count=F('failed_count') + failed,
+                    blocked_count=F('blocked_count') + len(blocked),
+                    updated_at=timezone.now(),
+                )
+            if not still_owner:
+                logger.warning(f"⚠️ Рассылку {broadcast_id} подхватил другой отправитель, останавливаемся")
+                break
+            if not own.filter(status='running').exists():
+                logger.info(f"⏹ Рассылка {broadcast_id} остановлена")
+                break
+
+            logger.info(
+                f"📣 Рассылка {broadcast_id}: +{sent} отправлено, {failed} ошибок, "
+                f"{len(blocked)} заблокировали бота (до id {last_user_id})"
+            )
+
+    except Exception as e:
+        logger.error(f"❌ Рассылка {broadcast_id} прервана: {e}", exc_info=True)
+        own.filter(status='running').update(
+            status='failed', error_message=str(e), updated_at=timezone.now()
+        )
+    finally:
+        try:
+            loop.run_until_complete(bot.shutdown())
+        finally:
+            loop.close()
+
+    return True
+
+
+def start_broadcast_thread(broadcast_id):
+    """Запустить рассылку в фоне (из админки)"""
+    import threading
+
+    def target():
+        try:
+            run_broadcast(broadcast_id)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
@@ -21,6 +21,7 @@ class EmailService:
         audio_file_path: str = None,
         video_file_path: str = None,
         is_timer: bool = False,  # НОВЫЙ ПАРАМЕТР
+        location_timestamp=None,
     ) -> bool:
         try:
             google_maps_url = None
@@ -51,6 +52,7 @@ class EmailService:
                 'address': address or 'Неизвестно',
                 'latitude': latitude,
                 'longitude': longitude,
+                'location_timestamp': location_timestamp,
                 'google_maps_url': google_maps_url,
                 'media_url': media_url,
                 'has_audio': bool(audio_file_path),
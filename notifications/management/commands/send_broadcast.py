@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from notifications.broadcast import run_broadcast
+from notifications.models import Broadcast
+
+
+class Command(BaseCommand):
+    help = 'Отправить или продолжить рассылку всем пользователям Telegram бота'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--id', type=int, help='ID существующей рассылки (продолжит с контрольной точки)')
+        parser.add_argument('--text', type=str, help='Текст новой рассылки (HTML)')
+        parser.add_argument('--title', type=str, default='', help='Название новой рассылки')
+
+    def handle(self, *args, **options):
+        if options['id']:
+            broadcast = Broadcast.objects.filter(pk=options['id']).first()
+            if broadcast is None:
+                raise CommandError(f"Рассылка {options['id']} не найдена")
+        elif options['text']:
+            broadcast = Broadcast.objects.create(
+                title=options['title'] or options['text'][:50],
+                text=options['text'],
+            )
+        else:
+            raise CommandError('Укажите --id или --text')
+
+        self.stdout.write(self.style.WARNING('='*60))
+        self.stdout.write(self.style.WARNING(f'📣 РАССЫЛКА #{broadcast.id}: {broadcast.title}'))
+        self.stdout.write(self.style.WARNING('='*60))
+
+        if not run_broadcast(broadcast.id):
+            raise CommandError('Рассылка уже идет или завершена')
+
+        broadcast.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ Статус: {broadcast.get_status_display()}\n"
+            f"   Отправлено: {broadcast.sent_count}\n"
+            f"   Ошибок: {broadcast.failed_count}\n"
+            f"   Заблокировали бота: {broadcast.blocked_count}"
+        ))
+        if broadcast.error_message:
+            self.stdout.write(self.style.ERROR(f"❌ {broadcast.error_message}"))
+        self.stdout.write('='*60 + '\n')
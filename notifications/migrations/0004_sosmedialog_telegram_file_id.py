@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sosmedialog',
+            name='telegram_file_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
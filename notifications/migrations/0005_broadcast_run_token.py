@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_sosmedialog_telegram_file_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcast',
+            name='run_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
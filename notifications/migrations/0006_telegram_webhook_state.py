@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-19 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_broadcast_run_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramUpdate',
+            fields=[
+                ('update_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('received_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Telegram Update',
+                'verbose_name_plural': 'Telegram Updates',
+            },
+        ),
+        migrations.AddField(
+            model_name='telegramuser',
+            name='awaiting_code',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -17,6 +17,9 @@ class TelegramUser(models.Model):
     phone_number = models.CharField(max_length=20, null=True, blank=True)
     
     is_active = models.BooleanField(default=True)
+    # Бот ждет код активации следующим сообщением. Хранится в базе, а не в
+    # памяти процесса: в режиме webhook ответ может прийти в другой воркер
+    awaiting_code = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -28,6 +31,19 @@ class TelegramUser(models.Model):
         return f"@{self.username or self.chat_id}"
 
 
+class TelegramUpdate(models.Model):
+    """update_id принятых webhook-обновлений: повтор от Telegram отбрасывается в любом воркере"""
+    update_id = models.BigIntegerField(primary_key=True)
+    received_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Telegram Update'
+        verbose_name_plural = 'Telegram Updates'
+    
+    def __str__(self):
+        return str(self.update_id)
+
+
 class MediaAccessToken(models.Model):
     token = models.CharField(max_length=255, unique=True, db_index=True)
     sos_alert = models.ForeignKey(
@@ -89,6 +105,10 @@ class SOSMediaLog(models.Model):
     
     media_url = models.URLField(max_length=500, blank=True)
     
+    # file_id Telegram после первой загрузки: остальным контактам файл
+    # отправляется по нему, без повторной загрузки
+    telegram_file_id = models.CharField(max_length=255, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     uploaded_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
@@ -100,3 +120,67 @@ class SOSMediaLog(models.Model):
     
     def __str__(self):
         return f"{self.get_media_type_display()} - SOS {self.sos_alert_id}"
+
+
+class Broadcast(models.Model):
+    """Рассылка сообщения всем активным пользователям Telegram бота"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+        ('failed', 'Failed'),
+    ]
+    
+    PARSE_MODE_CHOICES = [
+        ('HTML', 'HTML'),
+        ('', 'Plain text'),
+    ]
+    
+    title = models.CharField(max_length=200, help_text='Название для админки, пользователи его не видят')
+    text = models.TextField(max_length=4096)
+    parse_mode = models.CharField(max_length=10, choices=PARSE_MODE_CHOICES, default='HTML', blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    
+    # Прогресс. last_user_id - контрольная точка: все TelegramUser с id <= него
+    # уже обработаны, продолжение рассылки начинается после него
+    total_count = models.IntegerField(default=0)
+    sent_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    blocked_count = models.IntegerField(default=0)
+    last_user_id = models.BigIntegerField(default=0)
+    # Токен текущего отправителя: меняется при каждом захвате рассылки,
+    # отправитель с чужим токеном больше ничего не пишет и останавливается
+    run_token = models.CharField(max_length=32, blank=True)
+    
+    error_message = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='broadcasts'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Broadcast'
+        verbose_name_plural = 'Broadcasts'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.title} ({self.status})"
+    
+    @property
+    def processed_count(self):
+        return self.sent_count + self.failed_count + self.blocked_count
+    
+    @property
+    def progress_percent(self):
+        if not self.total_count:
+            return 0
+        return min(100, round(self.processed_count * 100 / self.total_count))
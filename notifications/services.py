@@ -204,8 +204,17 @@ class NotificationService:
         self,
         telegram_username: str,
         audio_path: str,
-        caption: Optional[str] = None
+        caption: Optional[str] = None,
+        media_log=None
     ) -> bool:
+        """
+        Отправить аудио контакту в Telegram.
+        
+        С media_log (SOSMediaLog) файл загружается в Telegram один раз:
+        полученный file_id сохраняется, и следующие контакты получают аудио
+        по нему. audio_path может быть и http(s) ссылкой - тогда файл
+        скачивает сам Telegram.
+        """
         try:
             chat_id = self._get_chat_id_by_username(telegram_username)
             
@@ -215,26 +224,49 @@ class NotificationService:
                     f"Попросите его написать /start боту."
                 )
                 return False
-            import requests
             
-            url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendAudio"
+            data = {'chat_id': chat_id}
+            if caption:
+                data['caption'] = caption
             
-            with open(audio_path, 'rb') as audio_file:
-                files = {'audio': audio_file}
-                data = {'chat_id': chat_id}
-                
-                if caption:
-                    data['caption'] = caption
-                
-                response = requests.post(url, files=files, data=data, timeout=30)
-                
+            file_id = media_log.telegram_file_id if media_log else ''
+            if file_id:
+                response = self._post_audio({**data, 'audio': file_id})
                 if response.status_code == 200:
-                    logger.info(f" Аудио отправлено @{telegram_username} (chat_id: {chat_id})")
+                    logger.info(f" Аудио отправлено @{telegram_username} по file_id (chat_id: {chat_id})")
                     return True
-                else:
-                    logger.error(f" Ошибка Telegram API: {response.text}")
-                    return False
+                # file_id протух или невалиден - загружаем заново
+                logger.warning(f" file_id не принят Telegram: {response.text}")
+                media_log.telegram_file_id = ''
+            
+            if audio_path.startswith(('http://', 'https://')):
+                response = self._post_audio({**data, 'audio': audio_path})
+            else:
+                with open(audio_path, 'rb') as audio_file:
+                    response = self._post_audio(data, files={'audio': audio_file})
+            
+            if response.status_code != 200:
+                logger.error(f" Ошибка Telegram API: {response.text}")
+                return False
+            
+            logger.info(f" Аудио отправлено @{telegram_username} (chat_id: {chat_id})")
+            if media_log is not None:
+                self._remember_file_id(media_log, response.json().get('result', {}))
+            return True
                     
         except Exception as e:
             logger.error(f" Ошибка отправки аудио: {e}", exc_info=True)
-            return False
\ No newline at end of file
+            return False
+    
+    def _post_audio(self, data, files=None):
+        url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendAudio"
+        return requests.post(url, data=data, files=files, timeout=30)
+    
+    def _remember_file_id(self, media_log, message):
+        # Повторно отправляем через sendAudio, а он принимает только file_id
+        # аудио: если Telegram распознал файл как голосовое или документ,
+        # не запоминаем - следующий контакт получит файл загрузкой
+        file_id = (message.get('audio') or {}).get('file_id')
+        if file_id:
+            media_log.telegram_file_id = file_id
+            type(media_log).objects.filter(pk=media_log.pk).update(telegram_file_id=file_id)
\ No newline at end of file
@@ -82,7 +82,11 @@ class SMSService:
         Returns:
             Dict с результатами
         """
-        if self.nikita_sms.enabled:
+        test_mode = getattr(settings, 'SMS_VERIFICATION_TEST_MODE', False)
+        if test_mode:
+            logger.info("🧪 Тестовый режим SMS включен — Nikita не используется")
+        
+        if self.nikita_sms.enabled and not test_mode:
             return self.nikita_sms.send_bulk_sms(
                 phones=phones,
                 message=message,
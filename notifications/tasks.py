@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def cleanup_telegram_updates():
+    """Удалить update_id webhook-обновлений старше TELEGRAM_UPDATE_DEDUPE_TTL"""
+    from .models import TelegramUpdate
+    
+    ttl = getattr(settings, 'TELEGRAM_UPDATE_DEDUPE_TTL', 86400)
+    deleted, _ = TelegramUpdate.objects.filter(
+        received_at__lt=timezone.now() - timedelta(seconds=ttl)
+    ).delete()
+    if deleted:
+        logger.info(f"🧹 Удалено записей об обновлениях Telegram: {deleted}")
+    return deleted
@@ -1 +1,345 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from bot import db as bot_db
+from bot.db import await_code_input, take_code_input
+from sos.models import SOSAlert
+from subscriptions.models import ActivationCode, BotSettings, SubscriptionPlan
+
+from .broadcast import ChunkSender, run_broadcast
+from .models import Broadcast, SOSMediaLog, TelegramUpdate, TelegramUser
+from .services import NotificationService
+from .tasks import cleanup_telegram_updates
+
+User = get_user_model()
+
+
+@override_settings(
+    TELEGRAM_BOT_TOKEN='123:test',
+    TELEGRAM_BROADCAST_RATE=1000,
+    TELEGRAM_BROADCAST_CHUNK_SIZE=3,
+)
+class BroadcastTests(TestCase):
+    """Рассылка с подменным ботом: контрольные точки, отмена, заблокировавшие"""
+
+    def setUp(self):
+        self.users = [TelegramUser.objects.create(chat_id=1000 + i) for i in range(7)]
+        self.broadcast = Broadcast.objects.create(title='Новости', text='<b>Привет</b>')
+        self.sent = []
+
+    def _run(self, broadcast=None):
+        async def send_message(bot, chat_id, text, parse_mode=None, **kwargs):
+            self.sent.append(chat_id)
+
+        async def noop(bot, *args, **kwargs):
+            return None
+
+        with mock.patch.object(Bot, 'send_message', send_message), \
+                mock.patch.object(Bot, 'initialize', noop), \
+                mock.patch.object(Bot, 'shutdown', noop):
+            result = run_broadcast((broadcast or self.broadcast).id)
+        self.broadcast.refresh_from_db()
+        return result
+
+    def _during_first_chunk(self, callback):
+        """Вызвать callback, пока отправляется первая пачка (вне event loop)"""
+        send_chunk = ChunkSender.send_chunk
+        calls = []
+
+        def wrapper(sender, chats):
+            if not calls:
+                calls.append(chats)
+                callback()
+            return send_chunk(sender, chats)
+
+        return mock.patch.object(ChunkSender, 'send_chunk', wrapper)
+
+    def test_sends_everyone_and_checkpoints_each_chunk(self):
+        self.assertTrue(self._run())
+
+        self.assertEqual(self.sent, [user.chat_id for user in self.users])
+        self.assertEqual(self.broadcast.status, 'completed')
+        self.assertEqual(self.broadcast.total_count, 7)
+        self.assertEqual(self.broadcast.sent_count, 7)
+        self.assertEqual(self.broadcast.last_user_id, self.users[-1].pk)
+        self.assertFalse(self._run())
+
+    def test_resume_starts_after_checkpoint(self):
+        self.broadcast.status = 'failed'
+        self.broadcast.last_user_id = self.users[2].pk
+        self.broadcast.sent_count = 3
+        self.broadcast.save()
+
+        self._run()
+
+        self.assertEqual(self.sent, [user.chat_id for user in self.users[3:]])
+        self.assertEqual(self.broadcast.sent_count, 7)
+        self.assertEqual(self.broadcast.total_count, 7)
+
+    def test_cancel_keeps_checkpoint_of_sent_chunk(self):
+        def cancel():
+            Broadcast.objects.filter(pk=self.broadcast.pk).update(status='cancelled')
+
+        with self._during_first_chunk(cancel):
+            self._run()
+
+        self.assertEqual(self.broadcast.status, 'cancelled')
+        self.assertEqual(self.broadcast.last_user_id, self.users[2].pk)
+        self.assertEqual(self.broadcast.sent_count, 3)
+
+        self.sent.clear()
+        self._run()
+
+        self.assertEqual(self.sent, [user.chat_id for user in self.users[3:]])
+        self.assertEqual(self.broadcast.sent_count, 7)
+
+    def test_superseded_runner_stops_without_writing(self):
+        def reclaim():
+            Broadcast.objects.filter(pk=self.broadcast.pk).update(run_token='other')
+
+        with self._during_first_chunk(reclaim):
+            self._run()
+
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(self.broadcast.status, 'running')
+        self.assertEqual(self.broadcast.last_user_id, 0)
+        self.assertEqual(self.broadcast.sent_count, 0)
+
+    def test_blocked_users_are_deactivated(self):
+        retries = []
+
+        async def send_message(bot, chat_id, text, parse_mode=None, **kwargs):
+            if chat_id == 1001:
+                raise Forbidden('Forbidden: bot was blocked by the user')
+            if chat_id == 1004:
+                raise BadRequest('Chat not found')
+            if chat_id == 1005:
+                raise BadRequest('Message is too long')
+            if chat_id == 1006 and not retries:
+                retries.append(chat_id)
+                raise RetryAfter(0)
+            self.sent.append(chat_id)
+
+        async def noop(bot, *args, **kwargs):
+            return None
+
+        with mock.patch.object(Bot, 'send_message', send_message), \
+                mock.patch.object(Bot, 'initialize', noop), \
+                mock.patch.object(Bot, 'shutdown', noop):
+            run_broadcast(self.broadcast.id)
+        self.broadcast.refresh_from_db()
+
+        self.assertEqual(self.sent, [1000, 1002, 1003, 1006])
+        self.assertEqual(
+            (self.broadcast.sent_count, self.broadcast.failed_count, self.broadcast.blocked_count),
+            (4, 1, 2)
+        )
+        self.assertEqual(
+            sorted(TelegramUser.objects.filter(is_active=False).values_list('chat_id', flat=True)),
+            [1001, 1004]
+        )
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, result=None, text=''):
+        self.status_code = status_code
+        self.text = text
+        self._result = result or {}
+
+    def json(self):
+        return {'ok': self.status_code == 200, 'result': self._result}
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='123:test')
+class AudioFileIdReuseTests(TestCase):
+    """Аудио SOS загружается в Telegram один раз, дальше - по file_id"""
+
+    def setUp(self):
+        user = User.objects.create_user(phone_number='+996555000900')
+        alert = SOSAlert.objects.create(user=user)
+        self.media_log = SOSMediaLog.objects.create(
+            sos_alert=alert, media_type='audio', file_path='sos/audio/1.mp3', file_size=3
+        )
+        self.audio = tempfile.NamedTemporaryFile(suffix='.mp3')
+        self.audio.write(b'ID3')
+        self.audio.flush()
+        self.addCleanup(self.audio.close)
+        self.service = NotificationService()
+        self.calls = []
+
+    def _send(self, *responses):
+        responses = list(responses)
+
+        def post_audio(data, files=None):
+            self.calls.append((data.get('audio'), bool(files)))
+            return responses.pop(0)
+
+        with mock.patch.object(self.service, '_get_chat_id_by_username', return_value=42), \
+                mock.patch.object(self.service, '_post_audio', side_effect=post_audio):
+            return self.service.send_audio_to_telegram(
+                'friend', self.audio.name, media_log=self.media_log
+            )
+
+    def test_first_send_uploads_and_next_reuses_file_id(self):
+        uploaded = FakeResponse(result={'audio': {'file_id': 'AUDIO1'}})
+        self.assertTrue(self._send(uploaded))
+        self.media_log.refresh_from_db()
+        self.assertEqual(self.media_log.telegram_file_id, 'AUDIO1')
+
+        self.assertTrue(self._send(FakeResponse()))
+        self.assertEqual(self.calls, [(None, True), ('AUDIO1', False)])
+
+    def test_voice_or_document_result_is_not_remembered(self):
+        for result in ({'voice': {'file_id': 'VOICE1'}}, {'document': {'file_id': 'DOC1'}}):
+            self.assertTrue(self._send(FakeResponse(result=result)))
+
+        self.media_log.refresh_from_db()
+        self.assertEqual(self.media_log.telegram_file_id, '')
+        self.assertEqual(self.calls, [(None, True), (None, True)])
+
+    def test_rejected_file_id_falls_back_to_upload(self):
+        SOSMediaLog.objects.filter(pk=self.media_log.pk).update(telegram_file_id='STALE')
+        self.media_log.refresh_from_db()
+
+        rejected = FakeResponse(400, text='Bad Request: wrong file identifier')
+        uploaded = FakeResponse(result={'audio': {'file_id': 'AUDIO2'}})
+        self.assertTrue(self._send(rejected, uploaded))
+
+        self.assertEqual(self.calls, [('STALE', False), (None, True)])
+        self.media_log.refresh_from_db()
+        self.assertEqual(self.media_log.telegram_file_id, 'AUDIO2')
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='123:test', TELEGRAM_WEBHOOK_SECRET='s3cret')
+class TelegramWebhookTests(TestCase):
+    """Webhook: проверка секрета, отсев повторов и общее состояние диалога"""
+
+    url = '/api/telegram/webhook/'
+
+    def setUp(self):
+        patcher = mock.patch('bot.webhook.process_update')
+        self.process_update = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, update_id=1, secret='s3cret'):
+        headers = {'HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN': secret} if secret is not None else {}
+        return self.client.post(
+            self.url, {'update_id': update_id}, content_type='application/json', **headers
+        )
+
+    def test_bad_or_missing_secret_is_forbidden(self):
+        self.assertEqual(self._post(secret='wrong').status_code, 403)
+        self.assertEqual(self._post(secret=None).status_code, 403)
+        self.process_update.assert_not_called()
+
+    def test_duplicate_update_is_processed_once(self):
+        self.assertEqual(self._post(update_id=77).status_code, 200)
+        self.assertEqual(self._post(update_id=77).status_code, 200)
+        self.assertEqual(self._post(update_id=78).status_code, 200)
+
+        self.assertEqual(
+            [call.args[0]['update_id'] for call in self.process_update.call_args_list],
+            [77, 78]
+        )
+        self.assertEqual(TelegramUpdate.objects.count(), 2)
+
+    @override_settings(TELEGRAM_UPDATE_DEDUPE_TTL=3600)
+    def test_old_update_ids_are_cleaned_up(self):
+        TelegramUpdate.objects.create(update_id=1)
+        TelegramUpdate.objects.create(update_id=2)
+        TelegramUpdate.objects.filter(update_id=1).update(
+            received_at=timezone.now() - timedelta(hours=2)
+        )
+
+        self.assertEqual(cleanup_telegram_updates(), 1)
+        self.assertEqual(list(TelegramUpdate.objects.values_list('update_id', flat=True)), [2])
+
+    async def test_code_input_state_is_shared_between_workers(self):
+        plan = await SubscriptionPlan.objects.acreate(
+            name='Premium', plan_type='personal_premium', max_contacts=5
+        )
+        await ActivationCode.objects.acreate(code='ABCD-1234-EF56', plan=plan, payment_amount=0)
+
+        self.assertEqual(await take_code_input(555, 'ABCD-1234-EF56'), (False, None))
+
+        await await_code_input(555)
+        waiting, activation = await take_code_input(555, 'ABCD-1234-EF56')
+        self.assertTrue(waiting)
+        self.assertEqual(activation.plan.name, 'Premium')
+
+        # Повтор сообщения код уже не проверяет
+        self.assertEqual(await take_code_input(555, 'ABCD-1234-EF56'), (False, None))
+
+
+class BotScreenTests(TestCase):
+    """Данные экрана бота загружаются не более одного раза за обновление"""
+
+    def setUp(self):
+        BotSettings.invalidate_cache()
+        self.addCleanup(BotSettings.invalidate_cache)
+        BotSettings.objects.create(id=1, admin_telegram_ids='42')
+        patcher = mock.patch.object(bot_db, '_load_screen', wraps=bot_db._load_screen)
+        self.load_screen = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _queries(self, func, *args, **kwargs):
+        stats = bot_db.DBStats()
+        token = bot_db._db_stats.set(stats)
+        try:
+            result = await func(*args, **kwargs)
+        finally:
+            bot_db._db_stats.reset(token)
+        return result, stats.queries
+
+    async def test_screen_is_loaded_once_per_update(self):
+        context = SimpleNamespace()
+
+        screen, queries = await self._queries(bot_db.get_screen, context, 42)
+        self.assertTrue(screen.is_admin)
+        self.assertIsNone(screen.plan)
+        self.assertGreater(queries, 0)
+
+        again, queries = await self._queries(bot_db.get_screen, context, 42)
+        self.assertIs(again, screen)
+        self.assertEqual(queries, 0)
+        self.assertEqual(self.load_screen.call_count, 1)
+
+    async def test_plan_is_loaded_on_first_request_only(self):
+        context = SimpleNamespace()
+        await bot_db.get_screen(context, 7)
+
+        with_plan = await bot_db.get_screen(context, 7, with_plan=True)
+        self.assertEqual(with_plan.plan.id, bot_db.PREMIUM_PLAN_ID)
+        self.assertFalse(with_plan.is_admin)
+
+        for plan_needed in (False, True):
+            _, queries = await self._queries(bot_db.get_screen, context, 7, with_plan=plan_needed)
+            self.assertEqual(queries, 0)
+        self.assertEqual(self.load_screen.call_count, 2)
+
+    async def test_new_update_reloads_screen(self):
+        await bot_db.get_screen(SimpleNamespace(), 42)
+        await bot_db.get_screen(SimpleNamespace(), 42)
+
+        self.assertEqual(self.load_screen.call_count, 2)
+
+    async def test_registration_primes_the_screen(self):
+        context = SimpleNamespace()
+        user = SimpleNamespace(id=42, username='alice', first_name='Alice', last_name='')
+
+        created, queries = await self._queries(bot_db.register_user, context, 42, user)
+        self.assertTrue(created)
+        self.assertGreater(queries, 0)
+
+        screen, queries = await self._queries(bot_db.get_screen, context, 42)
+        self.assertTrue(screen.is_admin)
+        self.assertEqual(queries, 0)
+        self.assertTrue(await TelegramUser.objects.filter(chat_id=42).aexists())
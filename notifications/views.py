@@ -1,6 +1,15 @@
+import hmac
+import json
+import logging
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from sos.models import SOSAlert
+from .models import TelegramUpdate
+
+logger = logging.getLogger(__name__)
 
 
 def media_preview(request, sos_id):
@@ -229,3 +238,44 @@ def media_preview(request, sos_id):
     """
     
     return HttpResponse(html, content_type='text/html')
+
+
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request):
+    """
+    Прием обновлений Telegram в режиме webhook.
+    
+    Обновление обрабатывается прямо в процессе веб-сервера, поэтому трафик
+    бота делят между собой все воркеры Daphne.
+    """
+    secret = settings.TELEGRAM_WEBHOOK_SECRET
+    if not secret or not settings.TELEGRAM_BOT_TOKEN:
+        raise Http404
+    
+    token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(token.encode(), secret.encode()):
+        return HttpResponseForbidden()
+    
+    try:
+        data = json.loads(request.body)
+        update_id = int(data['update_id'])
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest()
+    
+    # Telegram повторяет обновление, если не дождался ответа. update_id пишется
+    # в базу, поэтому повтор отбрасывается, в какой бы воркер он ни пришел
+    _, created = await TelegramUpdate.objects.aget_or_create(update_id=update_id)
+    if not created:
+        logger.info(f"🔁 Повтор обновления Telegram {update_id}, пропускаем")
+        return HttpResponse()
+    
+    from bot.webhook import process_update
+    
+    try:
+        await process_update(data)
+    except Exception as e:
+        # Отвечаем 200: повтор все равно будет отброшен как дубль
+        logger.error(f"❌ Ошибка обработки обновления Telegram {update_id}: {e}", exc_info=True)
+    
+    return HttpResponse()
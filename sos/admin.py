@@ -214,6 +214,11 @@ class SOSNotificationAdmin(admin.ModelAdmin):
     
     def sos_link(self, obj):
         """Ссылка на SOS"""
+        if obj.sos_alert is None:
+            if obj.geozone_event_id:
+                url = reverse('admin:geolocation_geozoneevent_change', args=[obj.geozone_event_id])
+                return format_html('<a href="{}">Геозона #{}</a>', url, obj.geozone_event_id)
+            return '-'
         url = reverse('admin:sos_sosalert_change', args=[obj.sos_alert.id])
         return format_html(
             '<a href="{}">SOS #{}</a>',
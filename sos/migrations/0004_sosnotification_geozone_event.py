@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0005_geozone_hysteresis'),
+        ('sos', '0003_alter_sosalert_audio_file_alter_sosalert_video_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sosnotification',
+            name='geozone_event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='geolocation.geozoneevent'),
+        ),
+        migrations.AlterField(
+            model_name='sosnotification',
+            name='sos_alert',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='sos.sosalert'),
+        ),
+    ]
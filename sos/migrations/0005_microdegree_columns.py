@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:10
+
+from django.db import migrations
+import geolocation.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sos', '0004_sosnotification_geozone_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sosalert',
+            name='latitude_e6',
+            field=geolocation.fields.MicrodegreeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sosalert',
+            name='longitude_e6',
+            field=geolocation.fields.MicrodegreeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:10
+
+from django.db import migrations
+
+from geolocation.coordinate_backfill import backfill_coordinates
+
+
+def backfill(apps, schema_editor):
+    backfill_coordinates(schema_editor.connection, tables=['sos_sosalert'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sos', '0005_microdegree_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
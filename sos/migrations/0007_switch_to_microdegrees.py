@@ -0,0 +1,48 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:10
+
+from django.db import migrations
+import geolocation.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sos', '0006_backfill_microdegrees'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='sosalert',
+            name='latitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='sosalert',
+                    name='latitude_e6',
+                ),
+                migrations.AddField(
+                    model_name='sosalert',
+                    name='latitude',
+                    field=geolocation.fields.MicrodegreeField(blank=True, db_column='latitude_e6', null=True),
+                ),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='sosalert',
+            name='longitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='sosalert',
+                    name='longitude_e6',
+                ),
+                migrations.AddField(
+                    model_name='sosalert',
+                    name='longitude',
+                    field=geolocation.fields.MicrodegreeField(blank=True, db_column='longitude_e6', null=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sos', '0007_switch_to_microdegrees'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitytimer',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['end_time'], name='timer_active_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitytimer',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['user', 'end_time'], name='timer_active_user_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sos', '0008_activitytimer_active_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sosalert',
+            name='location_timestamp',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
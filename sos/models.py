@@ -2,6 +2,7 @@ from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from cloudinary_storage.storage import VideoMediaCloudinaryStorage
+from geolocation.fields import MicrodegreeField
 
 
 class SOSAlert(models.Model):
@@ -14,9 +15,11 @@ class SOSAlert(models.Model):
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sos_alerts')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
-    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
-    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    latitude = MicrodegreeField(db_column='latitude_e6', null=True, blank=True)
+    longitude = MicrodegreeField(db_column='longitude_e6', null=True, blank=True)
     location_accuracy = models.FloatField(null=True, blank=True)
+    # Время фиксации координат, если они взяты из последней известной точки
+    location_timestamp = models.DateTimeField(null=True, blank=True)
     address = models.TextField(blank=True)
     map_link = models.URLField(max_length=500, blank=True)
     audio_file = models.FileField(upload_to='sos/audio/%Y/%m/%d/', blank=True, null=True, storage=VideoMediaCloudinaryStorage())
@@ -77,7 +80,10 @@ class SOSNotification(models.Model):
         ('telegram', 'Telegram'),
     ]
 
-    sos_alert = models.ForeignKey(SOSAlert, on_delete=models.CASCADE, related_name='notifications')
+    sos_alert = models.ForeignKey(SOSAlert, on_delete=models.CASCADE, related_name='notifications',
+                                  null=True, blank=True)
+    geozone_event = models.ForeignKey('geolocation.GeozoneEvent', on_delete=models.CASCADE,
+                                      null=True, blank=True, related_name='notifications')
     contact = models.ForeignKey('contacts.EmergencyContact', on_delete=models.CASCADE)
     notification_type = models.CharField(max_length=10, choices=NOTIFICATION_TYPE_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -125,6 +131,13 @@ class ActivityTimer(models.Model):
         verbose_name = _('Activity Timer')
         verbose_name_plural = _('Activity Timers')
         ordering = ['-created_at']
+        indexes = [
+            # Только живые строки: завершенные таймеры индекс не раздувают
+            models.Index(fields=['end_time'], condition=models.Q(status='active'),
+                         name='timer_active_end_idx'),
+            models.Index(fields=['user', 'end_time'], condition=models.Q(status='active'),
+                         name='timer_active_user_idx'),
+        ]
 
     def __str__(self):
         return f"Timer-{self.id} by {self.user.phone_number} - {self.status}"
\ No newline at end of file
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
 from .models import SOSAlert, ActivityTimer, SOSNotification
 from contacts.serializers import EmergencyContactSerializer
+from geolocation.fields import CoordinateField
 
 
 class SOSNotificationSerializer(serializers.ModelSerializer):
@@ -17,14 +18,16 @@ class SOSNotificationSerializer(serializers.ModelSerializer):
 class SOSAlertSerializer(serializers.ModelSerializer):
     notifications = SOSNotificationSerializer(many=True, read_only=True)
     user_phone = serializers.CharField(source='user.phone_number', read_only=True)
+    latitude = CoordinateField(min_value=-90, max_value=90, required=False, allow_null=True)
+    longitude = CoordinateField(min_value=-180, max_value=180, required=False, allow_null=True)
     
     class Meta:
         model = SOSAlert
         fields = ['id', 'user', 'user_phone', 'status', 'latitude', 'longitude',
-                 'location_accuracy', 'address', 'map_link', 'audio_file', 'video_file',
-                 'activation_method', 'notes', 'device_info', 'notifications',
-                 'created_at', 'updated_at', 'resolved_at']
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'resolved_at']
+                 'location_accuracy', 'location_timestamp', 'address', 'map_link',
+                 'audio_file', 'video_file', 'activation_method', 'notes', 'device_info',
+                 'notifications', 'created_at', 'updated_at', 'resolved_at']
+        read_only_fields = ['id', 'user', 'location_timestamp', 'created_at', 'updated_at', 'resolved_at']
 
 
 class SOSAlertCreateSerializer(serializers.ModelSerializer):
@@ -63,6 +66,10 @@ class SOSAlertCreateSerializer(serializers.ModelSerializer):
         return value
     
     def create(self, validated_data):
+        if validated_data.get('latitude') is None or validated_data.get('longitude') is None:
+            from geolocation.latest import fill_sos_location
+            fill_sos_location(validated_data, validated_data['user'].id)
+        
         if validated_data.get('latitude') and validated_data.get('longitude'):
             lat = validated_data['latitude']
             lng = validated_data['longitude']
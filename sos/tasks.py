@@ -1,3 +1,4 @@
+from celery import shared_task
 from django.conf import settings
 from django.utils import timezone
 import logging
@@ -14,7 +15,14 @@ def send_sos_notifications_sync(sos_alert_id, contact_ids):
         from notifications.email_service import EmailService
         
         sos_alert = SOSAlert.objects.get(id=sos_alert_id)
-        contacts = EmergencyContact.objects.filter(id__in=contact_ids)
+        contacts = list(EmergencyContact.objects.filter(id__in=contact_ids))
+        
+        # Ближайшие к месту тревоги контакты (пользователи приложения) - первыми
+        distances = {}
+        if sos_alert.latitude is not None and sos_alert.longitude is not None:
+            from geolocation.nearby import contact_distances
+            distances = contact_distances(sos_alert.latitude, sos_alert.longitude, contacts)
+            contacts.sort(key=lambda c: distances[c.id][1] if c.id in distances else float('inf'))
         
         sms_service = SMSService()
         email_service = EmailService()
@@ -71,6 +79,8 @@ def send_sos_notifications_sync(sos_alert_id, contact_ids):
                 has_audio=has_audio,
                 has_video=has_video,
                 is_timer=is_timer,
+                distance=distances[contact.id][1] if contact.id in distances else None,
+                location_timestamp=sos_alert.location_timestamp,
             )
             
             media_urls = []
@@ -124,6 +134,7 @@ def send_sos_notifications_sync(sos_alert_id, contact_ids):
                     audio_file_path=audio_file_path,  # ПЕРЕДАЕМ АУДИО
                     video_file_path=video_file_path,
                     is_timer=is_timer,  # Передаем флаг таймера
+                    location_timestamp=sos_alert.location_timestamp,
                 )
                 
                 if email_success:
@@ -161,6 +172,8 @@ def _format_sos_message_fixed(
     has_audio: bool = False,
     has_video: bool = False,
     is_timer: bool = False,
+    distance: float = None,
+    location_timestamp=None,
 ) -> str:
     base_url = getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000').rstrip('/')
     
@@ -179,6 +192,13 @@ def _format_sos_message_fixed(
     if latitude and longitude:
         google_maps_url = f"https://www.google.com/maps/search/?api=1&query={latitude},{longitude}"
         message += f"Карта:\n{google_maps_url}\n\n"
+        if location_timestamp:
+            fixed_at = timezone.localtime(location_timestamp)
+            message += f"Последняя известная точка от {fixed_at.strftime('%H:%M, %d.%m.%Y')}\n\n"
+    
+    if distance is not None:
+        from geolocation.nearby import format_distance
+        message += f"Вы примерно в {format_distance(distance)} от места тревоги\n\n"
     
     if (has_audio or has_video) and sos_alert_id:
         media_url = f"{base_url}/api/media/sos/{sos_alert_id}/"
@@ -200,8 +220,8 @@ def send_sos_notifications(sos_alert_id, contact_ids):
     return send_sos_notifications_sync(sos_alert_id, contact_ids)
 
 
-def process_sos_media(sos_alert_id):
-    """Обработка медиа файлов SOS"""
+def process_sos_media(sos_alert_id, contact_ids=None):
+    """Обработка медиа файлов SOS (аудио пересылается контактам в Telegram)"""
     try:
         from .models import SOSAlert
         from notifications.models import SOSMediaLog
@@ -212,7 +232,7 @@ def process_sos_media(sos_alert_id):
             try:
                 file_size = sos_alert.audio_file.size
                 
-                SOSMediaLog.objects.create(
+                audio_log = SOSMediaLog.objects.create(
                     sos_alert=sos_alert,
                     media_type='audio',
                     file_path=sos_alert.audio_file.name,
@@ -223,6 +243,9 @@ def process_sos_media(sos_alert_id):
                 )
                 
                 logger.info(f"✅ Аудио обработано для SOS {sos_alert_id}")
+                
+                if contact_ids:
+                    _send_sos_audio_to_telegram(sos_alert, audio_log, contact_ids)
             except Exception as e:
                 logger.error(f"❌ Ошибка обработки аудио: {e}")
         
@@ -251,11 +274,49 @@ def process_sos_media(sos_alert_id):
         return False
 
 
+def _send_sos_audio_to_telegram(sos_alert, audio_log, contact_ids):
+    """Аудио SOS контактам с Telegram: загружается один раз, дальше по file_id"""
+    from contacts.models import EmergencyContact
+    from notifications.services import NotificationService
+    
+    if not getattr(settings, 'TELEGRAM_BOT_TOKEN', ''):
+        return 0
+    
+    usernames = list(
+        EmergencyContact.objects.filter(id__in=contact_ids)
+        .exclude(telegram_username__isnull=True)
+        .exclude(telegram_username='')
+        .values_list('telegram_username', flat=True)
+    )
+    if not usernames:
+        return 0
+    
+    try:
+        audio_source = sos_alert.audio_file.path
+    except NotImplementedError:
+        # Облачное хранилище: Telegram сам скачает файл по ссылке
+        audio_source = audio_log.media_url
+    
+    user = sos_alert.user
+    user_name = f"{user.first_name} {user.last_name}".strip() or str(user.phone_number)
+    caption = f"🎤 Аудио SOS от {user_name}"
+    
+    service = NotificationService()
+    sent = sum(
+        service.send_audio_to_telegram(username, audio_source, caption=caption, media_log=audio_log)
+        for username in usernames
+    )
+    logger.info(f"🎤 Аудио SOS {sos_alert.id} отправлено в Telegram: {sent}/{len(usernames)}")
+    return sent
+
+
+@shared_task
 def check_expired_timers():
     """Проверка истекших таймеров активности"""
     try:
         from .models import ActivityTimer, SOSAlert
         from contacts.models import EmergencyContact
+        from geolocation.latest import fill_sos_location
         
         expired_timers = ActivityTimer.objects.filter(
             status='active',
@@ -267,11 +328,16 @@ def check_expired_timers():
         
         for timer in expired_timers:
             try:
-                sos_alert = SOSAlert.objects.create(
-                    user=timer.user,
-                    activation_method='timer',
-                    notes=f'Таймер активности истек. Длительность: {timer.duration_minutes} мин'
-                )
+                alert_data = {
+                    'activation_method': 'timer',
+                    'notes': f'Таймер активности истек. Длительность: {timer.duration_minutes} мин',
+                }
+                if fill_sos_location(alert_data, timer.user_id):
+                    alert_data['map_link'] = (
+                        f"https://www.google.com/maps/search/?api=1"
+                        f"&query={alert_data['latitude']},{alert_data['longitude']}"
+                    )
+                sos_alert = SOSAlert.objects.create(user=timer.user, **alert_data)
                 
                 contacts = EmergencyContact.objects.filter(
                     user=timer.user,
@@ -299,4 +365,46 @@ def check_expired_timers():
         
     except Exception as e:
         logger.error(f"❌ Ошибка проверки таймеров: {e}")
-        return 0
\ No newline at end of file
+        return 0
+
+
+@shared_task
+def expire_stale_timers(batch_size=None):
+    """
+    Перевод зависших таймеров в 'expired' пакетами.
+    
+    Таймер считается зависшим, если он все еще 'active' спустя
+    ACTIVITY_TIMER_STALE_AFTER секунд после end_time: check_expired_timers
+    либо уже отправил SOS, либо раз за разом падает на этом таймере.
+    """
+    from .models import ActivityTimer
+    
+    batch_size = batch_size or getattr(settings, 'EXPIRY_SWEEP_BATCH_SIZE', 500)
+    stale_after = getattr(settings, 'ACTIVITY_TIMER_STALE_AFTER', 3600)
+    now = timezone.now()
+    cutoff = now - timezone.timedelta(seconds=stale_after)
+    total = unsent = 0
+    
+    while True:
+        batch = list(
+            ActivityTimer.objects.filter(status='active', end_time__lt=cutoff)
+            .values_list('id', 'notification_sent')[:batch_size]
+        )
+        if not batch:
+            break
+        
+        ActivityTimer.objects.filter(
+            id__in=[timer_id for timer_id, _ in batch],
+            status='active'
+        ).update(status='expired', updated_at=now)
+        
+        unsent += sum(1 for _, sent in batch if not sent)
+        total += len(batch)
+        if len(batch) < batch_size:
+            break
+    
+    if unsent:
+        logger.error(f"❌ Таймеров истекло без отправки SOS: {unsent}")
+    if total:
+        logger.info(f"⌛ Зависших таймеров закрыто: {total}")
+    return total
@@ -1,3 +1,82 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from contacts.models import EmergencyContact
+
+from . import tasks
+from .models import ActivityTimer, SOSAlert
+
+User = get_user_model()
+
+
+@override_settings(ACTIVITY_TIMER_STALE_AFTER=3600)
+class ExpireStaleTimersTests(TestCase):
+    """Зависшие таймеры закрываются пакетами"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+996555000390')
+
+    def _timer(self, ended_minutes_ago, **kwargs):
+        end_time = timezone.now() - timedelta(minutes=ended_minutes_ago)
+        return ActivityTimer.objects.create(
+            user=self.user, duration_minutes=30,
+            start_time=end_time - timedelta(minutes=30), end_time=end_time, **kwargs
+        )
+
+    def test_stale_timers_are_expired_in_batches(self):
+        stale = [self._timer(120, notification_sent=i < 2) for i in range(5)]
+        recent = self._timer(10)
+        finished = self._timer(120, status='completed')
+
+        with self.assertLogs('sos.tasks', level='ERROR') as logs:
+            self.assertEqual(tasks.expire_stale_timers(batch_size=2), 5)
+
+        self.assertEqual(
+            set(ActivityTimer.objects.filter(status='expired').values_list('id', flat=True)),
+            {timer.id for timer in stale}
+        )
+        self.assertEqual(ActivityTimer.objects.get(id=recent.id).status, 'active')
+        self.assertEqual(ActivityTimer.objects.get(id=finished.id).status, 'completed')
+        # 3 из 5 таймеров так и не отправили SOS
+        self.assertIn('3', logs.output[0])
+
+    def test_exact_multiple_of_batch_size(self):
+        for _ in range(4):
+            self._timer(120, notification_sent=True)
+
+        with self.assertNoLogs('sos.tasks', level='ERROR'):
+            self.assertEqual(tasks.expire_stale_timers(batch_size=2), 4)
+        self.assertEqual(tasks.expire_stale_timers(batch_size=2), 0)
+
+
+class CheckExpiredTimersTests(TestCase):
+    """Истекший таймер поднимает SOS и больше не обрабатывается"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+996555000391')
+        self.contact = EmergencyContact.objects.create(
+            user=self.user, name='Мама', phone_number='+996700000039'
+        )
+        end_time = timezone.now() - timedelta(minutes=1)
+        self.timer = ActivityTimer.objects.create(
+            user=self.user, duration_minutes=30,
+            start_time=end_time - timedelta(minutes=30), end_time=end_time
+        )
+
+    def test_expired_timer_raises_sos_once(self):
+        with mock.patch.object(tasks, 'send_sos_notifications_sync') as send:
+            self.assertEqual(tasks.check_expired_timers(), 1)
+            self.assertEqual(tasks.check_expired_timers(), 0)
+
+        alert = SOSAlert.objects.get(user=self.user)
+        self.assertEqual(alert.activation_method, 'timer')
+        send.assert_called_once_with(alert.id, [self.contact.id])
+
+        self.timer.refresh_from_db()
+        self.assertEqual(self.timer.status, 'expired')
+        self.assertTrue(self.timer.notification_sent)
+        self.assertEqual(self.timer.sos_alert_id, alert.id)
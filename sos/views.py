@@ -26,7 +26,7 @@ def process_sos_async(sos_alert_id, contact_ids):
         
         sos_alert = SOSAlert.objects.get(id=sos_alert_id)
         if sos_alert.audio_file or sos_alert.video_file:
-            process_sos_media(sos_alert_id)
+            process_sos_media(sos_alert_id, contact_ids)
             logger.info(f" Медиа обработаны для SOS {sos_alert_id}")
             
     except Exception as e:
@@ -136,6 +136,30 @@ class SOSAlertViewSet(viewsets.ModelViewSet):
             return Response(SOSAlertSerializer(active_alert).data)
         return Response({'detail': 'No active SOS alert'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=['get'])
+    def responders(self, request, pk=None):
+        """Контакты-пользователи приложения, ближайшие к месту тревоги"""
+        from geolocation.nearby import contact_distances
+
+        sos_alert = self.get_object()
+        if sos_alert.latitude is None or sos_alert.longitude is None:
+            return Response({'detail': 'SOS alert has no location'}, status=status.HTTP_400_BAD_REQUEST)
+
+        contacts = list(EmergencyContact.objects.filter(user=sos_alert.user, is_active=True))
+        distances = contact_distances(sos_alert.latitude, sos_alert.longitude, contacts)
+        by_id = {contact.id: contact for contact in contacts if contact.id in distances}
+
+        responders = [
+            {
+                'contact_id': contact_id,
+                'name': by_id[contact_id].name,
+                'phone_number': str(by_id[contact_id].phone_number),
+                'distance_m': round(distance),
+            }
+            for contact_id, (_, distance) in sorted(distances.items(), key=lambda item: item[1][1])
+        ]
+        return Response(responders)
+
     @action(detail=False, methods=['get'])
     def history(self, request):
         queryset = self.get_queryset().filter(
@@ -3,17 +3,30 @@ from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from django import forms
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.http import StreamingHttpResponse
+from datetime import timedelta
+from .codes import MINT_BATCH_SIZE, aiter_chunks, iter_codes_csv, mint_codes
 from .models import (
     SubscriptionPlan, UserSubscription, PaymentTransaction,
     Feature, ActivationCode, BotSettings
 )
 
 
+class MintCodesForm(forms.Form):
+    count = forms.IntegerField(min_value=1, max_value=1_000_000, initial=100, label='Количество кодов')
+    expires_days = forms.IntegerField(min_value=1, initial=30, label='Срок действия (дней)')
+    payment_amount = forms.IntegerField(min_value=0, initial=0, label='Сумма в Telegram Stars')
+    is_test = forms.BooleanField(required=False, label='Тестовые коды')
+
+
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
     list_display = ('name', 'plan_type', 'price_monthly', 'price_stars_display', 'is_active', 'created_at')
     search_fields = ('name', 'plan_type')
     list_filter = ('is_active', 'plan_type')
+    actions = ['mint_activation_codes']
     
     fieldsets = (
         ('Основная информация', {
@@ -31,6 +44,42 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
     def price_stars_display(self, obj):
         return format_html('<b>⭐ {}</b>', obj.price_stars)
     price_stars_display.short_description = 'Price (Stars)'
+    
+    def mint_activation_codes(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, '⚠️ Выберите один план', messages.WARNING)
+            return None
+        plan = queryset.get()
+        
+        form = MintCodesForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            expires_at = timezone.now() + timedelta(days=form.cleaned_data['expires_days'])
+            batches = mint_codes(
+                form.cleaned_data['count'],
+                plan,
+                expires_at=expires_at,
+                payment_amount=form.cleaned_data['payment_amount'],
+                is_test=form.cleaned_data['is_test'],
+                batch_size=MINT_BATCH_SIZE,
+            )
+            # Коды вставляются пачками по мере отдачи файла
+            response = StreamingHttpResponse(
+                aiter_chunks(iter_codes_csv(batches, plan, expires_at)),
+                content_type='text/csv; charset=utf-8'
+            )
+            filename = f"activation_codes_{plan.plan_type}_{timezone.now():%Y%m%d_%H%M%S}.csv"
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        
+        return render(request, 'admin/subscriptions/mint_codes.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Генерация кодов активации',
+            'opts': self.model._meta,
+            'plan': plan,
+            'form': form,
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+        })
+    mint_activation_codes.short_description = 'Сгенерировать коды активации'
 
 
 @admin.register(UserSubscription)
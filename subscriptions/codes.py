@@ -0,0 +1,119 @@
+"""
+Bulk minting of activation codes (promotions, resellers).
+
+Codes are generated in batches: a batch of random candidates is checked
+against existing codes with one query, the survivors are inserted with
+one ``executemany``, and the loop repeats until the requested count is reached.
+A code inserted concurrently by the bot between the check and the insert
+makes the batch fail as a whole, and it is retried with fresh candidates.
+``BotSettings.total_codes_generated`` is bumped once at the end.
+"""
+import csv
+import secrets
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import ActivationCode, BotSettings
+
+MINT_BATCH_SIZE = 5000
+MINT_MAX_RETRIES = 3
+CSV_HEADER = ['code', 'plan', 'expires_at']
+
+
+def generate_code():
+    """Код вида XXXX-XXXX-XXXX, как в боте"""
+    return '-'.join(secrets.token_hex(2).upper() for _ in range(3))
+
+
+def _fresh_codes(size):
+    candidates = set()
+    while len(candidates) < size:
+        candidates.add(generate_code())
+    taken = set(ActivationCode.objects.filter(code__in=candidates).values_list('code', flat=True))
+    return candidates - taken
+
+
+def _insert_codes(codes, plan, expires_at, payment_amount, is_test):
+    # executemany вместо bulk_create: ORM тратит больше времени на подготовку
+    # значений, чем база на вставку
+    table = connection.ops.quote_name(ActivationCode._meta.db_table)
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    expires_at = connection.ops.adapt_datetimefield_value(expires_at)
+    sql = (
+        f'INSERT INTO {table} (code, plan_id, payment_amount, is_active, is_used, is_test, '
+        f'created_at, expires_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (code, plan.pk, payment_amount, True, False, is_test, created_at, expires_at)
+            for code in codes
+        ])
+
+
+def mint_codes(count, plan, expires_at=None, payment_amount=0, is_test=False,
+               batch_size=MINT_BATCH_SIZE):
+    """
+    Insert ``count`` new codes for ``plan``; yields the codes of each batch.
+
+    Stopping the iteration early keeps the batches already inserted, and
+    the counter reflects them.
+    """
+    expires_at = expires_at or timezone.now() + timedelta(days=30)
+    minted = retries = 0
+    try:
+        while minted < count:
+            codes = _fresh_codes(min(batch_size, count - minted))
+            try:
+                with transaction.atomic():
+                    _insert_codes(codes, plan, expires_at, payment_amount, is_test)
+            except IntegrityError:
+                retries += 1
+                if retries > MINT_MAX_RETRIES:
+                    raise
+                continue
+
+            retries = 0
+            minted += len(codes)
+            yield sorted(codes)
+    finally:
+        if minted:
+            BotSettings.increment('total_codes_generated', minted)
+
+
+class Echo:
+    """File-like object whose ``write`` returns the value, for streaming CSV."""
+
+    def write(self, value):
+        return value
+
+
+def iter_codes_csv(batches, plan, expires_at):
+    """CSV text of the minted batches, one chunk per batch."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    expires = expires_at.isoformat()
+    for codes in batches:
+        yield ''.join(writer.writerow([code, plan.plan_type, expires]) for code in codes)
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator over a blocking one, one ``next`` per thread hop.
+
+    Under ASGI a sync iterator given to StreamingHttpResponse is consumed in
+    full before sending; this way each batch is minted only when the client
+    is ready for more. Closing it early closes ``chunks`` too, so the counter
+    update in ``mint_codes`` still runs.
+    """
+    done = object()
+    try:
+        while True:
+            chunk = await sync_to_async(next)(chunks, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,142 @@
+"""
+What a user's subscription entitles them to.
+
+``get_entitlements`` resolves the user's subscription and plan into a small
+immutable ``Entitlements`` object and caches it per user. Plan features only
+apply while the subscription is active and not past its end date; otherwise
+the user gets the free limits. The cache entry never outlives the
+subscription's end date, is dropped whenever the user's subscription
+changes, and every entry is invalidated at once by bumping a version
+number when any plan changes.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UserSubscription
+
+PLAN_VERSION_KEY = 'entitlements:plan_version'
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    plan_type: str
+    plan_name: str
+    status: str
+    max_contacts: int
+    geozones_enabled: bool
+    location_history_enabled: bool
+    is_premium: bool
+    subscription_id: Optional[int] = None
+    end_date: Optional[datetime] = None
+
+    @property
+    def days_remaining(self):
+        if not self.is_premium or self.end_date is None:
+            return 0
+        return max(0, (self.end_date - timezone.now()).days)
+
+
+def free_entitlements(status='free', subscription=None):
+    return Entitlements(
+        plan_type='free',
+        plan_name='Free',
+        status=status,
+        max_contacts=getattr(settings, 'MAX_FREE_CONTACTS', 1),
+        geozones_enabled=False,
+        location_history_enabled=False,
+        is_premium=False,
+        subscription_id=subscription.id if subscription else None,
+        end_date=subscription.end_date if subscription else None,
+    )
+
+
+def resolve_entitlements(subscription, now=None):
+    """Entitlements granted by a ``UserSubscription`` (with ``plan`` loaded) or None."""
+    if subscription is None:
+        return free_entitlements()
+
+    now = now or timezone.now()
+    status = subscription.status
+    if status == 'active' and subscription.end_date <= now:
+        status = 'expired'
+    if status != 'active':
+        return free_entitlements(status, subscription)
+
+    plan = subscription.plan
+    return Entitlements(
+        plan_type=plan.plan_type,
+        plan_name=plan.name,
+        status=status,
+        max_contacts=plan.max_contacts,
+        geozones_enabled=plan.geozones_enabled,
+        location_history_enabled=plan.location_history_enabled,
+        is_premium=plan.plan_type != 'free',
+        subscription_id=subscription.id,
+        end_date=subscription.end_date,
+    )
+
+
+def _plan_version():
+    version = cache.get(PLAN_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(PLAN_VERSION_KEY, version, None)
+    return version
+
+
+def _cache_key(user_id):
+    return f'entitlements:{user_id}:{_plan_version()}'
+
+
+def get_entitlements(user):
+    """Cached ``Entitlements`` of a user (or user id)."""
+    user_id = getattr(user, 'pk', user)
+    key = _cache_key(user_id)
+    entitlements = cache.get(key)
+    if entitlements is not None:
+        return entitlements
+
+    subscription = UserSubscription.objects.select_related('plan').filter(user_id=user_id).first()
+    entitlements = resolve_entitlements(subscription)
+
+    timeout = getattr(settings, 'ENTITLEMENTS_CACHE_TTL', 300)
+    if entitlements.status == 'active':
+        timeout = min(timeout, (entitlements.end_date - timezone.now()).total_seconds())
+    if timeout > 0:
+        cache.set(key, entitlements, timeout)
+    return entitlements
+
+
+def sync_premium_flag(user_id):
+    """
+    Bring ``User.is_premium`` in line with the user's entitlements.
+
+    The flag is a denormalised copy kept for filtering; reads go through
+    ``get_entitlements``. Only a real transition writes the user row.
+    Returns True if it changed.
+    """
+    is_premium = get_entitlements(user_id).is_premium
+    changed = (
+        get_user_model().objects.filter(pk=user_id)
+        .exclude(is_premium=is_premium)
+        .update(is_premium=is_premium)
+    )
+    return bool(changed)
+
+
+def invalidate_entitlements(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def invalidate_all_entitlements():
+    """Called when a plan changes: every cached entry becomes unreachable."""
+    try:
+        cache.incr(PLAN_VERSION_KEY)
+    except ValueError:
+        cache.set(PLAN_VERSION_KEY, 2, None)
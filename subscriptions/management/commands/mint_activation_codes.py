@@ -0,0 +1,69 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from subscriptions.codes import MINT_BATCH_SIZE, iter_codes_csv, mint_codes
+from subscriptions.models import SubscriptionPlan
+
+
+class Command(BaseCommand):
+    help = 'Массовая генерация кодов активации (акции, реселлеры) с выгрузкой в CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, required=True, help='Количество кодов')
+        parser.add_argument(
+            '--plan',
+            default='personal_premium',
+            help='Тип плана (plan_type) или его ID'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Путь к CSV (по умолчанию activation_codes_<plan>_<дата>.csv)'
+        )
+        parser.add_argument('--expires-days', type=int, default=30, help='Срок действия кодов в днях')
+        parser.add_argument('--payment-amount', type=int, default=0, help='Сумма в Telegram Stars')
+        parser.add_argument('--test', action='store_true', help='Пометить коды как тестовые')
+        parser.add_argument('--batch-size', type=int, default=MINT_BATCH_SIZE, help='Размер пачки для вставки')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if count <= 0:
+            raise CommandError('--count должен быть больше нуля')
+
+        plan_ref = options['plan']
+        lookup = {'id': int(plan_ref)} if plan_ref.isdigit() else {'plan_type': plan_ref}
+        try:
+            plan = SubscriptionPlan.objects.get(**lookup)
+        except SubscriptionPlan.DoesNotExist:
+            raise CommandError(f'План {plan_ref} не найден')
+
+        expires_at = timezone.now() + timedelta(days=options['expires_days'])
+        output = options['output'] or (
+            f"activation_codes_{plan.plan_type}_{timezone.now():%Y%m%d_%H%M%S}.csv"
+        )
+
+        self.stdout.write(self.style.WARNING('='*60))
+        self.stdout.write(self.style.WARNING('🎟 ГЕНЕРАЦИЯ КОДОВ АКТИВАЦИИ'))
+        self.stdout.write(self.style.WARNING('='*60))
+        self.stdout.write(f"\nПлан: {plan.name}, кодов: {count}, действуют до {expires_at:%d.%m.%Y}")
+
+        started = time.monotonic()
+        batches = mint_codes(
+            count,
+            plan,
+            expires_at=expires_at,
+            payment_amount=options['payment_amount'],
+            is_test=options['test'],
+            batch_size=options['batch_size'],
+        )
+        with open(output, 'w', newline='', encoding='utf-8') as stream:
+            for chunk in iter_codes_csv(batches, plan, expires_at):
+                stream.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ Создано кодов: {count} за {time.monotonic() - started:.1f} с"
+        ))
+        self.stdout.write(f"📄 Файл: {output}")
+        self.stdout.write('='*60 + '\n')
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0004_botsettings_activationcode_is_test_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['status', 'end_date'], name='subscriptio_status_93cc56_idx'),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+import time
+
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from datetime import timedelta
 from django.utils import timezone
@@ -70,6 +74,9 @@ class UserSubscription(models.Model):
     class Meta:
         verbose_name = _('User Subscription')
         verbose_name_plural = _('User Subscriptions')
+        indexes = [
+            models.Index(fields=['status', 'end_date']),
+        ]
 
     def __str__(self):
         return f"{self.user.phone_number} - {self.plan.name} ({self.status})"
@@ -200,55 +207,108 @@ class ActivationCode(models.Model):
             timezone.now() < self.expires_at
         )
     
+    def rejection_reason(self) -> str:
+        """Почему код нельзя активировать"""
+        if self.is_used:
+            return 'Код уже использован'
+        if timezone.now() >= self.expires_at:
+            return 'Код истек'
+        if not self.is_active:
+            return 'Код деактивирован'
+        return 'Код недействителен'
+    
     def activate_for_user(self, user):
-        """Активация кода для пользователя с проверкой и синхронизацией is_premium"""
-        if not self.is_valid():
-            if self.is_used:
-                raise ValueError('Код уже использован')
-            elif timezone.now() >= self.expires_at:
-                raise ValueError('Код истек')
-            elif not self.is_active:
-                raise ValueError('Код деактивирован')
-            else:
-                raise ValueError('Код недействителен')
+        """Активация кода для пользователя (is_premium синхронизирует сигнал подписки)"""
+        return ActivationCode.redeem(self.code, user)
+    
+    @classmethod
+    def _claim(cls, code, user, now):
+        """
+        Атомарно пометить код использованным; возвращает plan_id или None.
         
-        existing_subscription = UserSubscription.objects.filter(
-            user=user,
-            plan=self.plan,
-            status='active'
-        ).first()
+        Условие проверяется в том же UPDATE, поэтому из параллельных
+        запросов код получит только один.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        now = connection.ops.adapt_datetimefield_value(now)
+        params = [True, user.pk, now, code, False, True, now]
+        sql = (
+            f'UPDATE {table} SET is_used = %s, activated_by_id = %s, activated_at = %s '
+            f'WHERE code = %s AND is_used = %s AND is_active = %s AND expires_at > %s'
+        )
         
-        if existing_subscription and existing_subscription.end_date > timezone.now():
-            existing_subscription.end_date = existing_subscription.end_date + timedelta(days=30)
-            existing_subscription.save(update_fields=['end_date', 'updated_at'])
-            subscription = existing_subscription
-        else:
-            subscription, created = UserSubscription.objects.update_or_create(
-                user=user,
-                defaults={
-                    'plan': self.plan,
+        with connection.cursor() as cursor:
+            if _supports_update_returning():
+                cursor.execute(sql + ' RETURNING plan_id', params)
+                row = cursor.fetchone()
+                return row[0] if row else None
+            
+            cursor.execute(sql, params)
+            if not cursor.rowcount:
+                return None
+        return cls.objects.filter(code=code).values_list('plan_id', flat=True).first()
+    
+    @classmethod
+    def redeem(cls, code, user):
+        """
+        Активировать код для пользователя одной транзакцией.
+        
+        Бросает ActivationCode.DoesNotExist, если кода нет, и ValueError
+        с причиной, если код уже использован, истек или отключен.
+        """
+        from .entitlements import invalidate_entitlements, sync_premium_flag
+        
+        now = timezone.now()
+        with transaction.atomic():
+            plan_id = cls._claim(code, user, now)
+            if plan_id is None:
+                raise ValueError(cls.objects.get(code=code).rejection_reason())
+            
+            subscriptions = UserSubscription.objects.filter(user=user)
+            extended = subscriptions.filter(
+                plan_id=plan_id,
+                status='active',
+                end_date__gt=now
+            ).update(end_date=F('end_date') + timedelta(days=30), updated_at=now)
+            
+            if not extended:
+                fields = {
+                    'plan_id': plan_id,
                     'status': 'active',
                     'payment_period': 'monthly',
-                    'start_date': timezone.now(),
-                    'end_date': timezone.now() + timedelta(days=30),
+                    'start_date': now,
+                    'end_date': now + timedelta(days=30),
                     'auto_renew': False,
                 }
+                if not subscriptions.update(updated_at=now, **fields):
+                    UserSubscription.objects.create(user=user, **fields)
+            
+            # queryset.update не шлет post_save. robust: код уже активирован,
+            # ошибка синхронизации кэша не должна превращаться в ошибку активации
+            transaction.on_commit(
+                lambda: (invalidate_entitlements(user.pk), sync_premium_flag(user.pk)),
+                robust=True
             )
-        
-        self.is_used = True
-        self.activated_by = user
-        self.activated_at = timezone.now()
-        self.save(update_fields=['is_used', 'activated_by', 'activated_at'])
-        
-        user.is_premium = (self.plan.plan_type != 'free' and subscription.status == 'active')
-        user.save(update_fields=['is_premium'])
-        
-        return subscription
+            return subscriptions.select_related('plan').get()
+
+
+def _supports_update_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+# Закэшированный в процессе экземпляр BotSettings и момент его устаревания
+_bot_settings_cache = {'instance': None, 'expires': 0.0}
 
 
 class BotSettings(models.Model):
     """Настройки Telegram бота"""
     
+    COUNTER_FIELDS = ('total_payments_received', 'total_codes_generated', 'total_codes_activated')
+    
     # Админы бота (Telegram User IDs через запятую)
     admin_telegram_ids = models.TextField(
         default='',
@@ -295,16 +355,46 @@ class BotSettings(models.Model):
     
     @classmethod
     def get_settings(cls):
-        """Получить или создать настройки"""
-        settings, _ = cls.objects.get_or_create(id=1)
-        return settings
+        """
+        Получить или создать настройки.
+        
+        Экземпляр кэшируется в процессе на BOT_SETTINGS_CACHE_TTL секунд:
+        бот читает настройки в каждом обработчике. Сохранение сбрасывает кэш
+        текущего процесса, остальные увидят изменения по истечении TTL.
+        """
+        now = time.monotonic()
+        instance = _bot_settings_cache['instance']
+        if instance is None or now >= _bot_settings_cache['expires']:
+            instance, _ = cls.objects.get_or_create(id=1)
+            _bot_settings_cache['instance'] = instance
+            _bot_settings_cache['expires'] = now + getattr(settings, 'BOT_SETTINGS_CACHE_TTL', 30)
+        return instance
+    
+    @classmethod
+    def invalidate_cache(cls):
+        _bot_settings_cache['instance'] = None
+    
+    @classmethod
+    def increment(cls, field, by=1):
+        """Атомарно увеличить счетчик статистики (без read-modify-write)"""
+        if field not in cls.COUNTER_FIELDS:
+            raise ValueError(f'{field} не является счетчиком')
+        counter = cls.objects.filter(id=1)
+        if not counter.update(**{field: F(field) + by}):
+            cls.objects.get_or_create(id=1)
+            counter.update(**{field: F(field) + by})
+        cls.invalidate_cache()
+    
+    @cached_property
+    def admin_ids(self):
+        """Telegram ID админов, разобранные один раз на экземпляр"""
+        return frozenset(
+            int(id.strip()) for id in self.admin_telegram_ids.split(',') if id.strip()
+        )
     
     def is_admin(self, telegram_user_id):
         """Проверка, является ли пользователь админом"""
-        if not self.admin_telegram_ids:
-            return False
-        admin_ids = [int(id.strip()) for id in self.admin_telegram_ids.split(',') if id.strip()]
-        return telegram_user_id in admin_ids
+        return telegram_user_id in self.admin_ids
     
     def get_active_price(self):
         """Получить актуальную цену"""
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import SubscriptionPlan, UserSubscription, PaymentTransaction, ActivationCode
-from django.utils import timezone
+from .entitlements import resolve_entitlements
 
 
 class SubscriptionPlanSerializer(serializers.ModelSerializer):
@@ -27,14 +27,11 @@ class UserSubscriptionSerializer(serializers.ModelSerializer):
     
     def get_days_remaining(self, obj):
         """Количество дней до истечения подписки"""
-        if obj.status == 'active':
-            remaining = (obj.end_date - timezone.now()).days
-            return max(0, remaining)
-        return 0
+        return resolve_entitlements(obj).days_remaining
     
     def get_is_premium(self, obj):
         """Проверка активности премиум подписки"""
-        return obj.is_premium()
+        return resolve_entitlements(obj).is_premium
 
 
 class PaymentTransactionSerializer(serializers.ModelSerializer):
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .entitlements import invalidate_all_entitlements, invalidate_entitlements, sync_premium_flag
+from .models import BotSettings, SubscriptionPlan, UserSubscription
+
+# Подписки переведены в 'expired' пакетом (queryset.update не шлет post_save)
+subscriptions_expired = Signal()  # sender=UserSubscription, user_ids=[...]
+
+
+@receiver([post_save, post_delete], sender=UserSubscription)
+def reset_user_entitlements(sender, instance, **kwargs):
+    invalidate_entitlements(instance.user_id)
+    sync_premium_flag(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=SubscriptionPlan)
+def reset_all_entitlements(sender, instance, **kwargs):
+    invalidate_all_entitlements()
+
+
+@receiver(subscriptions_expired)
+def reset_expired_entitlements(sender, user_ids, **kwargs):
+    for user_id in user_ids:
+        invalidate_entitlements(user_id)
+
+
+@receiver(post_save, sender=BotSettings)
+def reset_bot_settings_cache(sender, instance, **kwargs):
+    BotSettings.invalidate_cache()
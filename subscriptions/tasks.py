@@ -0,0 +1,46 @@
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+
+@shared_task
+def expire_subscriptions(batch_size=None):
+    """Перевод истекших подписок в 'expired' пакетами с синхронизацией is_premium"""
+    from .models import UserSubscription
+    from .signals import subscriptions_expired
+    
+    batch_size = batch_size or getattr(settings, 'EXPIRY_SWEEP_BATCH_SIZE', 500)
+    now = timezone.now()
+    total = 0
+    
+    while True:
+        batch = list(
+            UserSubscription.objects.filter(status='active', end_date__lte=now)
+            .values_list('id', 'user_id')[:batch_size]
+        )
+        if not batch:
+            break
+        
+        UserSubscription.objects.filter(
+            id__in=[subscription_id for subscription_id, _ in batch],
+            status='active',
+            end_date__lte=now
+        ).update(status='expired', updated_at=now)
+        
+        # У пользователя одна подписка, поэтому истекшая подписка = не premium
+        user_ids = [user_id for _, user_id in batch]
+        User.objects.filter(id__in=user_ids, is_premium=True).update(is_premium=False)
+        subscriptions_expired.send(sender=UserSubscription, user_ids=user_ids)
+        
+        total += len(batch)
+        if len(batch) < batch_size:
+            break
+    
+    if total:
+        logger.info(f"⌛ Истекших подписок: {total}")
+    return total
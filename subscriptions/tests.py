@@ -1,3 +1,366 @@
-from django.test import TestCase
+import csv
+import io
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import codes
+from .entitlements import get_entitlements
+from .models import ActivationCode, BotSettings, SubscriptionPlan, UserSubscription
+from .tasks import expire_subscriptions
+
+User = get_user_model()
+
+
+class ActivationCodeRedeemConcurrencyTests(TransactionTestCase):
+    """Параллельная активация одного кода: использовать его может только один"""
+
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(
+            name='Premium', plan_type='personal_premium', max_contacts=5
+        )
+        self.code = ActivationCode.objects.create(
+            code='PARALLEL01',
+            plan=self.plan,
+            payment_amount=100,
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.users = [
+            User.objects.create_user(phone_number=f'+99655500{i:04d}')
+            for i in range(8)
+        ]
+
+    def _redeem_in_parallel(self):
+        barrier = threading.Barrier(len(self.users))
+        results = []
+        lock = threading.Lock()
+
+        def redeem(user):
+            barrier.wait()
+            outcome = 'locked'
+            try:
+                for _ in range(200):
+                    try:
+                        ActivationCode.redeem(self.code.code, user)
+                        outcome = 'ok'
+                    except ValueError:
+                        outcome = 'rejected'
+                    except OperationalError:
+                        # SQLite в тестах отдает "table is locked" вместо ожидания
+                        time.sleep(0.01)
+                        continue
+                    break
+            finally:
+                connection.close()
+            with lock:
+                results.append((user.pk, outcome))
+
+        threads = [threading.Thread(target=redeem, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_only_one_parallel_redemption_wins(self):
+        results = self._redeem_in_parallel()
+
+        winners = [user_id for user_id, outcome in results if outcome == 'ok']
+        self.assertEqual(len(winners), 1, results)
+        self.assertEqual(
+            [outcome for _, outcome in results if outcome != 'ok'],
+            ['rejected'] * (len(self.users) - 1)
+        )
+
+        self.code.refresh_from_db()
+        self.assertTrue(self.code.is_used)
+        self.assertEqual(self.code.activated_by_id, winners[0])
+        self.assertEqual(
+            list(UserSubscription.objects.values_list('user_id', flat=True)),
+            winners
+        )
+        self.assertTrue(User.objects.get(pk=winners[0]).is_premium)
+
+    def test_used_code_is_rejected(self):
+        ActivationCode.redeem(self.code.code, self.users[0])
+
+        with self.assertRaisesMessage(ValueError, 'Код уже использован'):
+            ActivationCode.redeem(self.code.code, self.users[1])
+
+    def test_redeem_extends_active_subscription(self):
+        first = ActivationCode.redeem(self.code.code, self.users[0])
+        second_code = ActivationCode.objects.create(
+            code='PARALLEL02', plan=self.plan, payment_amount=100
+        )
+
+        second = ActivationCode.redeem(second_code.code, self.users[0])
+
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(second.end_date, first.end_date + timedelta(days=30))
+
+
+@override_settings(MAX_FREE_CONTACTS=1)
+class EntitlementsTests(TestCase):
+    """Лимиты плана берутся из кэша и сбрасываются при изменении подписки или плана"""
+
+    def setUp(self):
+        cache.clear()
+        self.plan = SubscriptionPlan.objects.create(
+            name='Premium', plan_type='personal_premium', max_contacts=5,
+            geozones_enabled=True, location_history_enabled=True
+        )
+        self.user = User.objects.create_user(phone_number='+996555000600')
+
+    def _subscribe(self, days=30):
+        now = timezone.now()
+        return UserSubscription.objects.create(
+            user=self.user, plan=self.plan, start_date=now, end_date=now + timedelta(days=days)
+        )
+
+    def test_user_without_subscription_gets_free_limits(self):
+        entitlements = get_entitlements(self.user)
+
+        self.assertEqual(entitlements.plan_type, 'free')
+        self.assertEqual(entitlements.max_contacts, 1)
+        self.assertFalse(entitlements.geozones_enabled)
+        self.assertFalse(entitlements.is_premium)
+
+    def test_active_subscription_grants_plan_and_syncs_flag(self):
+        self._subscribe()
+
+        entitlements = get_entitlements(self.user)
+        self.assertEqual(entitlements.max_contacts, 5)
+        self.assertTrue(entitlements.geozones_enabled)
+        self.assertTrue(entitlements.is_premium)
+        self.assertEqual(entitlements.days_remaining, 29)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_premium)
+
+    def test_entitlements_are_cached(self):
+        self._subscribe()
+        get_entitlements(self.user.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_entitlements(self.user.id).max_contacts, 5)
+
+    def test_subscription_past_end_date_gives_free_limits(self):
+        subscription = self._subscribe()
+        UserSubscription.objects.filter(pk=subscription.pk).update(
+            end_date=timezone.now() - timedelta(minutes=1)
+        )
+        cache.clear()
+
+        entitlements = get_entitlements(self.user)
+        self.assertEqual(entitlements.status, 'expired')
+        self.assertEqual(entitlements.max_contacts, 1)
+
+    def test_plan_change_invalidates_cached_entries(self):
+        self._subscribe()
+        get_entitlements(self.user)
+
+        self.plan.max_contacts = 10
+        self.plan.save()
+
+        self.assertEqual(get_entitlements(self.user).max_contacts, 10)
+
+    def test_expiry_sweep_drops_premium(self):
+        subscription = self._subscribe()
+        get_entitlements(self.user)
+        UserSubscription.objects.filter(pk=subscription.pk).update(
+            end_date=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.assertEqual(expire_subscriptions(), 1)
+
+        subscription.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(subscription.status, 'expired')
+        self.assertFalse(self.user.is_premium)
+        self.assertFalse(get_entitlements(self.user).is_premium)
+
+
+class MintActivationCodesTests(TestCase):
+    """Массовая генерация кодов пачками с учетом занятых кодов и сбоев вставки"""
+
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(
+            name='Premium', plan_type='personal_premium', max_contacts=5
+        )
+
+    def _generated(self):
+        return BotSettings.objects.get(id=1).total_codes_generated
+
+    def test_codes_are_minted_in_batches(self):
+        batches = list(codes.mint_codes(7, self.plan, payment_amount=100, batch_size=3))
+
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        minted = ActivationCode.objects.filter(plan=self.plan)
+        self.assertEqual(
+            sorted(minted.values_list('code', flat=True)),
+            sorted(code for batch in batches for code in batch)
+        )
+        for code in minted:
+            self.assertRegex(code.code, r'^[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}$')
+            self.assertTrue(code.is_active)
+            self.assertFalse(code.is_used)
+            self.assertEqual(code.payment_amount, 100)
+        self.assertEqual(self._generated(), 7)
+
+    def test_taken_codes_are_replaced(self):
+        ActivationCode.objects.create(code='AAAA-0000-0001', plan=self.plan, payment_amount=0)
+        candidates = iter(['AAAA-0000-0001', 'AAAA-0000-0002', 'AAAA-0000-0003'])
+
+        with mock.patch.object(codes, 'generate_code', lambda: next(candidates)):
+            batches = list(codes.mint_codes(2, self.plan))
+
+        self.assertEqual(batches, [['AAAA-0000-0002'], ['AAAA-0000-0003']])
+        self.assertEqual(ActivationCode.objects.count(), 3)
+
+    def test_batch_failing_on_concurrent_insert_is_retried(self):
+        insert = codes._insert_codes
+        calls = []
+
+        def flaky_insert(*args, **kwargs):
+            calls.append(args[0])
+            if len(calls) == 1:
+                raise IntegrityError('UNIQUE constraint failed: code')
+            return insert(*args, **kwargs)
+
+        with mock.patch.object(codes, '_insert_codes', flaky_insert):
+            batches = list(codes.mint_codes(4, self.plan))
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sum(len(batch) for batch in batches), 4)
+        self.assertEqual(ActivationCode.objects.count(), 4)
+        self.assertEqual(self._generated(), 4)
+
+    def test_stopping_early_keeps_inserted_batches(self):
+        batches = codes.mint_codes(6, self.plan, batch_size=2)
+        next(batches)
+        batches.close()
+
+        self.assertEqual(ActivationCode.objects.count(), 2)
+        self.assertEqual(self._generated(), 2)
+
+    def test_command_writes_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'codes.csv'
+            call_command(
+                'mint_activation_codes', count=3, plan='personal_premium',
+                output=str(output), stdout=io.StringIO()
+            )
+            with open(output, newline='', encoding='utf-8') as csv_file:
+                rows = list(csv.reader(csv_file))
+
+        self.assertEqual(rows[0], codes.CSV_HEADER)
+        self.assertEqual(
+            sorted(row[0] for row in rows[1:]),
+            sorted(ActivationCode.objects.values_list('code', flat=True))
+        )
+        self.assertTrue(all(row[1] == 'personal_premium' for row in rows[1:]))
+
+    async def _admin_mint(self, count):
+        admin = await sync_to_async(User.objects.create_superuser)(phone_number='+996555000999')
+        await self.async_client.aforce_login(admin)
+        return await self.async_client.post('/admin/subscriptions/subscriptionplan/', {
+            'action': 'mint_activation_codes',
+            '_selected_action': [self.plan.pk],
+            'apply': '1',
+            'count': count,
+            'expires_days': 30,
+            'payment_amount': 0,
+        })
+
+    async def test_admin_action_mints_while_streaming(self):
+        response = await self._admin_mint(3)
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(await ActivationCode.objects.acount(), 0)
+        body = b''.join([chunk async for chunk in response]).decode()
+
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], codes.CSV_HEADER)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(await ActivationCode.objects.acount(), 3)
+
+    async def test_admin_download_cancelled_before_first_batch(self):
+        response = await self._admin_mint(3)
+        stream = aiter(response)
+        await anext(stream)
+        await stream.aclose()
+
+        self.assertEqual(await ActivationCode.objects.acount(), 0)
+
+
+@override_settings(BOT_SETTINGS_CACHE_TTL=30)
+class BotSettingsTests(TestCase):
+    """Настройки бота кэшируются в процессе, счетчики растут атомарно"""
+
+    def setUp(self):
+        BotSettings.invalidate_cache()
+        self.addCleanup(BotSettings.invalidate_cache)
+
+    def test_settings_are_cached(self):
+        BotSettings.get_settings()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(BotSettings.get_settings().subscription_days, 30)
+
+    def test_cache_expires_after_ttl(self):
+        with mock.patch('subscriptions.models.time.monotonic', return_value=1000.0):
+            BotSettings.get_settings()
+        BotSettings.objects.filter(id=1).update(subscription_days=90)
+
+        with mock.patch('subscriptions.models.time.monotonic', return_value=1029.0):
+            self.assertEqual(BotSettings.get_settings().subscription_days, 30)
+        with mock.patch('subscriptions.models.time.monotonic', return_value=1030.0):
+            self.assertEqual(BotSettings.get_settings().subscription_days, 90)
+
+    def test_save_invalidates_cache(self):
+        cached = BotSettings.get_settings()
+        self.assertFalse(cached.is_admin(123456789))
+
+        fresh = BotSettings.objects.get(id=1)
+        fresh.admin_telegram_ids = '123456789, 987654321'
+        fresh.save()
+
+        self.assertTrue(BotSettings.get_settings().is_admin(123456789))
+
+    def test_increment_is_a_single_update(self):
+        BotSettings.get_settings()
+
+        with self.assertNumQueries(1):
+            BotSettings.increment('total_codes_activated')
+
+        self.assertEqual(BotSettings.get_settings().total_codes_activated, 1)
+
+    def test_increment_does_not_lose_concurrent_updates(self):
+        stale = BotSettings.get_settings()
+        BotSettings.objects.filter(id=1).update(total_payments_received=F('total_payments_received') + 3)
+
+        BotSettings.increment('total_payments_received', 2)
+
+        self.assertEqual(stale.total_payments_received, 0)
+        self.assertEqual(BotSettings.objects.get(id=1).total_payments_received, 5)
+        self.assertEqual(BotSettings.get_settings().total_payments_received, 5)
+
+    def test_increment_creates_missing_row(self):
+        BotSettings.increment('total_codes_generated', 4)
+
+        self.assertEqual(BotSettings.objects.get(id=1).total_codes_generated, 4)
+
+    def test_increment_rejects_other_fields(self):
+        with self.assertRaises(ValueError):
+            BotSettings.increment('subscription_days')
@@ -21,6 +21,7 @@ from .serializers import (
     SubscribeSerializer,
     ActivationCodeSerializer
 )
+from .entitlements import get_entitlements, resolve_entitlements
 
 logger = logging.getLogger(__name__)
 
@@ -56,23 +57,14 @@ class UserSubscriptionViewSet(viewsets.ModelViewSet):
         
         try:
             subscription = UserSubscription.objects.select_related('plan').get(user=user)
-            
-            now = timezone.now()
-            if subscription.status == 'active' and subscription.end_date <= now:
-                subscription.status = 'expired'
-                subscription.save(update_fields=['status'])
-                
-                user.is_premium = False
-                user.save(update_fields=['is_premium'])
-            
-            is_premium = user.is_premium
+            entitlements = get_entitlements(user)
             
             return Response({
                 'id': subscription.id,
                 'plan': SubscriptionPlanSerializer(subscription.plan).data,
-                'status': subscription.status,
-                'is_premium': is_premium,
-                'days_remaining': max(0, (subscription.end_date - now).days) if is_premium else 0,
+                'status': entitlements.status,
+                'is_premium': entitlements.is_premium,
+                'days_remaining': entitlements.days_remaining,
                 'end_date': subscription.end_date.isoformat(),
                 'payment_period': subscription.payment_period,
                 'auto_renew': subscription.auto_renew,
@@ -83,7 +75,7 @@ class UserSubscriptionViewSet(viewsets.ModelViewSet):
                 'id': None,
                 'plan': {'plan_type': 'free', 'name': 'Free'},
                 'status': 'free',
-                'is_premium': user.is_premium,
+                'is_premium': get_entitlements(user).is_premium,
                 'days_remaining': 0,
                 'end_date': None,
                 'payment_period': None,
@@ -189,9 +181,6 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
         subscription.status = 'active'
         subscription.save(update_fields=['status'])
         
-        request.user.is_premium = True
-        request.user.save(update_fields=['is_premium'])
-        
         return Response({
             'detail': 'Payment successful',
             'payment': self.get_serializer(payment).data,
@@ -222,45 +211,35 @@ class ActivationCodeViewSet(viewsets.ViewSet):
             )
         
         try:
-            activation_code = ActivationCode.objects.select_related('plan').get(code=code_str)
-            
-            if not activation_code.is_valid():
-                if activation_code.is_used:
-                    error = 'Код уже использован'
-                elif timezone.now() >= activation_code.expires_at:
-                    error = 'Код истек'
-                else:
-                    error = 'Код недействителен'
-                    
-                return Response(
-                    {'success': False, 'error': error},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            subscription = activation_code.activate_for_user(request.user)
-            
-            request.user.refresh_from_db()
+            subscription = ActivationCode.redeem(code_str, request.user)
+            is_premium = resolve_entitlements(subscription).is_premium
             
             logger.info(
                 f" Код {code_str} активирован для {request.user.phone_number}. "
-                f"is_premium={request.user.is_premium}"
+                f"is_premium={is_premium}"
             )
             
             return Response({
                 'success': True,
                 'message': f'Premium подписка активирована до {subscription.end_date.strftime("%d.%m.%Y")}',
                 'user': {
-                    'is_premium': request.user.is_premium,
+                    'is_premium': is_premium,
                 },
                 'subscription': {
                     'id': subscription.id,
                     'plan': subscription.plan.name,
                     'status': subscription.status,
-                    'is_premium': request.user.is_premium,
+                    'is_premium': is_premium,
                     'days_remaining': (subscription.end_date - timezone.now()).days,
                     'end_date': subscription.end_date.isoformat(),
                 }
             }, status=status.HTTP_200_OK)
             
+        except ValueError as e:
+            return Response(
+                {'success': False, 'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except ActivationCode.DoesNotExist:
             return Response(
                 {'success': False, 'error': 'Код не найден. Проверьте правильность ввода.'},